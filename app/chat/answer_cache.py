@@ -0,0 +1,183 @@
+import base64
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.chat.embeddings.openai import embeddings
+from app.chat.redis import client
+from app.chat.timing import register_cache_stats
+
+
+class SemanticAnswerCache:
+    """
+    Stores generated answers per document and returns one when a new
+    standalone question is close enough to a question already answered.
+
+    Entries (question, question embedding, answer, component names) live in
+    one Redis hash per document, so every web process sees the same entries.
+    Each process mirrors a document's entries as a float32 matrix and only
+    reloads it when the document's version counter changes.
+
+    Args:
+        client: Redis client
+        embeddings: Embeddings used for the questions
+        threshold: Minimum cosine similarity for a hit
+        ttl: Seconds an entry is served for
+        max_entries: Entries kept per document, oldest are dropped first
+        match_components: Component names that must match for a hit. An
+            answer is only reused by conversations using the same LLM so
+            scores stay attributed to the model that wrote it.
+    """
+
+    def __init__(
+        self,
+        client,
+        embeddings,
+        threshold: float = 0.95,
+        ttl: int = 86400,
+        max_entries: int = 500,
+        match_components: Tuple[str, ...] = ("llm",),
+        prefix: str = "answer_cache",
+    ):
+        self.client = client
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.match_components = match_components
+        self.prefix = prefix
+
+        self._lock = threading.Lock()
+        # document_id -> (version, vectors, entries)
+        self._local: Dict[str, Tuple[int, np.ndarray, List[Dict[str, Any]]]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, document_id: str) -> str:
+        return f"{self.prefix}:{document_id}"
+
+    def _version_key(self, document_id: str) -> str:
+        return f"{self.prefix}:{document_id}:version"
+
+    def _entries(self, document_id: str) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+        version = int(self.client.get(self._version_key(document_id)) or 0)
+        with self._lock:
+            local = self._local.get(document_id)
+            if local and local[0] == version:
+                return local[1], local[2]
+
+        entries = [json.loads(v) for v in self.client.hvals(self._key(document_id))]
+        vectors = np.asarray(
+            [np.frombuffer(base64.b64decode(e["vector"]), dtype=np.float32) for e in entries],
+            dtype=np.float32,
+        )
+        with self._lock:
+            self._local[document_id] = (version, vectors, entries)
+        return vectors, entries
+
+    def lookup(
+        self, document_id: str, question: str, components: Dict[str, str]
+    ) -> Optional[str]:
+        """Returns a cached answer, or None when no question is close enough"""
+        vectors, entries = self._entries(document_id)
+        if not entries:
+            self._record(hit=False)
+            return None
+
+        query = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        query /= np.linalg.norm(query) or 1
+        scores = vectors @ query
+
+        now = time.time()
+        best, best_score = None, self.threshold
+        for entry, score in zip(entries, scores):
+            if score < best_score or now - entry["created_at"] > self.ttl:
+                continue
+            if any(
+                entry["components"].get(name) != components.get(name)
+                for name in self.match_components
+            ):
+                continue
+            best, best_score = entry, score
+
+        self._record(hit=best is not None)
+        return best["answer"] if best else None
+
+    def store(
+        self,
+        document_id: str,
+        question: str,
+        answer: str,
+        components: Dict[str, str],
+    ) -> None:
+        vector = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        vector /= np.linalg.norm(vector) or 1
+        entry = {
+            "question": question,
+            "answer": answer,
+            "components": components,
+            "created_at": time.time(),
+            "vector": base64.b64encode(vector.tobytes()).decode("ascii"),
+        }
+
+        key = self._key(document_id)
+        pipe = self.client.pipeline()
+        pipe.hset(key, str(uuid.uuid4()), json.dumps(entry))
+        pipe.expire(key, self.ttl)
+        pipe.incr(self._version_key(document_id))
+        pipe.hlen(key)
+        *_, count = pipe.execute()
+
+        if count > self.max_entries:
+            self._trim(document_id, count - self.max_entries)
+
+    def _trim(self, document_id: str, count: int) -> None:
+        key = self._key(document_id)
+        entries = self.client.hgetall(key)
+        oldest = sorted(entries, key=lambda id: json.loads(entries[id])["created_at"])
+        pipe = self.client.pipeline()
+        pipe.hdel(key, *oldest[:count])
+        pipe.incr(self._version_key(document_id))
+        pipe.execute()
+
+    def invalidate(self, document_id: str) -> None:
+        pipe = self.client.pipeline()
+        pipe.delete(self._key(document_id))
+        pipe.incr(self._version_key(document_id))
+        pipe.execute()
+
+    def _record(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+answer_cache = (
+    SemanticAnswerCache(
+        client,
+        embeddings,
+        threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.95)),
+        ttl=int(os.getenv("ANSWER_CACHE_TTL_SECONDS", 86400)),
+        max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 500)),
+    )
+    if os.getenv("ANSWER_CACHE", "").lower() in ("1", "true", "yes")
+    else None
+)
+if answer_cache is not None:
+    register_cache_stats("answer", answer_cache.stats)
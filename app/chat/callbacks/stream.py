@@ -1,7 +1,8 @@
 
-from langchain.callbacks.base import BaseCallbackHandler
+from langchain.callbacks.base import AsyncCallbackHandler, BaseCallbackHandler
 from langchain_openai import ChatOpenAI
 from queue import Queue
+import asyncio
 from typing import Any, Dict, List, Set
 import threading
 from dotenv import load_dotenv
@@ -10,32 +11,98 @@ import uuid
 
 load_dotenv()
 
+def is_streaming_run(serialized, kwargs) -> bool:
+    """
+    True for LLM runs that stream their output (the answer), False for the
+    ones that don't (e.g. condensing the question).
+    """
+    params = kwargs.get("invocation_params") or {}
+    if params.get("stream") or params.get("streaming"):
+        return True
+    try:
+        return bool(serialized.get("kwargs", {}).get("streaming", False))
+    except (AttributeError, TypeError):
+        return False
+
+
 class StreamingHandler(BaseCallbackHandler):
-    """Callback handler for streaming LLM responses to a queue."""
+    """
+    Callback handler for streaming LLM responses to a queue.
+
+    Tokens are routed by run id: only streaming LLM runs feed the queue,
+    and the end of the stream (None) is signalled once the last of them
+    ends. Other LLM runs in the chain don't touch the queue.
+    """
     
     def __init__(self, queue: Queue):
         super().__init__()  # Call parent constructor
         self.queue = queue
-        self.streaming_run_ids: Set[uuid.UUID] = set()  # Initialize this!
-
-    def on_chat_model_start(self, serialized, messages, run_id, **kwargs):
-        # Safely check for streaming flag
-        try:
-            if serialized.get("kwargs", {}).get("streaming", False):
-                self.streaming_run_ids.add(run_id)
-        except (KeyError, TypeError):
-            # If structure is different, assume streaming
+        self.streaming_run_ids: Set[uuid.UUID] = set()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        if is_streaming_run(serialized, kwargs):
             self.streaming_run_ids.add(run_id)
 
-    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
-        """Run on new LLM token. Only available when streaming is enabled."""
-        self.queue.put(token)
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        if is_streaming_run(serialized, kwargs):
+            self.streaming_run_ids.add(run_id)
 
-    def on_llm_end(self, response, run_id, **kwargs):
+    def on_llm_new_token(self, token: str, *, run_id, **kwargs: Any) -> None:
+        """Run on new LLM token. Only available when streaming is enabled."""
         if run_id in self.streaming_run_ids:
-            self.streaming_run_ids.discard(run_id)  # Use discard instead of remove
-        self.queue.put(None)  # Always signal end
+            self.queue.put(token)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._end_run(run_id)
 
-    def on_llm_error(self, error: Exception, **kwargs: Any) -> None:
+    def on_llm_error(self, error: Exception, *, run_id, **kwargs: Any) -> None:
         """Run when LLM errors."""
-        self.queue.put(None)
\ No newline at end of file
+        self._end_run(run_id)
+
+    def _end_run(self, run_id):
+        if run_id not in self.streaming_run_ids:
+            return
+        self.streaming_run_ids.discard(run_id)
+        if not self.streaming_run_ids:
+            self.queue.put(None)
+
+
+class AsyncStreamingHandler(AsyncCallbackHandler):
+    """
+    Async counterpart of StreamingHandler, feeding an asyncio.Queue with
+    the same run id routing.
+    """
+
+    # Awaited directly instead of in a task per event: cheaper per token and
+    # keeps tokens in order
+    run_inline = True
+
+    def __init__(self, queue: asyncio.Queue):
+        super().__init__()
+        self.queue = queue
+        self.streaming_run_ids: Set[uuid.UUID] = set()
+
+    async def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        if is_streaming_run(serialized, kwargs):
+            self.streaming_run_ids.add(run_id)
+
+    async def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        if is_streaming_run(serialized, kwargs):
+            self.streaming_run_ids.add(run_id)
+
+    async def on_llm_new_token(self, token: str, *, run_id, **kwargs: Any) -> None:
+        if run_id in self.streaming_run_ids:
+            self.queue.put_nowait(token)
+
+    async def on_llm_end(self, response, *, run_id, **kwargs):
+        self._end_run(run_id)
+
+    async def on_llm_error(self, error: Exception, *, run_id, **kwargs: Any) -> None:
+        self._end_run(run_id)
+
+    def _end_run(self, run_id):
+        if run_id not in self.streaming_run_ids:
+            return
+        self.streaming_run_ids.discard(run_id)
+        if not self.streaming_run_ids:
+            self.queue.put_nowait(None)
@@ -1,7 +1,337 @@
+import asyncio
+import contextvars
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, Optional
 from langchain.chains import ConversationalRetrievalChain
+from langchain.chains.conversational_retrieval.base import _get_chat_history
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForChainRun,
+    CallbackManagerForChainRun,
+)
+from langchain_core.documents import Document
+from langchain_core.runnables.config import run_in_executor
 from app.chat.chains.streamable import StreamableChain
+from app.chat.retrievers.cached import normalize_question
+from app.chat.timing import timed
+
+# Shared by all chains so speculative retrievals don't start a thread each
+_speculation_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("SPECULATIVE_RETRIEVAL_WORKERS", 8)),
+    thread_name_prefix="speculative-retrieval",
+)
 
 class StreamingConversationalRetrievalChain(
     StreamableChain, ConversationalRetrievalChain
 ):
-    pass
\ No newline at end of file
+    """
+    ConversationalRetrievalChain split into overridable steps
+    (condense, retrieve, answer) with an optional semantic answer cache.
+
+    When `answer_cache` returns an answer for the condensed question the
+    retrieval and answer steps are skipped. The cached answer is returned as
+    the chain's output, so memory records it like any other answer and
+    `stream` emits it as the response.
+
+    With `speculative_retrieval` enabled, retrieval for the raw question
+    starts at the same time as condensation. If the condensed question turns
+    out to be (nearly) the same as the raw one, the speculative documents
+    are used; otherwise the condensed question is retrieved as usual. A
+    speculative retrieval that isn't needed, or hasn't left the pool's
+    queue by the time it is, is cancelled.
+
+    With a `context_packer`, retrieved chunks are packed (merged, filtered
+    by score, cut to `context_k` passages, fitted to a token budget) before
+    they reach the QA prompt.
+
+    `_acall` runs the same steps on the event loop for `astream`, with the
+    blocking cache calls moved to an executor.
+    """
+
+    answer_cache: Optional[Any] = None
+    # Document the conversation is about and the names of the components
+    # building it, used to key the answer cache
+    document_id: Optional[str] = None
+    components: Dict[str, str] = {}
+    speculative_retrieval: bool = False
+    # Minimum similarity between the normalized raw and condensed questions
+    # for the speculative documents to be used
+    speculative_similarity: float = 0.9
+    context_packer: Optional[Any] = None
+    # Most passages the packer keeps, the retriever's configured k
+    context_k: Optional[int] = None
+
+    def _call(
+        self,
+        inputs: Dict[str, Any],
+        run_manager: Optional[CallbackManagerForChainRun] = None,
+    ) -> Dict[str, Any]:
+        _run_manager = run_manager or CallbackManagerForChainRun.get_noop_manager()
+        question = inputs["question"]
+        get_chat_history = self.get_chat_history or _get_chat_history
+        chat_history_str = get_chat_history(inputs["chat_history"])
+
+        speculative_docs = None
+        if chat_history_str and self.speculative_retrieval:
+            speculative_docs = _speculation_pool.submit(
+                contextvars.copy_context().run,
+                self._get_docs,
+                question,
+                inputs,
+                run_manager=_run_manager,
+            )
+
+        try:
+            with timed("condense"):
+                new_question = self._condense_question(
+                    question, chat_history_str, _run_manager
+                )
+
+            cached_answer = self._lookup_answer(new_question)
+            if cached_answer is not None:
+                output: Dict[str, Any] = {self.output_key: cached_answer}
+                if self.return_source_documents:
+                    output["source_documents"] = []
+                if self.return_generated_question:
+                    output["generated_question"] = new_question
+                return output
+
+            with timed("retrieve"):
+                docs = self._retrieve(
+                    question, new_question, speculative_docs, inputs, _run_manager
+                )
+        finally:
+            # Only frees a pool slot if the retrieval hasn't started, a
+            # running one finishes and is discarded
+            if speculative_docs is not None:
+                speculative_docs.cancel()
+
+        output = {}
+        if self.response_if_no_docs_found is not None and len(docs) == 0:
+            output[self.output_key] = self.response_if_no_docs_found
+        else:
+            with timed("generate"):
+                output[self.output_key] = self._answer(
+                    new_question, chat_history_str, docs, inputs, _run_manager
+                )
+            self._store_answer(new_question, output[self.output_key])
+
+        if self.return_source_documents:
+            output["source_documents"] = docs
+        if self.return_generated_question:
+            output["generated_question"] = new_question
+        return output
+
+    async def _acall(
+        self,
+        inputs: Dict[str, Any],
+        run_manager: Optional[AsyncCallbackManagerForChainRun] = None,
+    ) -> Dict[str, Any]:
+        _run_manager = run_manager or AsyncCallbackManagerForChainRun.get_noop_manager()
+        question = inputs["question"]
+        get_chat_history = self.get_chat_history or _get_chat_history
+        chat_history_str = get_chat_history(inputs["chat_history"])
+
+        speculative_docs = None
+        if chat_history_str and self.speculative_retrieval:
+            speculative_docs = asyncio.ensure_future(
+                self._aget_docs(question, inputs, run_manager=_run_manager)
+            )
+
+        try:
+            with timed("condense"):
+                new_question = await self._acondense_question(
+                    question, chat_history_str, _run_manager
+                )
+
+            cached_answer = await run_in_executor(None, self._lookup_answer, new_question)
+            if cached_answer is not None:
+                output: Dict[str, Any] = {self.output_key: cached_answer}
+                if self.return_source_documents:
+                    output["source_documents"] = []
+                if self.return_generated_question:
+                    output["generated_question"] = new_question
+                return output
+
+            with timed("retrieve"):
+                docs = await self._aretrieve(
+                    question, new_question, speculative_docs, inputs, _run_manager
+                )
+        finally:
+            if speculative_docs is not None and not speculative_docs.done():
+                speculative_docs.cancel()
+
+        output = {}
+        if self.response_if_no_docs_found is not None and len(docs) == 0:
+            output[self.output_key] = self.response_if_no_docs_found
+        else:
+            with timed("generate"):
+                output[self.output_key] = await self._aanswer(
+                    new_question, chat_history_str, docs, inputs, _run_manager
+                )
+            await run_in_executor(
+                None, self._store_answer, new_question, output[self.output_key]
+            )
+
+        if self.return_source_documents:
+            output["source_documents"] = docs
+        if self.return_generated_question:
+            output["generated_question"] = new_question
+        return output
+
+    def _condense_question(
+        self,
+        question: str,
+        chat_history_str: str,
+        run_manager: CallbackManagerForChainRun,
+    ) -> str:
+        if not chat_history_str:
+            return question
+
+        return self.question_generator.run(
+            question=question,
+            chat_history=chat_history_str,
+            callbacks=run_manager.get_child(),
+        )
+
+    async def _acondense_question(
+        self,
+        question: str,
+        chat_history_str: str,
+        run_manager: AsyncCallbackManagerForChainRun,
+    ) -> str:
+        if not chat_history_str:
+            return question
+
+        return await self.question_generator.arun(
+            question=question,
+            chat_history=chat_history_str,
+            callbacks=run_manager.get_child(),
+        )
+
+    def _retrieve(
+        self,
+        question: str,
+        new_question: str,
+        speculative_docs: Optional[Future],
+        inputs: Dict[str, Any],
+        run_manager: CallbackManagerForChainRun,
+    ) -> List[Document]:
+        # A speculative retrieval still waiting for a pool thread would be
+        # slower than retrieving here
+        if (
+            speculative_docs is not None
+            and self._questions_match(question, new_question)
+            and not speculative_docs.cancel()
+        ):
+            try:
+                return speculative_docs.result()
+            except Exception as e:
+                print(f"[StreamingConversationalRetrievalChain] Speculative retrieval failed: {e}")
+
+        return self._get_docs(new_question, inputs, run_manager=run_manager)
+
+    async def _aretrieve(
+        self,
+        question: str,
+        new_question: str,
+        speculative_docs: Optional[asyncio.Future],
+        inputs: Dict[str, Any],
+        run_manager: AsyncCallbackManagerForChainRun,
+    ) -> List[Document]:
+        if speculative_docs is not None and self._questions_match(question, new_question):
+            try:
+                return await speculative_docs
+            except Exception as e:
+                print(f"[StreamingConversationalRetrievalChain] Speculative retrieval failed: {e}")
+
+        return await self._aget_docs(new_question, inputs, run_manager=run_manager)
+
+    def _get_docs(
+        self,
+        question: str,
+        inputs: Dict[str, Any],
+        *,
+        run_manager: CallbackManagerForChainRun,
+    ) -> List[Document]:
+        docs = super()._get_docs(question, inputs, run_manager=run_manager)
+        return self._pack(docs)
+
+    async def _aget_docs(
+        self,
+        question: str,
+        inputs: Dict[str, Any],
+        *,
+        run_manager: AsyncCallbackManagerForChainRun,
+    ) -> List[Document]:
+        docs = await super()._aget_docs(question, inputs, run_manager=run_manager)
+        return self._pack(docs)
+
+    def _pack(self, docs: List[Document]) -> List[Document]:
+        if self.context_packer is None:
+            return docs
+        try:
+            return self.context_packer.pack(docs, max_passages=self.context_k)
+        except Exception as e:
+            print(f"[StreamingConversationalRetrievalChain] Context packing failed: {e}")
+            return docs[: self.context_k]
+
+    def _questions_match(self, question: str, new_question: str) -> bool:
+        question = normalize_question(question)
+        new_question = normalize_question(new_question)
+        if question == new_question:
+            return True
+        return (
+            SequenceMatcher(None, question, new_question).ratio()
+            >= self.speculative_similarity
+        )
+
+    def _answer(
+        self,
+        new_question: str,
+        chat_history_str: str,
+        docs: List[Document],
+        inputs: Dict[str, Any],
+        run_manager: CallbackManagerForChainRun,
+    ) -> str:
+        new_inputs = inputs.copy()
+        if self.rephrase_question:
+            new_inputs["question"] = new_question
+        new_inputs["chat_history"] = chat_history_str
+        return self.combine_docs_chain.run(
+            input_documents=docs, callbacks=run_manager.get_child(), **new_inputs
+        )
+
+    async def _aanswer(
+        self,
+        new_question: str,
+        chat_history_str: str,
+        docs: List[Document],
+        inputs: Dict[str, Any],
+        run_manager: AsyncCallbackManagerForChainRun,
+    ) -> str:
+        new_inputs = inputs.copy()
+        if self.rephrase_question:
+            new_inputs["question"] = new_question
+        new_inputs["chat_history"] = chat_history_str
+        return await self.combine_docs_chain.arun(
+            input_documents=docs, callbacks=run_manager.get_child(), **new_inputs
+        )
+
+    def _lookup_answer(self, question: str) -> Optional[str]:
+        if self.answer_cache is None or self.document_id is None:
+            return None
+        try:
+            return self.answer_cache.lookup(self.document_id, question, self.components)
+        except Exception as e:
+            print(f"[StreamingConversationalRetrievalChain] Answer cache lookup failed: {e}")
+            return None
+
+    def _store_answer(self, question: str, answer: str) -> None:
+        if self.answer_cache is None or self.document_id is None:
+            return
+        try:
+            self.answer_cache.store(self.document_id, question, answer, self.components)
+        except Exception as e:
+            print(f"[StreamingConversationalRetrievalChain] Answer cache store failed: {e}")
@@ -1,56 +1,150 @@
 from flask import current_app
-from queue import Queue
+from queue import Empty, Queue
 from threading import Thread
-from typing import Any, Dict, Iterator, Union
-from app.chat.callbacks.stream import StreamingHandler
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Union
+from app.chat.callbacks.stream import AsyncStreamingHandler, StreamingHandler
+from app.chat.timing import PhaseTimer, current_timer
+import asyncio
+import contextvars
+import json
+import os
 import time
 
+# Tokens are buffered and written together once this many bytes are
+# buffered or the oldest buffered token has waited this long. 0 disables
+# the limit; both 0 writes every token as it arrives.
+STREAM_COALESCE_BYTES = int(os.getenv("STREAM_COALESCE_BYTES", 512))
+STREAM_COALESCE_MS = float(os.getenv("STREAM_COALESCE_MS", 20))
+# "raw" writes the answer text as is, "sse" writes Server-Sent Events:
+# `data: {"token": ...}` per write and `data: [DONE]` at the end
+STREAM_FORMAT = os.getenv("STREAM_FORMAT", "raw")
+
+
+class TokenCoalescer:
+    """
+    Buffers tokens and turns them into frames, so a write (and a syscall)
+    carries many tokens instead of one.
+
+    Args:
+        max_bytes: Flush once this many bytes are buffered (0: no limit)
+        max_delay: Flush once the oldest buffered token is this many
+            seconds old (0: no limit)
+        format: "raw" or "sse"
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = STREAM_COALESCE_BYTES,
+        max_delay: float = STREAM_COALESCE_MS / 1000,
+        format: str = STREAM_FORMAT,
+    ):
+        if format not in ("raw", "sse"):
+            raise ValueError(f"Unknown stream format: {format}")
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+        self.format = format
+        self._tokens: List[str] = []
+        self._size = 0
+        self._deadline: Optional[float] = None
+
+    def add(self, token: str) -> Optional[str]:
+        """Buffers a token, returns a frame when the buffer is full"""
+        self._tokens.append(token)
+        self._size += len(token.encode("utf-8"))
+        if self._deadline is None:
+            self._deadline = time.monotonic() + self.max_delay
+
+        if (not self.max_bytes and not self.max_delay) or (
+            self.max_bytes and self._size >= self.max_bytes
+        ):
+            return self.flush()
+        return None
+
+    def timeout(self) -> Optional[float]:
+        """Seconds until the buffer is due, None when nothing is waiting"""
+        if self._deadline is None or not self.max_delay:
+            return None
+        return max(0.0, self._deadline - time.monotonic())
+
+    def flush(self) -> Optional[str]:
+        if not self._tokens:
+            return None
+        text = "".join(self._tokens)
+        self._tokens, self._size, self._deadline = [], 0, None
+        return self.frame(text)
+
+    def frame(self, text: str) -> str:
+        if self.format == "sse":
+            return f"data: {json.dumps({'token': text})}\n\n"
+        return text
+
+    def done(self) -> Optional[str]:
+        """Frame marking the end of the stream"""
+        return "data: [DONE]\n\n" if self.format == "sse" else None
+
+    def timing(self, timer: PhaseTimer) -> Optional[str]:
+        """Frame with the request's phase timings, sent before the end"""
+        if self.format != "sse":
+            return None
+        return f"event: timing\ndata: {timer.as_json()}\n\n"
+
+
 class StreamableChain:
     """
     Mixin class to add streaming capability to LangChain chains.
+
+    Only the streaming LLM run (the answer) feeds the stream, and its last
+    token is sent as soon as that run ends, while the chain finishes its
+    bookkeeping such as saving memory. An answer that wasn't generated
+    (e.g. served from a cache) is sent as a single frame.
+
+    Once the chain is done, SSE streams get an `event: timing` with the
+    request's phase timings (app.chat.timing), then the end marker.
     """
-    
-    def stream(self, input: Union[Dict[str, Any], str]) -> Iterator[str]:
+
+    @staticmethod
+    def _chain_input(input: Union[Dict[str, Any], str]) -> Dict[str, Any]:
+        # ConversationalRetrievalChain expects a dict with 'question' key
+        if isinstance(input, str):
+            return {"question": input}
+        if isinstance(input, dict) and "input" in input:
+            return {"question": input["input"]}
+        return input
+
+    def stream(
+        self, input: Union[Dict[str, Any], str], format: Optional[str] = None
+    ) -> Iterator[str]:
         """
         Stream tokens from the chain execution.
-        
+
         Args:
             input: Input to the chain (dict or string)
-            
+            format: "raw" or "sse", defaults to STREAM_FORMAT
+
         Yields:
-            str: Individual tokens from the LLM response
+            str: Frames of coalesced tokens from the LLM response
         """
         queue = Queue()
         handler = StreamingHandler(queue)
+        coalescer = TokenCoalescer(format=format or STREAM_FORMAT)
         result_container = {}  # Store the final result
 
         def task(app_context):
             app_context.push()
             try:
                 print(f"[StreamableChain] Starting chain with input: {input}")
-                
+
                 config = {"callbacks": [handler]}
-                
-                # ConversationalRetrievalChain expects a dict with 'question' key
-                if isinstance(input, str):
-                    chain_input = {"question": input}
-                elif isinstance(input, dict) and "input" in input:
-                    chain_input = {"question": input["input"]}
-                else:
-                    chain_input = input
-                
+                chain_input = self._chain_input(input)
+
                 # Execute the chain
                 if hasattr(self, 'invoke'):
                     result = self.invoke(chain_input, config=config)
                 else:
                     result = self(chain_input, callbacks=[handler])
-                
-                print(f"[StreamableChain] Result type: {type(result)}")
+
                 result_container['result'] = result
-                
-                # Give streaming a moment to catch up
-                time.sleep(0.1)
-                    
+
             except Exception as e:
                 print(f"[StreamableChain] Error: {e}")
                 import traceback
@@ -58,38 +152,142 @@ class StreamableChain:
             finally:
                 queue.put(None)
 
-        thread = Thread(target=task, args=[current_app.app_context()])
+        # The chain records its phases into this request's timer
+        timer = current_timer()
+        context = contextvars.copy_context()
+        thread = Thread(target=context.run, args=[task, current_app.app_context()])
         thread.start()
-        
+
+        token_count = 0
+        try:
+            # Yield frames from queue
+            while True:
+                try:
+                    token = queue.get(timeout=coalescer.timeout())
+                except Empty:
+                    yield coalescer.flush()
+                    continue
+                if token is None:
+                    break
+                if not token_count and timer is not None:
+                    timer.mark("ttft")
+                token_count += 1
+                frame = coalescer.add(token)
+                if frame:
+                    yield frame
+
+            frame = coalescer.flush()
+            if frame:
+                yield frame
+
+            # Wait for the chain to finish (memory, caches) before the stream
+            # ends, so the next message sees this one in its history
+            thread.join()
+
+            if not token_count:
+                answer = self._unstreamed_answer(result_container.get("result"))
+                if answer:
+                    yield coalescer.frame(answer)
+
+            for frame in self._closing_frames(coalescer, timer):
+                yield frame
+
+            print(f"[StreamableChain] Complete. Yielded {token_count} tokens")
+        finally:
+            if timer is not None:
+                timer.observe()
+
+    async def astream(
+        self,
+        input: Union[Dict[str, Any], str],
+        *args: Any,
+        format: Optional[str] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[str]:
+        """
+        Stream tokens from the chain execution on the running event loop.
+
+        The chain runs as a task next to the consumer instead of on a thread
+        of its own, so a single process can serve many streams at once.
+        Closing the iterator early (e.g. the client went away) cancels the
+        chain.
+
+        Args:
+            input: Input to the chain (dict or string)
+            format: "raw" or "sse", defaults to STREAM_FORMAT
+
+        Yields:
+            str: Frames of coalesced tokens from the LLM response
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        handler = AsyncStreamingHandler(queue)
+        coalescer = TokenCoalescer(format=format or STREAM_FORMAT)
+        chain_input = self._chain_input(input)
+
+        async def task():
+            try:
+                return await self.ainvoke(chain_input, config={"callbacks": [handler]})
+            finally:
+                queue.put_nowait(None)
+
+        timer = current_timer()
+        running = asyncio.create_task(task())
         token_count = 0
-        received_any_tokens = False
-        
-        # Yield tokens from queue
-        while True:
-            token = queue.get()
-            if token is None:
-                break
-            token_count += 1
-            received_any_tokens = True
-            yield token
-        
-        # Wait for thread to complete
-        thread.join()
-        
-        # FALLBACK: If no tokens were received but we have a result, yield it
-        if not received_any_tokens and 'result' in result_container:
-            result = result_container['result']
-            if isinstance(result, dict) and 'answer' in result:
-                answer = result['answer']
-                print(f"[StreamableChain] No tokens received, yielding answer from result: {answer[:100]}...")
-                
-                # Yield answer word by word to simulate streaming
-                words = answer.split(' ')
-                for i, word in enumerate(words):
-                    if i == 0:
-                        yield word
-                    else:
-                        yield ' ' + word
-                    time.sleep(0.01)  # Small delay to simulate streaming
-        
-        print(f"[StreamableChain] Complete. Yielded {token_count} tokens")
\ No newline at end of file
+        try:
+            while True:
+                try:
+                    async with asyncio.timeout(coalescer.timeout()):
+                        token = await queue.get()
+                except TimeoutError:
+                    yield coalescer.flush()
+                    continue
+                if token is None:
+                    break
+                if not token_count and timer is not None:
+                    timer.mark("ttft")
+                token_count += 1
+                frame = coalescer.add(token)
+                if frame:
+                    yield frame
+
+            frame = coalescer.flush()
+            if frame:
+                yield frame
+
+            result = await self._finish(running)
+            if not token_count:
+                answer = self._unstreamed_answer(result)
+                if answer:
+                    yield coalescer.frame(answer)
+
+            for frame in self._closing_frames(coalescer, timer):
+                yield frame
+        finally:
+            if not running.done():
+                running.cancel()
+            if timer is not None:
+                timer.observe()
+
+    @staticmethod
+    def _closing_frames(
+        coalescer: TokenCoalescer, timer: Optional[PhaseTimer]
+    ) -> List[str]:
+        frames = [coalescer.timing(timer) if timer is not None else None]
+        frames.append(coalescer.done())
+        return [frame for frame in frames if frame]
+
+    @staticmethod
+    async def _finish(running: asyncio.Task) -> Any:
+        try:
+            return await running
+        except Exception as e:
+            print(f"[StreamableChain] Error: {e}")
+            import traceback
+            traceback.print_exception(e)
+            return None
+
+    @staticmethod
+    def _unstreamed_answer(result: Any) -> Optional[str]:
+        if isinstance(result, dict):
+            return result.get("answer")
+        return None
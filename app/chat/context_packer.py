@@ -0,0 +1,187 @@
+import os
+from collections import OrderedDict
+from functools import cached_property
+from typing import Any, Dict, List, Optional, Tuple
+
+import tiktoken
+from langchain_core.documents import Document
+
+# Shortest overlap between two chunks' texts that counts as the same text
+_MIN_OVERLAP = 20
+
+
+class ContextPacker:
+    """
+    Packs retrieved chunks into the context sent to the QA prompt.
+
+    1. Chunks scoring more than `score_gap` below the best chunk are
+       dropped, so k adapts to how clearly the question matches: one strong
+       chunk stays alone, several close ones all stay. Chunks without a
+       score ("score" in metadata) are kept.
+    2. Chunks from the same page whose texts overlap (the splitter repeats
+       `chunk_overlap` characters between neighbours) or that are
+       neighbours by chunk index are merged, so repeated text is sent once.
+    3. The best `max_passages` merged passages (all when None) are added,
+       best first, until `token_budget` tokens are used. The best passage
+       is truncated if it doesn't fit on its own.
+
+    Args:
+        token_budget: Maximum tokens of context, counted with tiktoken
+        score_gap: Maximum distance from the best score for a chunk to stay
+        encoding: tiktoken encoding used to count tokens
+    """
+
+    def __init__(
+        self,
+        token_budget: int = 1500,
+        score_gap: float = 0.08,
+        encoding: str = "cl100k_base",
+    ):
+        self.token_budget = token_budget
+        self.score_gap = score_gap
+        self.encoding_name = encoding
+
+    @cached_property
+    def encoding(self) -> tiktoken.Encoding:
+        # Loaded on first use, tiktoken downloads the encoding the first time
+        return tiktoken.get_encoding(self.encoding_name)
+
+    def pack(
+        self, docs: List[Document], max_passages: Optional[int] = None
+    ) -> List[Document]:
+        if not docs:
+            return docs
+
+        docs = self._drop_by_score_gap(docs)
+        passages = self._merge(docs)
+        if max_passages is not None:
+            passages = passages[:max_passages]
+        return self._fit_budget(passages)
+
+    def count_tokens(self, docs: List[Document]) -> int:
+        return sum(len(self.encoding.encode(doc.page_content)) for doc in docs)
+
+    def _drop_by_score_gap(self, docs: List[Document]) -> List[Document]:
+        scores = [_score(doc) for doc in docs]
+        known = [s for s in scores if s is not None]
+        if not known:
+            return docs
+
+        cutoff = max(known) - self.score_gap
+        return [
+            doc for doc, score in zip(docs, scores) if score is None or score >= cutoff
+        ]
+
+    def _merge(self, docs: List[Document]) -> List[Document]:
+        # Group by page, keeping the order in which pages first appear
+        pages: "OrderedDict[Tuple[Any, Any], List[Document]]" = OrderedDict()
+        for doc in docs:
+            key = (doc.metadata.get("pdf_id"), doc.metadata.get("page"))
+            pages.setdefault(key, []).append(doc)
+
+        passages = []
+        for page_docs in pages.values():
+            if all(d.metadata.get("chunk") is not None for d in page_docs):
+                page_docs = sorted(page_docs, key=lambda d: d.metadata["chunk"])
+
+            merged = [page_docs[0]]
+            for doc in page_docs[1:]:
+                for i, passage in enumerate(merged):
+                    combined = _join(passage, doc)
+                    if combined is not None:
+                        merged[i] = combined
+                        break
+                else:
+                    merged.append(doc)
+            passages.extend(merged)
+
+        # Best passages first, unscored ones keep their retrieval order
+        return sorted(
+            passages,
+            key=lambda d: -_score(d) if _score(d) is not None else float("inf"),
+        )
+
+    def _fit_budget(self, passages: List[Document]) -> List[Document]:
+        packed, used = [], 0
+        for passage in passages:
+            tokens = self.encoding.encode(passage.page_content)
+            if used + len(tokens) <= self.token_budget:
+                packed.append(passage)
+                used += len(tokens)
+            elif not packed:
+                packed.append(
+                    Document(
+                        page_content=self.encoding.decode(tokens[: self.token_budget]),
+                        metadata=passage.metadata,
+                    )
+                )
+                break
+        return packed
+
+
+def _score(doc: Document) -> Optional[float]:
+    return doc.metadata.get("score")
+
+
+def _join(a: Document, b: Document) -> Optional[Document]:
+    """Merges two chunks of a page if they overlap or are neighbours"""
+    text = _join_texts(a.page_content, b.page_content)
+    if text is None:
+        text = _join_texts(b.page_content, a.page_content)
+    range_a, range_b = _chunk_range(a), _chunk_range(b)
+    if text is None and range_a and range_b:
+        if range_b[0] == range_a[1] + 1:
+            text = f"{a.page_content}\n{b.page_content}"
+        elif range_a[0] == range_b[1] + 1:
+            text = f"{b.page_content}\n{a.page_content}"
+    if text is None:
+        return None
+
+    metadata: Dict[str, Any] = {**a.metadata, "text": text}
+    scores = [s for s in (_score(a), _score(b)) if s is not None]
+    if scores:
+        metadata["score"] = max(scores)
+    if range_a and range_b:
+        metadata["chunk"] = min(range_a[0], range_b[0])
+        metadata["last_chunk"] = max(range_a[1], range_b[1])
+    return Document(page_content=text, metadata=metadata)
+
+
+def _join_texts(first: str, second: str) -> Optional[str]:
+    if second in first:
+        return first
+    # Longest suffix of `first` that starts `second`
+    for size in range(min(len(first), len(second)), _MIN_OVERLAP - 1, -1):
+        if first.endswith(second[:size]):
+            return first + second[size:]
+    return None
+
+
+def _chunk_range(doc: Document) -> Optional[Tuple[int, int]]:
+    """First and last chunk index a (merged) chunk covers"""
+    chunk = doc.metadata.get("chunk")
+    if chunk is None:
+        return None
+    return int(chunk), int(doc.metadata.get("last_chunk", chunk))
+
+
+def candidate_k(k: int) -> int:
+    """
+    How many chunks to retrieve for a retriever configured with k. The
+    packer then keeps at most k passages, merged from the candidates
+    """
+    if context_packer is None:
+        return k
+    return k * CONTEXT_FETCH_FACTOR
+
+
+CONTEXT_FETCH_FACTOR = int(os.getenv("CONTEXT_FETCH_FACTOR", 3))
+
+context_packer = (
+    ContextPacker(
+        token_budget=int(os.getenv("CONTEXT_TOKEN_BUDGET", 1500)),
+        score_gap=float(os.getenv("CONTEXT_SCORE_GAP", 0.08)),
+    )
+    if os.getenv("CONTEXT_PACKER", "true").lower() in ("1", "true", "yes")
+    else None
+)
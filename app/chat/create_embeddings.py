@@ -3,9 +3,18 @@ from langchain.text_splitter import RecursiveCharacterTextSplitter
 
 import os
 
-from app.chat.vector_stores.pinecone import vector_store
+from app.chat.embeddings.openai import embeddings
+from app.chat.ingestion import build_pipeline, iter_pages
+from app.chat.answer_cache import answer_cache
+from app.chat.retrievers.cached import invalidate_document
+from app.chat.vector_stores import add_documents, upsert_vectors
+from app.chat.retrievers.hot_documents import invalidate_hot_document
 
-def create_embeddings_for_pdf(pdf_id: str, pdf_path: str):
+PIPELINED_INGESTION = os.getenv("INGESTION_PIPELINED", "").lower() in ("1", "true", "yes")
+EXTRACT_WORKERS = int(os.getenv("INGESTION_EXTRACT_WORKERS", 1))
+
+
+def create_embeddings_for_pdf(pdf_id: str, pdf_path: str, pipelined: bool = None):
     """
     Generate and store embeddings for the given pdf
 
@@ -14,8 +23,13 @@ def create_embeddings_for_pdf(pdf_id: str, pdf_path: str):
     3. Generate an embedding for each chunk.
     4. Persist the generated embeddings.
 
+    In pipelined mode the steps above run as overlapping stages, see
+    `app.chat.ingestion.IngestionPipeline`.
+
     :param pdf_id: The unique identifier for the PDF.
     :param pdf_path: The file path to the PDF.
+    :param pipelined: Run the pipelined ingestion mode. Defaults to the
+        INGESTION_PIPELINED env var.
 
     Example Usage:
 
@@ -24,15 +38,63 @@ def create_embeddings_for_pdf(pdf_id: str, pdf_path: str):
 
     text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100)
 
+    if pipelined is None:
+        pipelined = PIPELINED_INGESTION
+
+    if pipelined:
+        pipeline = build_pipeline(embeddings.embed_documents, upsert_vectors)
+        report = pipeline.run(_iter_chunks(pdf_id, pdf_path, text_splitter))
+        _invalidate_caches(pdf_id)
+        print(f"Loaded {report.chunks} documents from the PDF: {report}")
+        return report
+
     loader = PyPDFLoader(pdf_path)
     docs = loader.load_and_split(text_splitter)
-    
+
     for i, doc in enumerate(docs, start=1):
-        # Safely set the page number from metadata or fallback
-        doc.metadata["page"] = doc.metadata.get("page", i)
-        doc.metadata["pdf_id"] = pdf_id
-        doc.metadata["text"] = doc.page_content
-
-    
-    vector_store.add_documents(docs)
-    print(f"Loaded {len(docs)} documents from the PDF.")
\ No newline at end of file
+        _set_metadata(doc, pdf_id, i)
+
+    # Same ids as the pipelined mode, which the hot pdf cache lists vectors by
+    add_documents(docs, ids=[_chunk_id(pdf_id, i) for i in range(1, len(docs) + 1)])
+    _invalidate_caches(pdf_id)
+    print(f"Loaded {len(docs)} documents from the PDF.")
+
+
+def _iter_chunks(pdf_id: str, pdf_path: str, text_splitter):
+    """
+    Lazily load the PDF page by page and yield (id, chunk) pairs.
+
+    Chunks are produced as soon as their page has been extracted, so only a
+    bounded number of pages is held in memory at once. Set
+    INGESTION_EXTRACT_WORKERS to spread extraction across processes.
+
+    Ids are derived from the pdf_id and chunk position so that re-running
+    ingestion for the same PDF overwrites vectors instead of duplicating them.
+    """
+    i = 0
+    for page in iter_pages(pdf_path, workers=EXTRACT_WORKERS):
+        for doc in text_splitter.split_documents([page]):
+            i += 1
+            _set_metadata(doc, pdf_id, i)
+            yield _chunk_id(pdf_id, i), doc
+
+
+def _chunk_id(pdf_id: str, i: int) -> str:
+    return f"{pdf_id}#{i}"
+
+
+def _invalidate_caches(pdf_id: str):
+    invalidate_document(pdf_id)
+    if answer_cache is not None:
+        answer_cache.invalidate(pdf_id)
+    invalidate_hot_document(pdf_id)
+
+
+def _set_metadata(doc, pdf_id: str, i: int):
+    # Safely set the page number from metadata or fallback
+    doc.metadata["page"] = doc.metadata.get("page", i)
+    doc.metadata["pdf_id"] = pdf_id
+    # Position of the chunk in the document, lets the context packer merge
+    # neighbouring chunks
+    doc.metadata["chunk"] = i
+    doc.metadata["text"] = doc.page_content
@@ -0,0 +1,266 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+
+def _pack(vector: List[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def _unpack(data: bytes) -> List[float]:
+    vector = array("f")
+    vector.frombytes(data)
+    return vector.tolist()
+
+
+class DiskEmbeddingCache:
+    """
+    Embedding cache stored in a local sqlite file.
+
+    Vectors are stored as packed float32. Once the stored vectors exceed
+    `max_bytes` the least recently used entries are evicted until the cache
+    is back under 90% of the limit.
+
+    The connection is opened on first use and reopened in a forked child
+    (a Celery prefork worker), which must not share its parent's sqlite
+    connection.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._connect_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._pid != os.getpid():
+            with self._connect_lock:
+                if self._pid != os.getpid():
+                    # A lock copied by fork may be held by a thread that
+                    # doesn't exist in this process
+                    self._lock = threading.Lock()
+                    self._conn = self._connect()
+                    self._pid = os.getpid()
+        return self._conn
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                accessed_on REAL NOT NULL
+            )"""
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_accessed_on ON embeddings (accessed_on)"
+        )
+        conn.commit()
+        return conn
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        # Stay well below sqlite's limit on bound parameters per statement
+        for i in range(0, len(keys), 500):
+            found.update(self._get_many(keys[i : i + 500]))
+        return found
+
+    def _get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        if not keys:
+            return {}
+        placeholders = ",".join("?" * len(keys))
+        conn = self._connection()
+        with self._lock:
+            rows = conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                keys,
+            ).fetchall()
+            if rows:
+                conn.execute(
+                    f"UPDATE embeddings SET accessed_on = ? WHERE key IN ({placeholders})",
+                    [time.time(), *keys],
+                )
+                conn.commit()
+        return {key: _unpack(vector) for key, vector in rows}
+
+    def set_many(self, items: Dict[str, List[float]]) -> None:
+        if not items:
+            return
+        now = time.time()
+        rows = []
+        for key, vector in items.items():
+            packed = _pack(vector)
+            rows.append((key, packed, len(packed), now))
+        conn = self._connection()
+        with self._lock:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows
+            )
+            self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        (total,) = conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM embeddings"
+        ).fetchone()
+        if total <= self.max_bytes:
+            return
+
+        target = int(self.max_bytes * 0.9)
+        evicted = []
+        for key, size in conn.execute(
+            "SELECT key, size FROM embeddings ORDER BY accessed_on"
+        ):
+            total -= size
+            evicted.append((key,))
+            if total <= target:
+                break
+        conn.executemany("DELETE FROM embeddings WHERE key = ?", evicted)
+
+
+class RedisEmbeddingCache:
+    """
+    Embedding cache stored in Redis, shared by every web and worker process.
+
+    Each vector lives under its own key. A sorted set tracks last access time
+    and a counter tracks the total stored bytes, so the least recently used
+    entries can be evicted once `max_bytes` is exceeded.
+    """
+
+    def __init__(self, client, max_bytes: int, prefix: str = "embedding_cache"):
+        self.client = client
+        self.max_bytes = max_bytes
+        self.prefix = prefix
+        self.lru_key = f"{prefix}:lru"
+        self.bytes_key = f"{prefix}:bytes"
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        if not keys:
+            return {}
+        values = self.client.mget([self._key(k) for k in keys])
+        found = {k: _unpack(v) for k, v in zip(keys, values) if v is not None}
+        if found:
+            now = time.time()
+            self.client.zadd(self.lru_key, {k: now for k in found}, xx=True)
+        return found
+
+    def set_many(self, items: Dict[str, List[float]]) -> None:
+        if not items:
+            return
+        now = time.time()
+        pipe = self.client.pipeline()
+        packed = {key: _pack(vector) for key, vector in items.items()}
+        for key, value in packed.items():
+            pipe.set(self._key(key), value, nx=True)
+        created = pipe.execute()
+
+        added = sum(len(packed[k]) for k, ok in zip(packed, created) if ok)
+        pipe.zadd(self.lru_key, {k: now for k in packed})
+        pipe.incrby(self.bytes_key, added)
+        _, total = pipe.execute()
+
+        if total > self.max_bytes:
+            self._evict(total, len(next(iter(packed.values()))))
+
+    def _evict(self, total: int, entry_size: int) -> None:
+        excess = total - int(self.max_bytes * 0.9)
+        count = max(excess // max(entry_size, 1), 1)
+        evicted = self.client.zpopmin(self.lru_key, count)
+        if not evicted:
+            return
+        keys = [self._key(k.decode() if isinstance(k, bytes) else k) for k, _ in evicted]
+        pipe = self.client.pipeline()
+        pipe.delete(*keys)
+        pipe.incrby(self.bytes_key, -entry_size * len(keys))
+        pipe.execute()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Content-addressed cache in front of another Embeddings object.
+
+    Document embeddings are keyed by a hash of the model name and the chunk
+    text, so the same text is only ever sent to the embeddings API once per
+    model regardless of which PDF it came from. Query embeddings are passed
+    straight through.
+    """
+
+    def __init__(self, embeddings: Embeddings, cache, model_name: Optional[str] = None):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model_name = model_name or getattr(embeddings, "model", "")
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self.key(text) for text in texts]
+        found = self.cache.get_many(list(set(keys)))
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self.cache.set_many(computed)
+            found.update(computed)
+
+        with self._lock:
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+
+        return [found[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+def build_cached_embeddings(embeddings: Embeddings) -> Embeddings:
+    """
+    Wrap `embeddings` with the cache backend selected by EMBEDDING_CACHE
+    ("disk", "redis" or "none").
+    """
+    backend = os.getenv("EMBEDDING_CACHE", "disk").lower()
+    max_bytes = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+    if backend == "disk":
+        path = os.getenv("EMBEDDING_CACHE_PATH", "instance/embeddings.sqlite")
+        cache = DiskEmbeddingCache(path, max_bytes)
+    elif backend == "redis":
+        from app.chat.redis import binary_client
+
+        cache = RedisEmbeddingCache(binary_client, max_bytes)
+    else:
+        return embeddings
+
+    return CachedEmbeddings(embeddings, cache)
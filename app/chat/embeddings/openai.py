@@ -1,6 +1,22 @@
 import os
 from langchain_openai import OpenAIEmbeddings
+from app.chat.embeddings.cache import CachedEmbeddings, build_cached_embeddings
+from app.chat.embeddings.query import BatchingQueryEmbeddings
+from app.chat.timing import register_cache_stats
 
-embeddings = OpenAIEmbeddings(
+openai_embeddings = OpenAIEmbeddings(
     openai_api_key=os.getenv("OPENAI_API_KEY")
-)
\ No newline at end of file
+)
+
+embeddings = BatchingQueryEmbeddings(
+    build_cached_embeddings(openai_embeddings),
+    # Questions skip the document cache, the query LRU handles repeats
+    query_embeddings=openai_embeddings,
+    window=float(os.getenv("QUERY_EMBEDDING_BATCH_WINDOW_MS", 10)) / 1000,
+    max_batch=int(os.getenv("QUERY_EMBEDDING_MAX_BATCH", 64)),
+    cache_size=int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", 2048)),
+)
+
+register_cache_stats("query_embedding", embeddings.stats)
+if isinstance(embeddings.embeddings, CachedEmbeddings):
+    register_cache_stats("embedding", embeddings.embeddings.stats)
@@ -0,0 +1,132 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+
+class _Request:
+    def __init__(self, text: str):
+        self.text = text
+        self.done = threading.Event()
+        self.vector: Optional[List[float]] = None
+        self.error: Optional[BaseException] = None
+
+
+class BatchingQueryEmbeddings(Embeddings):
+    """
+    Query embeddings with an LRU cache and cross-request micro-batching.
+
+    Recently embedded questions are answered from an in-process LRU cache.
+    On a miss with no batch being embedded, the question is embedded right
+    away. While a batch is in flight, the first caller to miss waits up to
+    `window` seconds (or until `max_batch` questions are queued) for
+    questions from other threads, then embeds all of them with one
+    `embed_documents` call and hands each caller its vector. A lone user
+    never waits for the window. Identical questions that are already queued
+    share a single slot in the batch.
+
+    Questions are embedded with `query_embeddings`, bypassing the document
+    embedding cache, since the LRU already answers repeats. Document
+    embeddings are passed straight through to `embeddings`.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        query_embeddings: Optional[Embeddings] = None,
+        window: float = 0.01,
+        max_batch: int = 64,
+        cache_size: int = 2048,
+    ):
+        self.embeddings = embeddings
+        self.query_embeddings = query_embeddings or embeddings
+        self.window = window
+        self.max_batch = max_batch
+        self.cache_size = cache_size
+
+        self._lock = threading.Lock()
+        self._batch_ready = threading.Condition(self._lock)
+        self._cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._pending: List[_Request] = []
+        self._inflight: Dict[str, _Request] = {}
+        # Batches being embedded
+        self._running = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.batches = 0
+        self.embedded = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        with self._lock:
+            vector = self._cache.get(text)
+            if vector is not None:
+                self._cache.move_to_end(text)
+                self.hits += 1
+                return vector
+
+            self.misses += 1
+            request = self._inflight.get(text)
+            is_leader = False
+            if request is None:
+                request = _Request(text)
+                self._inflight[text] = request
+                self._pending.append(request)
+                is_leader = len(self._pending) == 1
+                if len(self._pending) >= self.max_batch:
+                    self._batch_ready.notify_all()
+
+            if is_leader:
+                if self._running:
+                    self._batch_ready.wait_for(
+                        lambda: len(self._pending) >= self.max_batch,
+                        timeout=self.window,
+                    )
+                batch, self._pending = self._pending, []
+                self._running += 1
+
+        if is_leader:
+            self._embed_batch(batch)
+
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.vector
+
+    def _embed_batch(self, batch: List[_Request]) -> None:
+        try:
+            vectors = self.query_embeddings.embed_documents([r.text for r in batch])
+        except BaseException as e:
+            vectors = None
+            for request in batch:
+                request.error = e
+
+        with self._lock:
+            self._running -= 1
+            self.batches += 1
+            self.embedded += len(batch)
+            for i, request in enumerate(batch):
+                if vectors is not None:
+                    request.vector = vectors[i]
+                    self._cache[request.text] = vectors[i]
+                self._inflight.pop(request.text, None)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        for request in batch:
+            request.done.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "batches": self.batches,
+                "avg_batch_size": self.embedded / self.batches if self.batches else 0.0,
+            }
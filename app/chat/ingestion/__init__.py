@@ -0,0 +1,27 @@
+import os
+from .extract import iter_pages
+from .pipeline import IngestionPipeline, PipelineReport, StageStats
+
+
+def build_pipeline(embed, upsert) -> IngestionPipeline:
+    """
+    Build an IngestionPipeline configured from the INGESTION_* env vars.
+    """
+    return IngestionPipeline(
+        embed=embed,
+        upsert=upsert,
+        embed_batch_size=int(os.getenv("INGESTION_EMBED_BATCH_SIZE", 64)),
+        upsert_batch_size=int(os.getenv("INGESTION_UPSERT_BATCH_SIZE", 100)),
+        embed_concurrency=int(os.getenv("INGESTION_EMBED_CONCURRENCY", 4)),
+        upsert_concurrency=int(os.getenv("INGESTION_UPSERT_CONCURRENCY", 2)),
+        max_pending_batches=int(os.getenv("INGESTION_MAX_PENDING_BATCHES", 8)),
+    )
+
+
+__all__ = [
+    "IngestionPipeline",
+    "PipelineReport",
+    "StageStats",
+    "build_pipeline",
+    "iter_pages",
+]
@@ -0,0 +1,99 @@
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Tuple
+
+from langchain_core.documents import Document
+from pypdf import PdfReader
+
+
+def count_pages(pdf_path: str) -> int:
+    return len(PdfReader(pdf_path).pages)
+
+
+# Pages extracted with a reader before it is reopened. pypdf caches every
+# object it resolves, so a long-lived reader grows with the pages it has read.
+READER_PAGE_BUDGET = 256
+
+# Per-process reader cache: pdf_path -> (reader, pages extracted so far)
+_readers: Dict[str, Tuple[PdfReader, int]] = {}
+
+
+def _get_reader(pdf_path: str, pages: int) -> PdfReader:
+    reader, used = _readers.get(pdf_path, (None, 0))
+    if reader is None or used >= READER_PAGE_BUDGET:
+        _readers.clear()
+        reader, used = PdfReader(pdf_path), 0
+    _readers[pdf_path] = (reader, used + pages)
+    return reader
+
+
+def extract_page_range(pdf_path: str, start: int, end: int) -> List[str]:
+    """
+    Extract the text of pages [start, end).
+    """
+    reader = _get_reader(pdf_path, end - start)
+    return [reader.pages[i].extract_text() for i in range(start, end)]
+
+
+def iter_pages(
+    pdf_path: str, workers: int = 1, pages_per_task: int = 16
+) -> Iterator[Document]:
+    """
+    Lazily yield one Document per page, in page order.
+
+    Pages are extracted in ranges of `pages_per_task`. With `workers > 1`
+    the ranges are spread across a process pool, with at most two ranges
+    per worker in flight so memory use does not grow with the page count.
+    Metadata matches what PyPDFLoader produces.
+
+    Args:
+        pdf_path: Path to the pdf on disk
+        workers: Number of extraction processes. 1 extracts in-process.
+        pages_per_task: Number of pages handed to a worker at a time
+    """
+    total = count_pages(pdf_path)
+    ranges = [
+        (start, min(start + pages_per_task, total))
+        for start in range(0, total, pages_per_task)
+    ]
+
+    # Daemonic processes (e.g. celery's prefork pool) can't start children
+    if multiprocessing.current_process().daemon:
+        workers = 1
+
+    if workers <= 1:
+        try:
+            for start, end in ranges:
+                yield from _to_documents(
+                    pdf_path, start, extract_page_range(pdf_path, start, end)
+                )
+        finally:
+            _readers.pop(pdf_path, None)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        remaining = iter(ranges)
+
+        for start, end in remaining:
+            pending.append((start, pool.submit(extract_page_range, pdf_path, start, end)))
+            if len(pending) >= workers * 2:
+                break
+
+        while pending:
+            start, future = pending.popleft()
+            texts = future.result()
+            next_range = next(remaining, None)
+            if next_range:
+                pending.append(
+                    (next_range[0], pool.submit(extract_page_range, pdf_path, *next_range))
+                )
+            yield from _to_documents(pdf_path, start, texts)
+
+
+def _to_documents(pdf_path: str, start: int, texts: List[str]) -> Iterator[Document]:
+    for offset, text in enumerate(texts):
+        yield Document(
+            page_content=text, metadata={"source": pdf_path, "page": start + offset}
+        )
@@ -0,0 +1,273 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from queue import Queue
+from threading import Thread
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+EmbedFn = Callable[[List[str]], List[List[float]]]
+UpsertFn = Callable[[List[str], List[List[float]], List[Dict[str, Any]]], None]
+
+_DONE = object()
+
+
+@dataclass
+class StageStats:
+    """
+    Counters for a single pipeline stage.
+
+    `busy` is the summed time spent doing work across all of the stage's
+    workers, `span` is the wall clock time between the stage first starting
+    and last finishing work.
+    """
+
+    name: str
+    chunks: int = 0
+    batches: int = 0
+    busy: float = 0.0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, chunks: int, started_at: float, finished_at: float) -> None:
+        with self._lock:
+            self.chunks += chunks
+            self.batches += 1
+            self.busy += finished_at - started_at
+            if self.started_at is None or started_at < self.started_at:
+                self.started_at = started_at
+            if self.finished_at is None or finished_at > self.finished_at:
+                self.finished_at = finished_at
+
+    @property
+    def span(self) -> float:
+        if self.started_at is None or self.finished_at is None:
+            return 0.0
+        return self.finished_at - self.started_at
+
+    @property
+    def throughput(self) -> float:
+        """Chunks per second over the stage's active span"""
+        return self.chunks / self.span if self.span else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "chunks": self.chunks,
+            "batches": self.batches,
+            "busy_seconds": round(self.busy, 4),
+            "span_seconds": round(self.span, 4),
+            "chunks_per_second": round(self.throughput, 2),
+        }
+
+
+@dataclass
+class PipelineReport:
+    chunks: int
+    elapsed: float
+    stages: Dict[str, StageStats]
+
+    @property
+    def throughput(self) -> float:
+        return self.chunks / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "chunks": self.chunks,
+            "elapsed_seconds": round(self.elapsed, 4),
+            "chunks_per_second": round(self.throughput, 2),
+            "stages": {name: s.as_dict() for name, s in self.stages.items()},
+        }
+
+    def __str__(self) -> str:
+        stages = ", ".join(
+            f"{name}={s.throughput:.1f} chunks/s" for name, s in self.stages.items()
+        )
+        return (
+            f"{self.chunks} chunks in {self.elapsed:.2f}s "
+            f"({self.throughput:.1f} chunks/s; {stages})"
+        )
+
+
+class IngestionPipeline:
+    """
+    Runs extraction, embedding and upserting as overlapping stages.
+
+    Chunks are pulled from the `chunks` iterable on the calling thread and
+    grouped into embedding batches. A pool of embedding workers turns
+    batches into vectors while a pool of upsert workers writes them to the
+    vector store, so the three stages run concurrently. Queues between the
+    stages are bounded, which caps the number of batches held in memory at
+    any one time.
+
+    Args:
+        embed: Callable turning a list of texts into a list of vectors
+        upsert: Callable persisting (ids, vectors, metadatas)
+        embed_batch_size: Number of chunks sent per embedding call
+        upsert_batch_size: Number of vectors written per upsert call
+        embed_concurrency: Number of embedding calls allowed in flight
+        upsert_concurrency: Number of upsert calls allowed in flight
+        max_pending_batches: Bound on the queue in front of each stage
+    """
+
+    def __init__(
+        self,
+        embed: EmbedFn,
+        upsert: UpsertFn,
+        embed_batch_size: int = 64,
+        upsert_batch_size: int = 100,
+        embed_concurrency: int = 4,
+        upsert_concurrency: int = 2,
+        max_pending_batches: int = 8,
+    ):
+        if min(embed_batch_size, upsert_batch_size) < 1:
+            raise ValueError("Batch sizes must be at least 1")
+        if min(embed_concurrency, upsert_concurrency, max_pending_batches) < 1:
+            raise ValueError("Concurrency and queue bounds must be at least 1")
+
+        self.embed = embed
+        self.upsert = upsert
+        self.embed_batch_size = embed_batch_size
+        self.upsert_batch_size = upsert_batch_size
+        self.embed_concurrency = embed_concurrency
+        self.upsert_concurrency = upsert_concurrency
+        self.max_pending_batches = max_pending_batches
+
+    def run(
+        self, chunks: Iterable[Tuple[str, Document]]
+    ) -> PipelineReport:
+        """
+        Push every (id, document) pair through the pipeline.
+
+        Blocks until every chunk has been upserted. If any stage raises, the
+        remaining work is drained without being processed and the first
+        error is re-raised.
+        """
+        stages = {
+            name: StageStats(name) for name in ("extract", "embed", "upsert")
+        }
+        errors: List[BaseException] = []
+        embed_queue: Queue = Queue(maxsize=self.max_pending_batches)
+        upsert_queue: Queue = Queue(maxsize=self.max_pending_batches)
+
+        embed_workers = [
+            Thread(
+                target=self._embed_worker,
+                args=(embed_queue, upsert_queue, stages["embed"], errors),
+                daemon=True,
+            )
+            for _ in range(self.embed_concurrency)
+        ]
+        upsert_workers = [
+            Thread(
+                target=self._upsert_worker,
+                args=(upsert_queue, stages["upsert"], errors),
+                daemon=True,
+            )
+            for _ in range(self.upsert_concurrency)
+        ]
+
+        started = time.perf_counter()
+        for worker in embed_workers + upsert_workers:
+            worker.start()
+
+        try:
+            for batch in self._extract(chunks, stages["extract"]):
+                if errors:
+                    break
+                embed_queue.put(batch)
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            for _ in embed_workers:
+                embed_queue.put(_DONE)
+            for worker in embed_workers:
+                worker.join()
+            for _ in upsert_workers:
+                upsert_queue.put(_DONE)
+            for worker in upsert_workers:
+                worker.join()
+
+        if errors:
+            raise errors[0]
+
+        return PipelineReport(
+            chunks=stages["upsert"].chunks,
+            elapsed=time.perf_counter() - started,
+            stages=stages,
+        )
+
+    def _extract(
+        self, chunks: Iterable[Tuple[str, Document]], stats: StageStats
+    ) -> Iterator[List[Tuple[str, Document]]]:
+        iterator = iter(chunks)
+        while True:
+            batch = []
+            started = time.perf_counter()
+            for item in iterator:
+                batch.append(item)
+                if len(batch) >= self.embed_batch_size:
+                    break
+            if not batch:
+                return
+            stats.record(len(batch), started, time.perf_counter())
+            yield batch
+
+    def _embed_worker(
+        self,
+        embed_queue: Queue,
+        upsert_queue: Queue,
+        stats: StageStats,
+        errors: List[BaseException],
+    ) -> None:
+        while True:
+            batch = embed_queue.get()
+            if batch is _DONE:
+                return
+            if errors:
+                continue
+            try:
+                started = time.perf_counter()
+                vectors = self.embed([doc.page_content for _, doc in batch])
+                stats.record(len(batch), started, time.perf_counter())
+                upsert_queue.put(
+                    [(id, vector, doc) for (id, doc), vector in zip(batch, vectors)]
+                )
+            except BaseException as e:
+                errors.append(e)
+
+    def _upsert_worker(
+        self, upsert_queue: Queue, stats: StageStats, errors: List[BaseException]
+    ) -> None:
+        pending = []
+        while True:
+            batch = upsert_queue.get()
+            if batch is _DONE:
+                break
+            if errors:
+                continue
+            pending.extend(batch)
+            while len(pending) >= self.upsert_batch_size and not errors:
+                self._flush(pending[: self.upsert_batch_size], stats, errors)
+                pending = pending[self.upsert_batch_size :]
+
+        if pending and not errors:
+            self._flush(pending, stats, errors)
+
+    def _flush(
+        self,
+        items: List[Tuple[str, List[float], Document]],
+        stats: StageStats,
+        errors: List[BaseException],
+    ) -> None:
+        try:
+            started = time.perf_counter()
+            self.upsert(
+                [id for id, _, _ in items],
+                [vector for _, vector, _ in items],
+                [doc.metadata for _, _, doc in items],
+            )
+            stats.record(len(items), started, time.perf_counter())
+        except BaseException as e:
+            errors.append(e)
@@ -1,18 +1,42 @@
 from langchain_openai import ChatOpenAI
+from app.chat.pool import component_pool, http_client, http_async_client
 
-def build_llm(chat_args, model_name) -> ChatOpenAI:
+def build_llm(chat_args, model_name, streaming=True, temperature=None) -> ChatOpenAI:
     """
-    Build a ChatOpenAI instance with specified parameters.
+    Return the shared ChatOpenAI instance for the given parameters.
+
+    Instances are pooled per configuration and reuse keep-alive HTTP
+    connection pools (one per event loop for async calls), so building a
+    chat doesn't pay for client setup or a new TLS handshake. Callbacks are
+    passed per call, never bound here.
 
     Args:
-        chat_args: Object containing temperature and streaming flag
+        chat_args: Object containing temperature and streaming flag (may be
+            None outside of a chat, e.g. in background tasks)
+        model_name: Name of the OpenAI model
+        streaming: Whether the model streams tokens
+        temperature: Sampling temperature, the OpenAI default when None
 
     Returns:
         ChatOpenAI: Configured ChatOpenAI instance
     """
-    print(f"Building LLM with model: {model_name}, streaming: {chat_args.streaming}")
-    return ChatOpenAI(
-        # streaming=chat_args.streaming,
-        streaming=True,
+    print(f"Building LLM with model: {model_name}, streaming: {streaming}")
+
+    def factory():
+        kwargs = {} if temperature is None else {"temperature": temperature}
+        return ChatOpenAI(
+            # streaming=chat_args.streaming,
+            streaming=streaming,
+            model_name=model_name,
+            http_client=http_client,
+            http_async_client=http_async_client,
+            **kwargs,
+        )
+
+    return component_pool.get(
+        "chat_openai",
+        factory,
         model_name=model_name,
-    )
\ No newline at end of file
+        streaming=streaming,
+        temperature=temperature,
+    )
@@ -0,0 +1,152 @@
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+from app.chat.redis import client
+
+# Appends a message to a cached history, if the conversation is cached.
+# The version is bumped either way so a fill that read the database before
+# this message was written is discarded.
+_APPEND = """
+redis.call('INCR', KEYS[3])
+redis.call('EXPIRE', KEYS[3], ARGV[3])
+if redis.call('EXISTS', KEYS[1]) == 0 and redis.call('EXISTS', KEYS[2]) == 0 then
+    return 0
+end
+redis.call('RPUSH', KEYS[1], ARGV[1])
+if redis.call('LLEN', KEYS[1]) > tonumber(ARGV[2]) then
+    redis.call('LTRIM', KEYS[1], -tonumber(ARGV[2]), -1)
+    redis.call('DEL', KEYS[2])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    redis.call('EXPIRE', KEYS[2], ARGV[3])
+end
+return 1
+"""
+
+# Replaces a cached history with messages read from the database, unless a
+# message was added since they were read
+_FILL = """
+if (redis.call('GET', KEYS[3]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('DEL', KEYS[1], KEYS[2])
+if #ARGV > 3 then
+    redis.call('RPUSH', KEYS[1], unpack(ARGV, 4))
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+end
+if ARGV[2] == '1' then
+    redis.call('SET', KEYS[2], '1', 'EX', ARGV[3])
+end
+return 1
+"""
+
+
+class HistoryCache:
+    """
+    Redis cache of the most recent messages of each conversation.
+
+    A conversation's last `max_messages` messages are kept in a list,
+    oldest first, plus a flag saying whether the list holds the whole
+    conversation. New messages are appended as they are written to the
+    database (write-through), so after the first read a conversation's
+    history is served without touching the database no matter how long it
+    grows.
+
+    Args:
+        client: Redis client (decoding responses)
+        max_messages: Messages kept per conversation
+        ttl: Seconds a conversation stays cached after its last message
+    """
+
+    def __init__(
+        self,
+        client,
+        max_messages: int = 50,
+        ttl: int = 3600,
+        prefix: str = "history_cache",
+    ):
+        self.client = client
+        self.max_messages = max_messages
+        self.ttl = ttl
+        self.prefix = prefix
+        self._append = client.register_script(_APPEND)
+        self._fill = client.register_script(_FILL)
+
+    def _keys(self, conversation_id: str) -> List[str]:
+        key = f"{self.prefix}:{conversation_id}"
+        return [key, f"{key}:complete", f"{key}:version"]
+
+    def get(
+        self, conversation_id: str, limit: Optional[int] = None
+    ) -> Tuple[Optional[List[Dict[str, str]]], int]:
+        """
+        Returns the conversation's last `limit` messages (all of them when
+        limit is None), or None when the cache can't answer, and the
+        conversation's version, which should be passed back to `fill`.
+        """
+        key, complete_key, version_key = self._keys(conversation_id)
+        pipe = self.client.pipeline()
+        pipe.lrange(key, 0, -1)
+        pipe.exists(complete_key)
+        pipe.get(version_key)
+        messages, complete, version = pipe.execute()
+        version = int(version or 0)
+
+        if not complete and (limit is None or len(messages) < limit):
+            return None, version
+
+        if limit is not None:
+            messages = messages[-limit:] if limit else []
+        return [json.loads(m) for m in messages], version
+
+    def fill(
+        self,
+        conversation_id: str,
+        messages: List[Dict[str, str]],
+        complete: bool,
+        version: int,
+    ) -> None:
+        """
+        Caches the last messages of a conversation read from the database.
+        `complete` says whether they are all of the conversation's messages.
+        """
+        complete = complete and len(messages) <= self.max_messages
+        self._fill(
+            keys=self._keys(conversation_id),
+            args=[
+                version,
+                "1" if complete else "0",
+                self.ttl,
+                *[json.dumps(m) for m in messages[-self.max_messages :]],
+            ],
+        )
+
+    def append(self, conversation_id: str, role: str, content: str) -> None:
+        self._append(
+            keys=self._keys(conversation_id),
+            args=[
+                json.dumps({"role": role, "content": content}),
+                self.max_messages,
+                self.ttl,
+            ],
+        )
+
+    def invalidate(self, conversation_id: str) -> None:
+        key, complete_key, version_key = self._keys(conversation_id)
+        pipe = self.client.pipeline()
+        pipe.delete(key, complete_key)
+        pipe.incr(version_key)
+        pipe.execute()
+
+
+history_cache = (
+    HistoryCache(
+        client,
+        max_messages=int(os.getenv("HISTORY_CACHE_MAX_MESSAGES", 50)),
+        ttl=int(os.getenv("HISTORY_CACHE_TTL_SECONDS", 3600)),
+    )
+    if os.getenv("HISTORY_CACHE", "true").lower() in ("1", "true", "yes")
+    else None
+)
@@ -1,28 +1,111 @@
 from langchain_core.chat_history import BaseChatMessageHistory
-from langchain_core.messages import BaseMessage
-from typing import List
+from langchain_core.messages import BaseMessage, messages_from_dict
+from typing import Dict, List, Optional, Sequence
 
+from app.chat.memories.histories.cache import history_cache
+from app.chat.timing import timed
 from app.web.api import (
     get_messages_by_conversation_id,
-    add_message_to_conversation
+    add_turn_to_conversation
 )
+from app.web.write_behind import turn_writer
+
+if turn_writer is not None and history_cache is not None:
+    # A turn the writer gives up on is already in the cache, which would
+    # otherwise keep serving it until it expires
+    turn_writer.on_drop = history_cache.invalidate
 
 class SqlMessageHistory(BaseChatMessageHistory):
-    def __init__(self, conversation_id: str):
+    """
+    Chat history stored in the database.
+
+    Args:
+        conversation_id: The conversation the messages belong to
+        window: Only the last `window` messages are read, the limit is
+            applied in the query (or the cache) rather than after loading
+            the whole conversation
+        components: The llm, retriever and memory the conversation uses,
+            stored with the next turn's messages (set by build_chat)
+    """
+
+    def __init__(self, conversation_id: str, window: Optional[int] = None):
         self.conversation_id = conversation_id
+        self.window = window
+        self.components: Optional[Dict[str, str]] = None
     
     @property
     def messages(self) -> List[BaseMessage]:
-        """Return messages as a list"""
-        msgs = get_messages_by_conversation_id(self.conversation_id)
-        return list(msgs) if msgs else []
+        """Return messages as a list, oldest first"""
+        if turn_writer is not None:
+            # Turns still queued for the database would be missing
+            turn_writer.wait(self.conversation_id)
+
+        if history_cache is None:
+            return get_messages_by_conversation_id(self.conversation_id, self.window)
+
+        try:
+            cached, version = history_cache.get(self.conversation_id, self.window)
+        except Exception as e:
+            print(f"[SqlMessageHistory] History cache read failed: {e}")
+            return get_messages_by_conversation_id(self.conversation_id, self.window)
+        if cached is not None:
+            return _to_messages(cached)
+
+        # Read enough for the cache to serve any window from now on and to
+        # tell whether it holds the whole conversation
+        limit = history_cache.max_messages + 1
+        if self.window is not None and self.window > limit:
+            limit = self.window
+        msgs = get_messages_by_conversation_id(self.conversation_id, limit)
+
+        try:
+            history_cache.fill(
+                self.conversation_id,
+                [{"role": m.type, "content": m.content} for m in msgs],
+                complete=len(msgs) < limit,
+                version=version,
+            )
+        except Exception as e:
+            print(f"[SqlMessageHistory] History cache fill failed: {e}")
+
+        if self.window is not None:
+            return msgs[-self.window :] if self.window else []
+        if len(msgs) < limit:
+            return msgs
+        return get_messages_by_conversation_id(self.conversation_id)
     
     def add_message(self, message: BaseMessage) -> None:
-        add_message_to_conversation(
-            conversation_id=self.conversation_id,
-            role=message.type,
-            content=message.content
-        )
+        self.add_messages([message])
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        """
+        Stores a turn's messages (the memory saves the question and the
+        answer together) and the pending components in one transaction,
+        or queues them for the write-behind writer
+        """
+        turn = [(m.type, m.content) for m in messages]
+        with timed("persist"):
+            if turn_writer is not None:
+                turn_writer.submit(self.conversation_id, turn, self.components)
+            else:
+                add_turn_to_conversation(
+                    self.conversation_id, turn, components=self.components
+                )
+        self.components = None
+
+        if history_cache is None:
+            return
+        try:
+            for role, content in turn:
+                history_cache.append(self.conversation_id, role, content)
+        except Exception as e:
+            print(f"[SqlMessageHistory] History cache write failed: {e}")
 
     def clear(self) -> None:
-        pass
\ No newline at end of file
+        pass
+
+
+def _to_messages(messages) -> List[BaseMessage]:
+    return messages_from_dict(
+        [{"type": m["role"], "data": {"content": m["content"]}} for m in messages]
+    )
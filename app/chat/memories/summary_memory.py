@@ -0,0 +1,102 @@
+import os
+from typing import Any, Dict
+
+from langchain.memory import ConversationBufferWindowMemory
+from langchain.memory.prompt import SUMMARY_PROMPT
+from langchain_core.messages import SystemMessage, get_buffer_string
+
+from app.chat.llms.chatopenai import build_llm
+from app.chat.memories.histories.sql_history import SqlMessageHistory
+from app.web.api import (
+    get_conversation_summary,
+    get_messages_after,
+    set_conversation_summary,
+)
+
+# Number of exchanges (question and answer) kept verbatim next to the summary
+SUMMARY_WINDOW_SIZE = int(os.getenv("SUMMARY_MEMORY_WINDOW", 2))
+SUMMARY_MODEL = os.getenv("SUMMARY_MEMORY_MODEL", "gpt-3.5-turbo")
+
+
+class SummaryWindowMemory(ConversationBufferWindowMemory):
+    """
+    Window memory that prepends the conversation's rolling summary.
+
+    The chain sees the summary of everything before the window plus the
+    last `k` exchanges verbatim, so the prompt stays the same size however
+    long the conversation gets. After each exchange a background task folds
+    the messages that left the window into the summary.
+    """
+
+    conversation_id: str
+
+    def load_memory_variables(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        messages = self.buffer_as_messages
+        summary, _ = get_conversation_summary(self.conversation_id)
+        if summary:
+            messages = [
+                SystemMessage(content=f"Summary of the earlier conversation: {summary}")
+            ] + messages
+
+        if self.return_messages:
+            return {self.memory_key: messages}
+        return {
+            self.memory_key: get_buffer_string(
+                messages, human_prefix=self.human_prefix, ai_prefix=self.ai_prefix
+            )
+        }
+
+    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, str]) -> None:
+        super().save_context(inputs, outputs)
+
+        # Imported here, the tasks import app.chat
+        from app.web.tasks.summaries import summarize_conversation
+
+        try:
+            summarize_conversation.delay(self.conversation_id)
+        except Exception as e:
+            print(f"[SummaryWindowMemory] Couldn't queue summary update: {e}")
+
+
+def summary_memory_builder(chat_args):
+    return SummaryWindowMemory(
+        memory_key="chat_history",
+        output_key="answer",
+        return_messages=True,
+        chat_memory=SqlMessageHistory(
+            conversation_id=chat_args.conversation_id,
+            window=SUMMARY_WINDOW_SIZE * 2,
+        ),
+        k=SUMMARY_WINDOW_SIZE,
+        conversation_id=chat_args.conversation_id,
+    )
+
+
+def update_summary(conversation_id: str, window: int = SUMMARY_WINDOW_SIZE) -> bool:
+    """
+    Folds the messages that are older than the last `window` exchanges and
+    not yet summarized into the conversation's summary.
+
+    Only the new messages are sent to the LLM, with the current summary.
+    Returns whether the summary changed; when two updates race, the one
+    that stores first wins and the other is dropped.
+    """
+    summary, summarized = get_conversation_summary(conversation_id)
+    messages = get_messages_after(conversation_id, summarized)
+    new_messages = messages[: len(messages) - window * 2]
+    if not new_messages:
+        return False
+
+    llm = build_llm(None, SUMMARY_MODEL, streaming=False, temperature=0)
+    new_summary = llm.invoke(
+        SUMMARY_PROMPT.format(
+            summary=summary or "", new_lines=get_buffer_string(new_messages)
+        )
+    ).content
+
+    return set_conversation_summary(
+        conversation_id,
+        new_summary,
+        summarized + len(new_messages),
+        previous=summarized,
+    )
@@ -1,13 +1,17 @@
 from langchain.memory import ConversationBufferWindowMemory
 from app.chat.memories.histories.sql_history import SqlMessageHistory
 
+# Number of exchanges (question and answer) kept in the prompt
+WINDOW_SIZE = 2
+
 def window_buffer_memory_builder(chat_args):
     return ConversationBufferWindowMemory(
         memory_key="chat_history",
         output_key="answer",
         return_messages=True,
         chat_memory=SqlMessageHistory(
-            conversation_id=chat_args.conversation_id
+            conversation_id=chat_args.conversation_id,
+            window=WINDOW_SIZE * 2,
         ),
-        k=2
-    )
\ No newline at end of file
+        k=WINDOW_SIZE
+    )
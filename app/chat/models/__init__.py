@@ -1,3 +1,5 @@
+from typing import Dict, Optional
+
 from pydantic import BaseModel, Extra
 
 
@@ -10,5 +12,10 @@ class Metadata(BaseModel, extra=Extra.allow):
 class ChatArgs(BaseModel, extra=Extra.allow):
     conversation_id: str
     pdf_id: str
+    # Key the pdf's vectors are stored under, shared between identical pdfs
+    document_id: str
     metadata: Metadata
     streaming: bool
+    # llm, retriever and memory the conversation already uses, read from the
+    # conversation the request loaded. None for those not picked yet.
+    components: Dict[str, Optional[str]] = {}
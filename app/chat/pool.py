@@ -0,0 +1,102 @@
+import asyncio
+import os
+import threading
+import weakref
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+import httpx
+
+
+class ComponentPool:
+    """
+    Process-wide registry of long-lived chat components.
+
+    Components are keyed by a name plus the configuration they were built
+    with and are created once, on first use. Only stateless components
+    (LLM clients, prompts) belong here; per-conversation state such as
+    memory, the retriever's document filter and callbacks is bound when the
+    chain is built for a message.
+    """
+
+    def __init__(self):
+        self._components: Dict[Tuple[str, Tuple], Any] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str, factory: Callable[[], Any], **config: Hashable) -> Any:
+        key = (name, tuple(sorted(config.items())))
+        component = self._components.get(key)
+        if component is not None:
+            return component
+
+        with self._lock:
+            if key not in self._components:
+                self._components[key] = factory()
+            return self._components[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._components.clear()
+
+    def __len__(self) -> int:
+        return len(self._components)
+
+
+component_pool = ComponentPool()
+
+
+class LoopLocalAsyncClient(httpx.AsyncClient):
+    """
+    AsyncClient that sends each request through a client of the running
+    event loop, in the current process.
+
+    An httpx.AsyncClient's connections belong to the loop that opened them,
+    and connections inherited through fork are shared with the parent. The
+    pooled ChatOpenAI instances are built once, outside any loop, so they
+    get this client and the real one is picked per request: one per loop,
+    dropped with its loop, and none carried over a fork.
+
+    Args:
+        **kwargs: Passed to every httpx.AsyncClient created
+    """
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._kwargs = kwargs
+        self._pid = os.getpid()
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._clients_lock = threading.Lock()
+
+    def _current(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        with self._clients_lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._clients = weakref.WeakKeyDictionary()
+            client = self._clients.get(loop)
+            if client is None:
+                client = self._clients[loop] = httpx.AsyncClient(**self._kwargs)
+            return client
+
+    async def send(self, request: httpx.Request, **kwargs: Any) -> httpx.Response:
+        return await self._current().send(request, **kwargs)
+
+    async def aclose(self) -> None:
+        """Closes the running loop's client"""
+        with self._clients_lock:
+            client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+# Shared by every pooled OpenAI client so connections (and their TLS
+# sessions) are kept alive and reused across messages
+_limits = httpx.Limits(
+    max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", 100)),
+    max_keepalive_connections=int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", 20)),
+    keepalive_expiry=float(os.getenv("OPENAI_KEEPALIVE_EXPIRY_SECONDS", 60)),
+)
+_timeout = httpx.Timeout(float(os.getenv("OPENAI_TIMEOUT_SECONDS", 60)), connect=10)
+
+http_client = httpx.Client(limits=_limits, timeout=_timeout)
+http_async_client = LoopLocalAsyncClient(limits=_limits, timeout=_timeout)
@@ -7,4 +7,8 @@ redis_uri = os.getenv("REDIS_URI", "redis://localhost:6379/0")
 client = redis.from_url(
     redis_uri,
     decode_responses=True,
-)
\ No newline at end of file
+)
+
+# Separate connection for values that are raw bytes (e.g. packed vectors)
+# and must not be decoded as utf-8
+binary_client = redis.from_url(redis_uri)
@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from app.chat.redis import client
+from app.chat.timing import register_cache_stats
+
+
+def normalize_question(question: str) -> str:
+    question = re.sub(r"\s+", " ", question.strip().lower())
+    return question.rstrip("?!. ")
+
+
+class RetrievalCache:
+    """
+    Redis cache of retrieved documents keyed by (document, k, question).
+
+    Every document has a generation counter that is bumped when the document
+    is re-ingested. Cached entries record the generation they were built
+    from and are ignored once it changes, so invalidating a document is a
+    single INCR no matter how many questions were cached for it.
+
+    Hit and miss counts are kept per process. Latency saved is estimated as
+    the running average latency of a miss, counted once per hit.
+    """
+
+    def __init__(self, client, ttl: int = 3600, prefix: str = "retrieval_cache"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._miss_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def _generation_key(self, document_id: str) -> str:
+        return f"{self.prefix}:{document_id}:generation"
+
+    def _key(self, document_id: str, k: int, question: str) -> str:
+        digest = hashlib.sha1(normalize_question(question).encode("utf-8")).hexdigest()
+        return f"{self.prefix}:{document_id}:{k}:{digest}"
+
+    def get(
+        self, document_id: str, k: int, question: str
+    ) -> Tuple[Optional[List[Document]], int]:
+        """
+        Returns the cached documents (None on a miss) and the document's
+        current generation, which should be passed back to `set`.
+        """
+        value, generation = self.client.mget(
+            self._key(document_id, k, question), self._generation_key(document_id)
+        )
+        generation = int(generation or 0)
+        if value is None:
+            return None, generation
+
+        entry = json.loads(value)
+        if entry["generation"] != generation:
+            return None, generation
+
+        return [Document(**doc) for doc in entry["documents"]], generation
+
+    def set(
+        self,
+        document_id: str,
+        k: int,
+        question: str,
+        documents: List[Document],
+        generation: int,
+    ) -> None:
+        entry = {
+            "generation": generation,
+            "documents": [
+                {"page_content": d.page_content, "metadata": d.metadata}
+                for d in documents
+            ],
+        }
+        self.client.set(
+            self._key(document_id, k, question), json.dumps(entry), ex=self.ttl
+        )
+
+    def invalidate(self, document_id: str) -> None:
+        self.client.incr(self._generation_key(document_id))
+
+    def record_hit(self) -> None:
+        with self._lock:
+            self.hits += 1
+            if self.misses:
+                self.saved_seconds += self._miss_seconds / self.misses
+
+    def record_miss(self, seconds: float) -> None:
+        with self._lock:
+            self.misses += 1
+            self._miss_seconds += seconds
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "saved_seconds": round(self.saved_seconds, 4),
+            }
+
+
+class CachedRetriever(BaseRetriever):
+    """
+    Returns stored documents for repeated questions about a document,
+    without embedding the question or querying the vector store.
+    """
+
+    retriever: BaseRetriever
+    cache: Any
+    document_id: str
+    k: int
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        try:
+            documents, generation = self.cache.get(self.document_id, self.k, query)
+        except Exception as e:
+            print(f"[CachedRetriever] Cache read failed: {e}")
+            return self.retriever.invoke(
+                query, config={"callbacks": run_manager.get_child()}
+            )
+
+        if documents is not None:
+            self.cache.record_hit()
+            return documents
+
+        started = time.perf_counter()
+        documents = self.retriever.invoke(
+            query, config={"callbacks": run_manager.get_child()}
+        )
+        self.cache.record_miss(time.perf_counter() - started)
+
+        try:
+            self.cache.set(self.document_id, self.k, query, documents, generation)
+        except Exception as e:
+            print(f"[CachedRetriever] Cache write failed: {e}")
+        return documents
+
+
+retrieval_cache = (
+    RetrievalCache(client, ttl=int(os.getenv("RETRIEVAL_CACHE_TTL_SECONDS", 3600)))
+    if os.getenv("RETRIEVAL_CACHE", "true").lower() in ("1", "true", "yes")
+    else None
+)
+if retrieval_cache is not None:
+    register_cache_stats("retrieval", retrieval_cache.stats)
+
+
+def build_cached_retriever(chat_args, k, build_retriever):
+    """
+    Build a retriever with `build_retriever` and put the retrieval cache in
+    front of it.
+    """
+    retriever = build_retriever(chat_args, k=k)
+    if retrieval_cache is None:
+        return retriever
+
+    return CachedRetriever(
+        retriever=retriever,
+        cache=retrieval_cache,
+        document_id=chat_args.document_id,
+        k=k,
+    )
+
+
+def invalidate_document(document_id: str) -> None:
+    if retrieval_cache is not None:
+        retrieval_cache.invalidate(document_id)
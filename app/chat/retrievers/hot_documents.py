@@ -0,0 +1,358 @@
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from app.chat.redis import client
+
+# Rows scanned at a time when scoring, bounds the float32 scratch space
+_BLOCK_ROWS = 4096
+
+
+class QuantizedDocument:
+    """
+    A document's chunk vectors held as an int8 matrix.
+
+    Each unit-normalized row is scaled into [-127, 127] with its own float32
+    scale factor, using a quarter of the memory of float32 vectors. Search
+    scans every row with an int8-quantized query, then re-scores the best
+    candidates with the float32 query against their dequantized rows. That
+    removes the query's quantization error, the rows' own error remains, so
+    scores are close to but not exactly the float32 cosine.
+    """
+
+    def __init__(self, vectors: np.ndarray, metadatas: List[Dict[str, Any]]):
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+        self.codes, self.scales = _quantize(vectors)
+        self.metadatas = metadatas
+        self.loaded_at = time.monotonic()
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.scales.nbytes
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def search(
+        self, query: List[float], k: int, rescore_factor: int = 4
+    ) -> List[Tuple[Document, float]]:
+        if not len(self):
+            return []
+
+        query = _normalize(np.asarray([query], dtype=np.float32))[0]
+        query_codes, query_scale = _quantize(query[None, :])
+        query_codes = query_codes[0].astype(np.float32)
+
+        approx = np.empty(len(self), dtype=np.float32)
+        for start in range(0, len(self), _BLOCK_ROWS):
+            block = self.codes[start : start + _BLOCK_ROWS].astype(np.float32)
+            approx[start : start + len(block)] = block @ query_codes
+        approx *= self.scales * query_scale[0]
+
+        candidates = min(len(self), max(k * rescore_factor, k))
+        if candidates < len(self):
+            rows = np.argpartition(-approx, candidates - 1)[:candidates]
+        else:
+            rows = np.arange(len(self))
+
+        exact = (self.codes[rows].astype(np.float32) * self.scales[rows, None]) @ query
+        order = np.argsort(-exact)[:k]
+        return [
+            (
+                Document(
+                    page_content=self.metadatas[rows[i]].get("text", ""),
+                    metadata=self.metadatas[rows[i]],
+                ),
+                float(exact[i]),
+            )
+            for i in order
+        ]
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+def _quantize(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales[scales == 0] = 1
+    codes = np.round(vectors / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+class HotDocumentCache:
+    """
+    Tracks how often each document is queried and keeps the vectors of the
+    busiest ones in memory.
+
+    A document becomes hot once it is queried `threshold` times within
+    `window` seconds. Its vectors are then fetched once, in a background
+    thread, and kept until they are older than `ttl` or evicted to keep the
+    total size under `max_bytes` (least recently used first).
+
+    If `fetch` raises NotImplementedError (the store can't list a
+    document's vectors) the cache turns itself off and every query goes to
+    the wrapped retriever.
+
+    Query counts are kept for at most `max_tracked` documents, the least
+    recently queried are dropped first.
+
+    Re-ingesting a document happens in another process (the worker), which
+    publishes the document id on `channel`. Once it holds a document, the
+    cache listens there and drops what it's told to; the ttl bounds how
+    stale a copy gets if a message is missed.
+
+    Args:
+        fetch: Callable returning (ids, vectors, metadatas) for a document
+        threshold: Queries within `window` that make a document hot
+        window: Length of the sliding window in seconds
+        ttl: Seconds a loaded document is served before being refetched
+        max_bytes: Memory cap across all loaded documents
+        max_tracked: Most documents whose queries are counted
+        channel: Redis pub/sub channel of invalidated document ids, None to
+            not listen
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str], Tuple[List[str], List[List[float]], List[Dict[str, Any]]]],
+        threshold: int = 5,
+        window: float = 300,
+        ttl: float = 3600,
+        max_bytes: int = 256 * 1024 * 1024,
+        max_tracked: int = 10000,
+        channel: Optional[str] = None,
+    ):
+        self.fetch = fetch
+        self.threshold = threshold
+        self.window = window
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_tracked = max_tracked
+        self.channel = channel
+
+        self._lock = threading.Lock()
+        self._hits: "OrderedDict[str, deque]" = OrderedDict()
+        self._documents: "OrderedDict[str, QuantizedDocument]" = OrderedDict()
+        self._loading = set()
+        # Loading documents invalidated meanwhile, their load is dropped
+        self._stale = set()
+        # Documents that couldn't be fetched, with the time of the attempt
+        self._unavailable: Dict[str, float] = {}
+        self.enabled = True
+        self._listener = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def nbytes(self) -> int:
+        return sum(d.nbytes for d in self._documents.values())
+
+    def get(self, document_id: str) -> Optional[QuantizedDocument]:
+        """
+        Record a query against the document and return its vectors if they
+        are loaded. Starts a background load once the document is hot.
+        """
+        if not self.enabled:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            document = self._documents.get(document_id)
+            if document and now - document.loaded_at < self.ttl:
+                self._documents.move_to_end(document_id)
+                self.hits += 1
+                return document
+            if document:
+                del self._documents[document_id]
+
+            self.misses += 1
+            hits = self._hits.setdefault(document_id, deque())
+            self._hits.move_to_end(document_id)
+            hits.append(now)
+            while hits and now - hits[0] > self.window:
+                hits.popleft()
+            while len(self._hits) > self.max_tracked:
+                self._hits.popitem(last=False)
+            if len(self._unavailable) > self.max_tracked:
+                self._unavailable = {
+                    id: at
+                    for id, at in self._unavailable.items()
+                    if now - at < self.ttl
+                }
+
+            should_load = (
+                len(hits) >= self.threshold
+                and document_id not in self._loading
+                and now - self._unavailable.get(document_id, -self.ttl) >= self.ttl
+            )
+            if should_load:
+                self._loading.add(document_id)
+
+        if should_load:
+            threading.Thread(target=self.load, args=(document_id,), daemon=True).start()
+        return None
+
+    def load(self, document_id: str) -> None:
+        # Before fetching, so an invalidation during the fetch isn't missed
+        self._listen()
+        try:
+            _, vectors, metadatas = self.fetch(document_id)
+            if not len(vectors):
+                with self._lock:
+                    self._unavailable[document_id] = time.monotonic()
+                return
+
+            document = QuantizedDocument(vectors, metadatas)
+            with self._lock:
+                if document_id in self._stale:
+                    return
+                if document.nbytes > self.max_bytes:
+                    self._unavailable[document_id] = time.monotonic()
+                    return
+                self._documents[document_id] = document
+                self._hits.pop(document_id, None)
+                self._unavailable.pop(document_id, None)
+                while self.nbytes > self.max_bytes:
+                    self._documents.popitem(last=False)
+        except NotImplementedError as e:
+            print(f"[HotDocumentCache] Turned off: {e}")
+            with self._lock:
+                self.enabled = False
+                self._documents.clear()
+                self._hits.clear()
+        except Exception as e:
+            print(f"[HotDocumentCache] Failed to load {document_id}: {e}")
+            with self._lock:
+                self._unavailable[document_id] = time.monotonic()
+        finally:
+            with self._lock:
+                self._loading.discard(document_id)
+                self._stale.discard(document_id)
+
+    def invalidate(self, document_id: str) -> None:
+        with self._lock:
+            self._documents.pop(document_id, None)
+            self._unavailable.pop(document_id, None)
+            if document_id in self._loading:
+                self._stale.add(document_id)
+
+    def _listen(self) -> None:
+        if self.channel is None or self._listener is not None:
+            return
+        with self._lock:
+            if self._listener is not None:
+                return
+            self._listener = False
+
+        def on_error(error, pubsub, thread):
+            print(f"[HotDocumentCache] Lost {self.channel} subscription: {error}")
+            thread.stop()
+            pubsub.close()
+            self._listener = None
+
+        try:
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(
+                **{self.channel: lambda message: self.invalidate(message["data"])}
+            )
+            self._listener = pubsub.run_in_thread(
+                sleep_time=1, daemon=True, exception_handler=on_error
+            )
+        except Exception as e:
+            # Retried on the next load, meanwhile the ttl bounds staleness
+            print(f"[HotDocumentCache] Couldn't subscribe to {self.channel}: {e}")
+            self._listener = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "documents": len(self._documents),
+                "bytes": self.nbytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+class HotDocumentRetriever(BaseRetriever):
+    """
+    Answers from a HotDocumentCache when the document is hot, otherwise
+    falls through to the wrapped (remote) retriever.
+    """
+
+    retriever: BaseRetriever
+    cache: Any
+    embeddings: Any
+    document_id: str
+    k: int
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        document = self.cache.get(self.document_id)
+        if document is None:
+            return self.retriever.invoke(
+                query, config={"callbacks": run_manager.get_child()}
+            )
+
+        query_vector = self.embeddings.embed_query(query)
+        return [
+            Document(
+                page_content=doc.page_content,
+                metadata={**doc.metadata, "score": score},
+            )
+            for doc, score in document.search(query_vector, self.k)
+        ]
+
+
+def _fetch_pinecone_vectors(document_id: str):
+    # Imported on first use, only the Pinecone retrievers query this cache
+    from app.chat.vector_stores.pinecone import fetch_document_vectors
+
+    return fetch_document_vectors(document_id)
+
+
+# Document ids re-ingested by the worker, see HotDocumentCache
+INVALIDATION_CHANNEL = "hot_documents"
+
+# Serves retrieval for frequently queried pdfs from memory. Needs a
+# serverless Pinecone index (listing ids by prefix), on a pod-based index it
+# turns itself off at the first hot pdf.
+hot_documents = (
+    HotDocumentCache(
+        _fetch_pinecone_vectors,
+        threshold=int(os.getenv("HOT_PDF_THRESHOLD", 5)),
+        window=float(os.getenv("HOT_PDF_WINDOW_SECONDS", 300)),
+        ttl=float(os.getenv("HOT_PDF_TTL_SECONDS", 3600)),
+        max_bytes=int(os.getenv("HOT_PDF_MAX_BYTES", 256 * 1024 * 1024)),
+        max_tracked=int(os.getenv("HOT_PDF_MAX_TRACKED", 10000)),
+        channel=INVALIDATION_CHANNEL,
+    )
+    if os.getenv("HOT_PDF_CACHE", "true").lower() in ("1", "true", "yes")
+    else None
+)
+
+
+def invalidate_hot_document(document_id: str) -> None:
+    """
+    Drops a re-ingested document from this process's cache and tells the
+    other processes to drop it from theirs
+    """
+    if hot_documents is not None:
+        hot_documents.invalidate(document_id)
+    try:
+        client.publish(INVALIDATION_CHANNEL, document_id)
+    except Exception as e:
+        print(f"[HotDocumentCache] Couldn't publish invalidation of {document_id}: {e}")
@@ -0,0 +1,38 @@
+from typing import List
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStoreRetriever
+
+
+class ScoredVectorStoreRetriever(VectorStoreRetriever):
+    """
+    Similarity search retriever that records each document's similarity
+    score in its metadata ("score"), for the context packer.
+    """
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return _with_scores(
+            self.vectorstore.similarity_search_with_score(query, **self.search_kwargs)
+        )
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return _with_scores(
+            await self.vectorstore.asimilarity_search_with_score(
+                query, **self.search_kwargs
+            )
+        )
+
+
+def _with_scores(docs_and_scores) -> List[Document]:
+    return [
+        Document(page_content=doc.page_content, metadata={**doc.metadata, "score": score})
+        for doc, score in docs_and_scores
+    ]
@@ -1,15 +1,148 @@
+import os
 import random
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
 from app.chat.redis import client
 
+COMPONENT_TYPES = ("llm", "retriever", "memory")
+# Published after every vote so other processes drop their snapshot
+SCORES_CHANNEL = "component_scores"
+
+# Adds a vote to the llm, retriever and memory of a conversation in one
+# atomic step and tells the other processes about it
+_SCORE = """
+for i = 1, 3 do
+    redis.call('HINCRBYFLOAT', KEYS[i * 2 - 1], ARGV[i + 1], ARGV[1])
+    redis.call('HINCRBY', KEYS[i * 2], ARGV[i + 1], 1)
+end
+redis.call('PUBLISH', ARGV[5], '1')
+return 1
+"""
+_score = client.register_script(_SCORE)
+
+
+def _read_scores() -> Dict[str, Tuple[Dict[str, str], Dict[str, str]]]:
+    """Sum of scores and number of votes per component, in one round trip"""
+    pipeline = client.pipeline(transaction=False)
+    for component_type in COMPONENT_TYPES:
+        pipeline.hgetall(f"{component_type}_score_values")
+        pipeline.hgetall(f"{component_type}_score_counts")
+    replies = pipeline.execute()
+    return {
+        component_type: (replies[i * 2], replies[i * 2 + 1])
+        for i, component_type in enumerate(COMPONENT_TYPES)
+    }
+
+
+class ScoreSnapshot:
+    """
+    In-process copy of the component scores, so picking components for a
+    message doesn't touch Redis.
+
+    The snapshot is read once (one pipelined round trip) and served for
+    `ttl` seconds. After that the stale copy keeps being served while a
+    background thread reloads it. Votes cast by this process and, with
+    `subscribe`, votes announced on SCORES_CHANNEL by other processes
+    expire it right away.
+
+    Args:
+        ttl: Seconds a snapshot is served before it is reloaded
+        subscribe: Listen on SCORES_CHANNEL for votes from other processes
+    """
+
+    def __init__(self, ttl: float = 30, subscribe: bool = True):
+        self.ttl = ttl
+        self.subscribe = subscribe
+        self._scores: Optional[Dict[str, Tuple[Dict[str, str], Dict[str, str]]]] = None
+        self._loaded_at = 0.0
+        self._invalidated_at = 0.0
+        self._refreshing = False
+        self._lock = threading.Lock()
+        self._listener = None
+
+    def get(self, component_type: str) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """Sums and counts of a component type"""
+        if self._scores is None:
+            self.refresh()
+        elif time.monotonic() - self._loaded_at > self.ttl:
+            self._refresh_in_background()
+        return (self._scores or {}).get(component_type, ({}, {}))
+
+    def refresh(self) -> None:
+        self._listen()
+        loaded_at = time.monotonic()
+        try:
+            scores = _read_scores()
+        except Exception as e:
+            print(f"[ScoreSnapshot] Couldn't read scores: {e}")
+            return
+        with self._lock:
+            self._scores = scores
+            # A vote during the read makes this copy stale already
+            self._loaded_at = loaded_at if loaded_at > self._invalidated_at else 0.0
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._invalidated_at = time.monotonic()
+            self._loaded_at = 0.0
+
+    def _refresh_in_background(self) -> None:
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def task():
+            try:
+                self.refresh()
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=task, name="score-snapshot", daemon=True).start()
+
+    def _listen(self) -> None:
+        if not self.subscribe or self._listener is not None:
+            return
+        with self._lock:
+            if self._listener is not None:
+                return
+            self._listener = False
+
+        def on_error(error, pubsub, thread):
+            print(f"[ScoreSnapshot] Lost {SCORES_CHANNEL} subscription: {error}")
+            thread.stop()
+            pubsub.close()
+            self._listener = None
+
+        try:
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{SCORES_CHANNEL: lambda message: self.invalidate()})
+            self._listener = pubsub.run_in_thread(
+                sleep_time=1, daemon=True, exception_handler=on_error
+            )
+        except Exception as e:
+            # Retried on the next refresh, meanwhile the ttl bounds how
+            # stale the snapshot gets
+            print(f"[ScoreSnapshot] Couldn't subscribe to {SCORES_CHANNEL}: {e}")
+            self._listener = None
+
+
+score_snapshot = ScoreSnapshot(
+    ttl=float(os.getenv("SCORE_SNAPSHOT_TTL_SECONDS", 30)),
+    subscribe=os.getenv("SCORE_SNAPSHOT_PUBSUB", "true").lower() in ("1", "true", "yes"),
+)
+
+
 def random_component_by_score(component_type, component_map):
     # Make sure component_type is 'llm', 'retriever', or 'memory'
-    if component_type not in ["llm", "retriever", "memory"]:
+    if component_type not in COMPONENT_TYPES:
         raise ValueError("Invalid component_type")
 
-    # From redis, get the hash containing the sum total scores for the given commponent_type
-    values = client.hgetall(f"{component_type}_score_values")
-    # From redis, get the hash containing the number of times each component has been voted on
-    counts = client.hgetall(f"{component_type}_score_counts")
+    # The sum total scores and the number of times each component has been
+    # voted on, from the in-process snapshot
+    values, counts = score_snapshot.get(component_type)
 
     # Get all the valid component names from the component map
     names = component_map.keys()
@@ -18,7 +151,7 @@ def random_component_by_score(component_type, component_map):
     # Add average score to a dictionary
     avg_scores = {}
     for name in names:
-        score = int(values.get(name, 1))
+        score = float(values.get(name, 1))
         count = int(counts.get(name, 1))
         avg = score / count
         avg_scores[name] = max(avg, 0.1)
@@ -37,29 +170,26 @@ def score_conversation(
 ) -> None:
     score = min(max(score, 0), 1)
 
-    client.hincrby("llm_score_values", llm, score)
-    client.hincrby("llm_score_counts", llm, 1)
-
-    client.hincrby("retriever_score_values", retriever, score)
-    client.hincrby("retriever_score_counts", retriever, 1)
+    keys = []
+    for component_type in COMPONENT_TYPES:
+        keys += [f"{component_type}_score_values", f"{component_type}_score_counts"]
+    _score(keys=keys, args=[score, llm, retriever, memory, SCORES_CHANNEL])
 
-    client.hincrby("memory_score_values", memory, score)
-    client.hincrby("memory_score_counts", memory, 1)
+    score_snapshot.invalidate()
 
 def get_scores():
     aggregate = {"llm": {}, "retriever": {}, "memory": {}}
+    scores = _read_scores()
 
     for component_type in aggregate.keys():
-        values = client.hgetall(f"{component_type}_score_values")
-        counts = client.hgetall(f"{component_type}_score_counts")
+        values, counts = scores[component_type]
 
         names = values.keys()
 
         for name in names:
-            score = int(values.get(name, 1))
+            score = float(values.get(name, 1))
             count = int(counts.get(name, 1))
-            avg = score / count 
+            avg = score / count
             aggregate[component_type][name] = [avg]
 
     return aggregate
-
@@ -0,0 +1,204 @@
+import contextvars
+import json
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Upper bounds (seconds) of the histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class Histogram:
+    """
+    Prometheus-style histogram with one series per label set.
+
+    Kept in the process, so with several worker processes each one
+    reports its own requests.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str],
+        buckets: Sequence[float] = BUCKETS,
+    ):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        with self._lock:
+            # Per bucket counts (the last one is +Inf), then the sum
+            series = self._series.setdefault(
+                label_values, [0] * (len(self.buckets) + 1) + [0.0]
+            )
+            series[bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {k: list(v) for k, v in self._series.items()}
+
+        for label_values, counts in sorted(series.items()):
+            labels = ",".join(
+                f'{name}="{_escape(value)}"'
+                for name, value in zip(self.labels, label_values)
+            )
+            total = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                total += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                lines.append(f'{self.name}_bucket{{{labels},le="{le}"}} {total}')
+            lines.append(f"{self.name}_sum{{{labels}}} {counts[-1]}")
+            lines.append(f"{self.name}_count{{{labels}}} {total}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+phase_seconds = Histogram(
+    "request_phase_seconds",
+    "Time spent in each phase of a request",
+    labels=("endpoint", "phase"),
+)
+
+
+class PhaseTimer:
+    """
+    Durations of the phases of one request, in milliseconds.
+
+    Phases of a chat request: auth, select (components), build (chain),
+    condense, retrieve, ttft (request start to first token, streams only),
+    generate, persist. `observe` adds "total" and records them all in
+    `phase_seconds` once the request is over.
+
+    Args:
+        endpoint: Name of the endpoint, labels the histograms
+    """
+
+    def __init__(self, endpoint: Optional[str] = None):
+        self.endpoint = endpoint or "unknown"
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self._observed = False
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - started) * 1000)
+
+    def add(self, name: str, ms: float) -> None:
+        """Adds to a phase, a phase that runs twice counts both times"""
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + ms
+
+    def mark(self, name: str) -> None:
+        """Records the time since the request started, once"""
+        with self._lock:
+            self.phases.setdefault(name, self.elapsed())
+
+    def elapsed(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def header(self) -> str:
+        """Server-Timing header value"""
+        with self._lock:
+            phases = dict(self.phases)
+        return ", ".join(f"{name};dur={ms:.1f}" for name, ms in phases.items())
+
+    def as_json(self) -> str:
+        with self._lock:
+            phases = {name: round(ms, 1) for name, ms in self.phases.items()}
+        phases["total"] = round(self.elapsed(), 1)
+        return json.dumps(phases)
+
+    def observe(self) -> None:
+        """Records the phases and the total in the histograms, once"""
+        with self._lock:
+            if self._observed:
+                return
+            self._observed = True
+            phases = dict(self.phases)
+        phases["total"] = self.elapsed()
+        for name, ms in phases.items():
+            phase_seconds.observe(ms / 1000, self.endpoint, name)
+
+
+# Timer of the request being served. Threads started for the request must
+# copy the context (contextvars.copy_context) to record into it.
+_current_timer: contextvars.ContextVar[Optional[PhaseTimer]] = contextvars.ContextVar(
+    "phase_timer", default=None
+)
+
+
+def start_timer(endpoint: Optional[str] = None) -> PhaseTimer:
+    timer = PhaseTimer(endpoint)
+    _current_timer.set(timer)
+    return timer
+
+
+def current_timer() -> Optional[PhaseTimer]:
+    return _current_timer.get()
+
+
+@contextmanager
+def timed(name: str) -> Iterator[None]:
+    """Times a phase of the current request, if there is one"""
+    timer = _current_timer.get()
+    if timer is None:
+        yield
+    else:
+        with timer.phase(name):
+            yield
+
+
+# Cache name -> its `stats` method, see register_cache_stats
+_cache_stats: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+# Stats that only grow, rendered as counters, the others as gauges
+CACHE_COUNTERS = ("hits", "misses", "batches", "saved_seconds")
+
+
+def register_cache_stats(name: str, stats: Callable[[], Dict[str, Any]]) -> None:
+    """
+    Reports a cache's stats in render_metrics, as `cache_<stat>` series
+    labelled with the cache's name
+    """
+    _cache_stats[name] = stats
+
+
+def render_cache_stats() -> str:
+    values: Dict[str, List[Tuple[str, float]]] = {}
+    for cache, stats in sorted(_cache_stats.items()):
+        try:
+            cache_values = stats()
+        except Exception as e:
+            print(f"[render_cache_stats] Reading {cache} stats failed: {e}")
+            continue
+        for stat, value in cache_values.items():
+            values.setdefault(stat, []).append((cache, value))
+
+    lines = []
+    for stat, series in values.items():
+        kind = "counter" if stat in CACHE_COUNTERS else "gauge"
+        name = f"cache_{stat}_total" if kind == "counter" else f"cache_{stat}"
+        lines += [f"# HELP {name} Cache {stat}", f"# TYPE {name} {kind}"]
+        lines += [f'{name}{{cache="{_escape(cache)}"}} {value}' for cache, value in series]
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+def render_metrics() -> str:
+    return phase_seconds.render() + render_cache_stats()
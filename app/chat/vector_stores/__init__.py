@@ -1,8 +1,52 @@
-from .pinecone import build_retriever
+import os
 from functools import partial
+from importlib import import_module
+from app.chat.retrievers.cached import build_cached_retriever
+from app.chat.context_packer import candidate_k
 
-retriever_map = {
-    "pinecone_1": partial(build_retriever, k=1),
-    "pinecone_2": partial(build_retriever, k=2),
-    "pinecone_3": partial(build_retriever, k=3),
+# Comma separated list of the vector stores to ingest into and retrieve from
+enabled_vector_stores = [
+    name.strip()
+    for name in os.getenv("VECTOR_STORES", "pinecone").split(",")
+    if name.strip()
+]
+
+# Only the enabled backends are imported, the Pinecone one needs its
+# credentials and index as soon as it's imported
+_stores = {
+    name: import_module(f"{__name__}.{name}") for name in enabled_vector_stores
 }
+
+
+def _cached(build_retriever, k):
+    # With the context packer on, more candidates are retrieved and the
+    # packer keeps the best k passages made from them
+    return partial(
+        build_cached_retriever, build_retriever=build_retriever, k=candidate_k(k)
+    )
+
+
+retriever_map = {}
+# Passages each retriever sends to the prompt, the context packer's limit
+retriever_k = {}
+for name, store in _stores.items():
+    for k in (1, 2, 3):
+        retriever_map[f"{name}_{k}"] = _cached(store.build_retriever, k=k)
+        retriever_k[f"{name}_{k}"] = k
+
+
+def add_documents(docs, ids=None) -> None:
+    """
+    Embed and store documents in every enabled vector store, under `ids`
+    when given.
+    """
+    for name in enabled_vector_stores:
+        _stores[name].vector_store.add_documents(docs, ids=ids)
+
+
+def upsert_vectors(ids, vectors, metadatas) -> None:
+    """
+    Store precomputed embeddings in every enabled vector store.
+    """
+    for name in enabled_vector_stores:
+        _stores[name].upsert_vectors(ids, vectors, metadatas)
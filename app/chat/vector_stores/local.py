@@ -0,0 +1,311 @@
+import json
+import os
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from app.chat.embeddings.openai import embeddings
+from app.chat.retrievers.scored import ScoredVectorStoreRetriever
+
+
+class LocalVectorIndex:
+    """
+    On-disk vector index with one float32 matrix per document.
+
+    Each document (keyed by its pdf_id metadata) gets two files under `root`:
+    `<id>.f32`, the row-major matrix of unit-normalized vectors, and
+    `<id>.json`, holding the row ids, metadata and dimension. Matrices are
+    opened with np.memmap, so searching a document only pages in its own
+    vectors and the OS page cache is shared between processes.
+
+    Vectors are normalized on write, which makes the dot product used for
+    ranking equal to cosine similarity.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+        self._cache: Dict[str, Tuple[int, np.ndarray, Dict[str, Any]]] = {}
+
+    def _paths(self, document_id: str) -> Tuple[str, str]:
+        name = re.sub(r"[^A-Za-z0-9_.-]", "_", str(document_id))
+        base = os.path.join(self.root, name)
+        return f"{base}.f32", f"{base}.json"
+
+    def _read_meta(self, document_id: str) -> Optional[Dict[str, Any]]:
+        _, meta_path = self._paths(document_id)
+        try:
+            with open(meta_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def load(self, document_id: str) -> Tuple[Optional[np.ndarray], Dict[str, Any]]:
+        """
+        Return the (memory-mapped matrix, metadata) for a document.
+
+        The mapping is cached and reopened only when the document's metadata
+        file changes.
+        """
+        matrix_path, meta_path = self._paths(document_id)
+        try:
+            mtime = os.stat(meta_path).st_mtime_ns
+        except FileNotFoundError:
+            return None, {"ids": [], "metadatas": [], "dim": 0}
+
+        cached = self._cache.get(document_id)
+        if cached and cached[0] == mtime:
+            return cached[1], cached[2]
+
+        meta = self._read_meta(document_id)
+        rows, dim = len(meta["ids"]), meta["dim"]
+        matrix = (
+            np.memmap(matrix_path, dtype=np.float32, mode="r", shape=(rows, dim))
+            if rows
+            else np.zeros((0, dim), dtype=np.float32)
+        )
+        self._cache[document_id] = (mtime, matrix, meta)
+        return matrix, meta
+
+    def upsert(
+        self,
+        ids: List[str],
+        vectors: List[List[float]],
+        metadatas: List[Dict[str, Any]],
+    ) -> None:
+        """
+        Insert or replace rows, grouping them by their pdf_id metadata.
+        """
+        groups: Dict[str, List[int]] = {}
+        for i, metadata in enumerate(metadatas):
+            groups.setdefault(str(metadata["pdf_id"]), []).append(i)
+
+        with self._lock:
+            for document_id, rows in groups.items():
+                self._upsert_document(
+                    document_id,
+                    [ids[i] for i in rows],
+                    np.asarray([vectors[i] for i in rows], dtype=np.float32),
+                    [metadatas[i] for i in rows],
+                )
+
+    def _upsert_document(
+        self,
+        document_id: str,
+        ids: List[str],
+        vectors: np.ndarray,
+        metadatas: List[Dict[str, Any]],
+    ) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        matrix_path, meta_path = self._paths(document_id)
+        vectors = _normalize(vectors)
+        meta = self._read_meta(document_id) or {
+            "ids": [],
+            "metadatas": [],
+            "dim": vectors.shape[1],
+        }
+        if meta["dim"] != vectors.shape[1]:
+            raise ValueError(
+                f"Vector dimension {vectors.shape[1]} does not match "
+                f"index dimension {meta['dim']} for {document_id}"
+            )
+
+        positions = {id: row for row, id in enumerate(meta["ids"])}
+        replace = [(positions[id], i) for i, id in enumerate(ids) if id in positions]
+        append = [i for i, id in enumerate(ids) if id not in positions]
+
+        if replace:
+            existing = np.memmap(
+                matrix_path,
+                dtype=np.float32,
+                mode="r+",
+                shape=(len(meta["ids"]), meta["dim"]),
+            )
+            for row, i in replace:
+                existing[row] = vectors[i]
+                meta["metadatas"][row] = metadatas[i]
+            existing.flush()
+            del existing
+
+        if append:
+            with open(matrix_path, "ab") as f:
+                # Drop rows left by a write that crashed before its metadata
+                # (or a matrix whose metadata is gone), so row n stays the
+                # n-th id
+                size = len(meta["ids"]) * meta["dim"] * 4
+                if f.tell() < size:
+                    raise ValueError(
+                        f"Matrix of {document_id} is shorter than its metadata"
+                    )
+                f.truncate(size)
+                f.write(vectors[append].tobytes())
+            meta["ids"].extend(ids[i] for i in append)
+            meta["metadatas"].extend(metadatas[i] for i in append)
+
+        # Vectors are written before the metadata so readers never see rows
+        # that aren't on disk yet
+        temp_path = f"{meta_path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(temp_path, meta_path)
+
+    def delete(self, document_id: str) -> None:
+        with self._lock:
+            self._cache.pop(document_id, None)
+            for path in self._paths(document_id):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def search(
+        self, document_id: str, queries: np.ndarray, k: int
+    ) -> List[List[Tuple[Dict[str, Any], float]]]:
+        """
+        Top-k rows for each query vector, as (metadata, cosine score) pairs.
+
+        All queries are scored with a single matrix product and the top-k
+        are selected with argpartition, so only k rows per query are sorted.
+        """
+        matrix, meta = self.load(document_id)
+        queries = _normalize(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        if matrix is None or not len(matrix):
+            return [[] for _ in queries]
+
+        scores = queries @ matrix.T
+        k = min(k, scores.shape[1])
+        if k < scores.shape[1]:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.tile(np.arange(scores.shape[1]), (len(queries), 1))
+
+        results = []
+        for query_scores, rows in zip(scores, top):
+            rows = rows[np.argsort(-query_scores[rows])]
+            results.append(
+                [(meta["metadatas"][row], float(query_scores[row])) for row in rows]
+            )
+        return results
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+class LocalVectorStore(VectorStore):
+    """
+    LangChain VectorStore over a LocalVectorIndex.
+
+    Searches must be filtered to a single document with
+    `filter={"pdf_id": ...}`, matching how the Pinecone retrievers are built.
+    """
+
+    def __init__(self, index: LocalVectorIndex, embedding: Embeddings):
+        self.index = index
+        self._embedding = embedding
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [f"{m['pdf_id']}#{i}" for i, m in enumerate(metadatas, start=1)]
+        vectors = self._embedding.embed_documents(texts)
+        self.index.upsert(
+            ids, vectors, [{**m, "text": t} for m, t in zip(metadatas, texts)]
+        )
+        return ids
+
+    def similarity_search_by_vector_with_score(
+        self, embedding: List[float], k: int = 4, filter: Optional[dict] = None
+    ) -> List[Tuple[Document, float]]:
+        if not filter or "pdf_id" not in filter:
+            raise ValueError("LocalVectorStore searches require a pdf_id filter")
+
+        (hits,) = self.index.search(str(filter["pdf_id"]), np.asarray([embedding]), k)
+        return [
+            (Document(page_content=metadata.get("text", ""), metadata=metadata), score)
+            for metadata, score in hits
+        ]
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(
+            self._embedding.embed_query(query), k=k, filter=filter
+        )
+
+    def similarity_search_by_vector(
+        self, embedding: List[float], k: int = 4, filter: Optional[dict] = None, **kwargs: Any
+    ) -> List[Document]:
+        return [
+            doc
+            for doc, _ in self.similarity_search_by_vector_with_score(
+                embedding, k=k, filter=filter
+            )
+        ]
+
+    def similarity_search(
+        self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any
+    ) -> List[Document]:
+        return [
+            doc
+            for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter)
+        ]
+
+    def _select_relevance_score_fn(self):
+        # Scores are cosine similarities in [-1, 1]
+        return lambda score: (score + 1) / 2
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        root: Optional[str] = None,
+        **kwargs: Any,
+    ) -> "LocalVectorStore":
+        store = cls(LocalVectorIndex(root or index_root), embedding)
+        store.add_texts(texts, metadatas=metadatas, **kwargs)
+        return store
+
+
+index_root = os.getenv("LOCAL_VECTOR_STORE_DIR", "instance/vectors")
+vector_store = LocalVectorStore(LocalVectorIndex(index_root), embeddings)
+
+
+def upsert_vectors(ids, vectors, metadatas) -> None:
+    vector_store.index.upsert(ids, vectors, metadatas)
+
+
+def build_retriever(chat_args, k):
+    """
+    Build a retriever over the local vector index filtered by document.
+
+    Args:
+        chat_args: Object containing document_id and other chat parameters
+
+    Returns:
+        Retriever: Configured local retriever
+    """
+    return ScoredVectorStoreRetriever(
+        vectorstore=vector_store,
+        search_kwargs={
+            "filter": {"pdf_id": chat_args.document_id},
+            "k": k
+        }
+    )
@@ -1,7 +1,10 @@
 import os
+from pinecone import Pinecone
 from langchain_pinecone import PineconeVectorStore
 from dotenv import load_dotenv
 from app.chat.embeddings.openai import embeddings
+from app.chat.retrievers.hot_documents import HotDocumentRetriever, hot_documents
+from app.chat.retrievers.scored import ScoredVectorStoreRetriever
 
 load_dotenv()
 
@@ -12,19 +15,91 @@ vector_store = PineconeVectorStore(
     pinecone_api_key=os.getenv("PINECONE_API_KEY")
 )
 
+def upsert_vectors(ids, vectors, metadatas) -> None:
+    """
+    Write precomputed embeddings to the Pinecone index.
+
+    Used by the ingestion pipeline, which embeds chunks in a separate stage
+    and so can't go through `vector_store.add_documents`.
+    """
+    vector_store._index.upsert(
+        vectors=list(zip(ids, vectors, metadatas)),
+        namespace=vector_store._namespace,
+    )
+
+_listing_supported = None
+
+
+def _supports_listing() -> bool:
+    """
+    Whether the index can list vector ids by prefix, which only serverless
+    indexes can. Asked once; if the index can't be described, assumed.
+    """
+    global _listing_supported
+    if _listing_supported is None:
+        try:
+            client = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+            description = client.describe_index(index_name)
+            _listing_supported = "serverless" in description.to_dict().get("spec", {})
+        except Exception as e:
+            print(f"[pinecone] Couldn't describe index {index_name}: {e}")
+            _listing_supported = True
+    return _listing_supported
+
+
+def fetch_document_vectors(document_id, batch_size=100):
+    """
+    Fetch every stored vector for a document.
+
+    Relies on the `<document_id>#<n>` ids ingestion writes. Documents
+    ingested before those ids (random ones) return nothing. Raises
+    NotImplementedError on pod-based indexes, which can't list ids.
+
+    Returns:
+        Tuple of (ids, vectors, metadatas)
+    """
+    if not _supports_listing():
+        raise NotImplementedError(
+            f"Pinecone index {index_name} isn't serverless, its vector ids can't be listed"
+        )
+
+    index = vector_store._index
+    namespace = vector_store._namespace
+
+    ids, vectors, metadatas = [], [], []
+    for page in index.list(prefix=f"{document_id}#", namespace=namespace):
+        for i in range(0, len(page), batch_size):
+            response = index.fetch(ids=page[i : i + batch_size], namespace=namespace)
+            for id, vector in response.vectors.items():
+                ids.append(id)
+                vectors.append(vector.values)
+                metadatas.append(vector.metadata or {})
+    return ids, vectors, metadatas
+
 def build_retriever(chat_args, k) -> PineconeVectorStore:
     """
     Build a retriever from Pinecone vector store filtered by PDF ID.
     
     Args:
-        chat_args: Object containing pdf_id and other chat parameters
+        chat_args: Object containing document_id and other chat parameters
     
     Returns:
         Retriever: Configured Pinecone retriever
     """
-    return vector_store.as_retriever(
+    retriever = ScoredVectorStoreRetriever(
+        vectorstore=vector_store,
         search_kwargs={
-            "filter": {"pdf_id": chat_args.pdf_id},
+            "filter": {"pdf_id": chat_args.document_id},
             "k": k
         }
+    )
+    if hot_documents is None:
+        return retriever
+
+    return HotDocumentRetriever(
+        retriever=retriever,
+        cache=hot_documents,
+        embeddings=embeddings,
+        document_id=chat_args.document_id,
+        k=k,
     )
\ No newline at end of file
@@ -5,17 +5,25 @@ load_dotenv()
 from flask import Flask
 from flask_cors import CORS
 
-from app.web.db import db, init_db_command
+from app.web.db import db, init_db_command, create_indexes_command
 from app.web.db import models
 from app.celery import celery_init_app
 from app.web.config import Config
-from app.web.hooks import load_logged_in_user, handle_error, add_headers
+from app.web.static_assets import asset_manifest
+from app.web.hooks import (
+    load_logged_in_user,
+    handle_error,
+    add_headers,
+    start_request_timer,
+    add_server_timing,
+)
 from app.web.views import (
     auth_views,
     pdf_views,
     score_views,
     client_views,
     conversation_views,
+    metrics_views,
 )
 
 
@@ -36,6 +44,8 @@ def create_app():
 def register_extensions(app):
     db.init_app(app)
     app.cli.add_command(init_db_command)
+    app.cli.add_command(create_indexes_command)
+    asset_manifest.init_app(app)
 
 
 def register_blueprints(app):
@@ -43,11 +53,14 @@ def register_blueprints(app):
     app.register_blueprint(pdf_views.bp)
     app.register_blueprint(score_views.bp)
     app.register_blueprint(conversation_views.bp)
+    app.register_blueprint(metrics_views.bp)
     app.register_blueprint(client_views.bp)
 
 
 def register_hooks(app):
     CORS(app)
+    app.before_request(start_request_timer)
     app.before_request(load_logged_in_user)
     app.after_request(add_headers)
+    app.after_request(add_server_timing)
     app.register_error_handler(Exception, handle_error)
@@ -1,4 +1,7 @@
-from typing import Dict
+import base64
+import json
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from app.web.db import db
 from app.web.db.models import Message
@@ -6,21 +9,46 @@ from app.web.db.models.conversation import Conversation
 
 
 def get_messages_by_conversation_id(
-    conversation_id: str,
-) -> AIMessage | HumanMessage | SystemMessage:
+    conversation_id: str, limit: int | None = None
+) -> List[AIMessage | HumanMessage | SystemMessage]:
     """
-    Finds all messages that belong to the given conversation_id
+    Finds the messages that belong to the given conversation_id, oldest
+        first
 
     :param conversation_id: The id of the conversation
+    :param limit: Only return the last `limit` messages
 
     :return: A list of messages
     """
-    messages = (
+    query = (
         db.session.query(Message)
         .filter_by(conversation_id=conversation_id)
         .order_by(Message.created_on.desc())
     )
-    return [message.as_lc_message() for message in messages]
+    if limit is not None:
+        query = query.limit(limit)
+    return [message.as_lc_message() for message in reversed(query.all())]
+
+
+def get_messages_after(
+    conversation_id: str, count: int
+) -> List[AIMessage | HumanMessage | SystemMessage]:
+    """
+    Finds the messages of the given conversation_id that come after its
+        first `count` messages, oldest first
+
+    :param conversation_id: The id of the conversation
+    :param count: The number of messages to skip
+
+    :return: A list of messages
+    """
+    query = (
+        db.session.query(Message)
+        .filter_by(conversation_id=conversation_id)
+        .order_by(Message.created_on.asc())
+        .offset(count)
+    )
+    return [message.as_lc_message() for message in query]
 
 
 def add_message_to_conversation(
@@ -43,6 +71,171 @@ def add_message_to_conversation(
     )
 
 
+def add_turn_to_conversation(
+    conversation_id: str,
+    messages: List[Tuple[str, str]],
+    components: Optional[Dict[str, str]] = None,
+    created_on: Optional[datetime] = None,
+    commit: bool = True,
+) -> List[Message]:
+    """
+    Stores the messages of one turn (usually the question and the answer)
+        and, when given, the components the conversation uses, in one
+        transaction
+
+    :param conversation_id: The id of the conversation
+    :param messages: (role, content) of each message, in order
+    :param components: The llm, retriever and memory of the conversation
+    :param created_on: When the turn happened, defaults to now. The
+        messages are a microsecond apart so they keep their order
+    :param commit: Whether to commit, or leave it to the caller
+
+    :return: The created messages
+    """
+    created_on = created_on or datetime.utcnow()
+    rows = [
+        Message.create(
+            commit=False,
+            conversation_id=conversation_id,
+            role=role,
+            content=content,
+            created_on=created_on + timedelta(microseconds=i),
+        )
+        for i, (role, content) in enumerate(messages)
+    ]
+    if components:
+        db.session.execute(
+            db.update(Conversation)
+            .where(Conversation.id == conversation_id)
+            .values(**components)
+        )
+    if commit:
+        db.session.commit()
+    return rows
+
+
+def get_conversation_summaries(
+    pdf_id: str, preview_chars: int = 120
+) -> List[Dict[str, Any]]:
+    """
+    Lists the conversations of a pdf, newest first, with their message
+        count and a preview of their last message, in one query whatever
+        the number of messages
+
+    :param pdf_id: The id of the pdf
+    :param preview_chars: Length the last message's content is cut to
+
+    :return: A list of conversation summaries
+    """
+    message_count = (
+        db.select(db.func.count(Message.id))
+        .where(Message.conversation_id == Conversation.id)
+        .correlate(Conversation)
+        .scalar_subquery()
+    )
+    last_message_id = (
+        db.select(Message.id)
+        .where(Message.conversation_id == Conversation.id)
+        .order_by(Message.created_on.desc(), Message.id.desc())
+        .limit(1)
+        .correlate(Conversation)
+        .scalar_subquery()
+    )
+    rows = db.session.execute(
+        db.select(
+            Conversation.id,
+            Conversation.pdf_id,
+            Conversation.created_on,
+            message_count,
+            Message.role,
+            db.func.substr(Message.content, 1, preview_chars),
+            Message.created_on,
+        )
+        .outerjoin(Message, Message.id == last_message_id)
+        .where(Conversation.pdf_id == pdf_id)
+        .order_by(Conversation.created_on.desc(), Conversation.id.desc())
+    )
+    return [
+        {
+            "id": id,
+            "pdf_id": pdf_id,
+            "created_on": _isoformat(created_on),
+            "message_count": count,
+            "last_message": (
+                {
+                    "role": role,
+                    "content": preview,
+                    "created_on": _isoformat(last_created_on),
+                }
+                if role is not None
+                else None
+            ),
+        }
+        for id, pdf_id, created_on, count, role, preview, last_created_on in rows
+    ]
+
+
+def get_messages_page(
+    conversation_id: str, limit: int, before: Optional[str] = None
+) -> Tuple[List[Message], Optional[str]]:
+    """
+    Finds a page of a conversation's messages, walking back from the most
+        recent one. Pages are keyed on (created_on, id), so each page costs
+        the same however deep into the conversation it is
+
+    :param conversation_id: The id of the conversation
+    :param limit: The number of messages per page
+    :param before: Cursor returned with the previous (more recent) page
+
+    :return: The page's messages oldest first, and the cursor of the next
+        (older) page or None when this is the oldest one
+    """
+    query = db.select(Message).where(Message.conversation_id == conversation_id)
+    if before is not None:
+        created_on, id = decode_cursor(before)
+        query = query.where(
+            db.or_(
+                Message.created_on < created_on,
+                db.and_(Message.created_on == created_on, Message.id < id),
+            )
+        )
+    messages = (
+        db.session.execute(
+            query.order_by(Message.created_on.desc(), Message.id.desc()).limit(
+                limit + 1
+            )
+        )
+        .scalars()
+        .all()
+    )
+
+    cursor = None
+    if len(messages) > limit:
+        messages = messages[:limit]
+        cursor = encode_cursor(messages[-1])
+    return list(reversed(messages)), cursor
+
+
+def encode_cursor(message: Message) -> str:
+    key = json.dumps([message.created_on.isoformat(), message.id])
+    return base64.urlsafe_b64encode(key.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """
+    Reads a cursor made by encode_cursor, raises ValueError if it isn't one
+    """
+    try:
+        created_on, id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_on), str(id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def _isoformat(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
 def get_conversation_components(conversation_id: str) -> Dict[str, str]:
     """
     Returns the components used in a conversation
@@ -59,7 +252,40 @@ def set_conversation_components(
     conversation_id: str, llm: str, retriever: str, memory: str
 ) -> None:
     """
-    Sets the components used by a conversation
+    Sets the components used by a conversation, in one UPDATE
+    """
+    db.session.execute(
+        db.update(Conversation)
+        .where(Conversation.id == conversation_id)
+        .values(llm=llm, retriever=retriever, memory=memory)
+    )
+    db.session.commit()
+
+
+def get_conversation_summary(conversation_id: str) -> Tuple[str | None, int]:
+    """
+    Returns a conversation's rolling summary and the number of messages
+    it covers
     """
     conversation = Conversation.find_by(id=conversation_id)
-    conversation.update(llm=llm, retriever=retriever, memory=memory)
+    return conversation.summary, conversation.summarized_messages or 0
+
+
+def set_conversation_summary(
+    conversation_id: str, summary: str, summarized_messages: int, previous: int
+) -> bool:
+    """
+    Stores a conversation's rolling summary, unless another update landed
+    since it was read (the summary doesn't cover `previous` messages
+    anymore). Returns whether it was stored.
+    """
+    result = db.session.execute(
+        db.update(Conversation)
+        .where(
+            Conversation.id == conversation_id,
+            Conversation.summarized_messages == previous,
+        )
+        .values(summary=summary, summarized_messages=summarized_messages)
+    )
+    db.session.commit()
+    return result.rowcount == 1
@@ -0,0 +1,158 @@
+"""
+ASGI entry point.
+
+Streamed messages (POST /api/conversations/<id>/messages?stream=true) are
+answered by an async handler: the chain runs on the event loop and tokens
+are sent as they arrive, so an open stream costs a task instead of a
+thread. Every other request is passed to the Flask app, which runs on a
+thread pool.
+
+    uvicorn app.web.asgi:app --port 8000
+"""
+import json
+import os
+import re
+from urllib.parse import parse_qs
+
+from a2wsgi import WSGIMiddleware
+from flask import g, request
+from langchain_core.runnables.config import run_in_executor
+from werkzeug.exceptions import Unauthorized
+
+from app.chat.timing import start_timer
+from app.web import create_app
+from app.web.db.models import Conversation
+from app.web.hooks import handle_error, load_logged_in_user
+from app.web.views.conversation_views import build_message_chat, stream_format
+
+flask_app = create_app()
+wsgi_app = WSGIMiddleware(flask_app, workers=int(os.getenv("ASGI_WSGI_WORKERS", 10)))
+
+STREAM_MESSAGE_PATH = re.compile(
+    r"^/api/conversations/(?P<conversation_id>[^/]+)/messages/?$"
+)
+
+
+async def app(scope, receive, send):
+    conversation_id = _streamed_message(scope)
+    if conversation_id is None:
+        await wsgi_app(scope, receive, send)
+    else:
+        await stream_message(scope, receive, send, conversation_id)
+
+
+def _streamed_message(scope):
+    """Returns the conversation id when the request streams a message"""
+    if scope["type"] != "http" or scope["method"] != "POST":
+        return None
+
+    match = STREAM_MESSAGE_PATH.match(scope["path"])
+    if match is None:
+        return None
+
+    query = parse_qs(scope["query_string"].decode("latin-1"))
+    if not query.get("stream", [""])[0]:
+        return None
+
+    return match.group("conversation_id")
+
+
+async def stream_message(scope, receive, send, conversation_id):
+    timer = start_timer("conversation.create_message")
+    body = await _read_body(receive)
+    ctx = flask_app.test_request_context(
+        scope["path"],
+        method=scope["method"],
+        query_string=scope["query_string"],
+        headers=[(k.decode("latin-1"), v.decode("latin-1")) for k, v in scope["headers"]],
+        data=body,
+    )
+    ctx.push()
+    try:
+        try:
+            chat, input, format = await run_in_executor(None, _prepare, conversation_id)
+        except Exception as err:
+            timer.observe()
+            await _send_error(send, err)
+            return
+
+        if not chat:
+            timer.observe()
+            await _send(send, 200, "text/plain", b"Chat not yet implemented!")
+            return
+
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"text/event-stream; charset=utf-8"),
+                    (b"cache-control", b"no-cache, no-store, must-revalidate"),
+                    # Phases before the stream, the stream sends the rest
+                    (b"server-timing", timer.header().encode("latin-1")),
+                ],
+            }
+        )
+        stream = chat.astream(input, format=format)
+        try:
+            async for frame in stream:
+                await send(
+                    {
+                        "type": "http.response.body",
+                        "body": frame.encode("utf-8"),
+                        "more_body": True,
+                    }
+                )
+        finally:
+            await stream.aclose()
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+    finally:
+        ctx.pop()
+
+
+def _prepare(conversation_id):
+    # Same checks as login_required and load_model on create_message
+    load_logged_in_user()
+    if g.user is None:
+        raise Unauthorized("Unauthorized")
+
+    conversation = Conversation.find_by(id=conversation_id)
+    if conversation.user_id != g.user.id:
+        raise Unauthorized("You are not authorized to view this.")
+
+    input = request.json.get("input")
+    format = stream_format(request.args)
+    return build_message_chat(conversation, streaming=True), input, format
+
+
+async def _read_body(receive):
+    body = b""
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get("body", b"")
+        more_body = message.get("more_body", False)
+    return body
+
+
+async def _send_error(send, err):
+    try:
+        message, status = handle_error(err)
+    except Exception as e:
+        print(f"[asgi] Error: {e}")
+        message, status = {"message": "Internal server error"}, 500
+    await _send(send, status, "application/json", json.dumps(message).encode("utf-8"))
+
+
+async def _send(send, status, content_type, body):
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", content_type.encode("latin-1")),
+                (b"content-length", str(len(body)).encode("latin-1")),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
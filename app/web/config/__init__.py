@@ -13,4 +13,6 @@ class Config:
         "broker_url": "redis://localhost:6379/0",
         "task_ignore_result": True,
         "broker_connection_retry_on_startup": False,
+        # Task modules that no view imports
+        "imports": ["app.web.tasks.summaries"],
     }
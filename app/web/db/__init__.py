@@ -2,6 +2,8 @@ import click
 import os
 from flask_sqlalchemy import SQLAlchemy
 from flask import current_app
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateColumn
 
 db = SQLAlchemy()
 
@@ -16,3 +18,41 @@ def init_db_command():
         db.drop_all()
         db.create_all()
     click.echo("Initialized the database.")
+
+
+@click.command("create-indexes")
+def create_indexes_command():
+    """
+    Upgrades an existing database in place: adds the models' missing
+    tables, columns (those that are nullable or have a server default) and
+    indexes
+    """
+    with current_app.app_context():
+        db.create_all()
+        add_missing_columns()
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(db.engine, checkfirst=True)
+    click.echo("Created the missing columns and indexes.")
+
+
+def add_missing_columns():
+    inspector = inspect(db.engine)
+    preparer = db.engine.dialect.identifier_preparer
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                if not column.nullable and column.server_default is None:
+                    click.echo(
+                        f"Can't add {table.name}.{column.name}, it's NOT NULL "
+                        "without a server default. Run init-db or add it by hand."
+                    )
+                    continue
+                ddl = CreateColumn(column).compile(dialect=db.engine.dialect)
+                connection.exec_driver_sql(
+                    f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {ddl}"
+                )
+                click.echo(f"Added {table.name}.{column.name}")
@@ -4,6 +4,11 @@ from .base import BaseModel
 
 
 class Conversation(BaseModel):
+    # A pdf's conversations are listed newest first (id breaks ties)
+    __table_args__ = (
+        db.Index("ix_conversation_pdf_id_created_on", "pdf_id", "created_on", "id"),
+    )
+
     id: str = db.Column(db.String, primary_key=True, default=lambda: str(uuid.uuid4()))
     created_on = db.Column(db.DateTime, server_default=db.func.now())
 
@@ -11,10 +16,20 @@ class Conversation(BaseModel):
     memory: str = db.Column(db.String)
     llm: str = db.Column(db.String)
 
+    # Rolling summary of the conversation's oldest messages, kept by the
+    # summary memory. `summarized_messages` is how many messages (oldest
+    # first) it covers.
+    summary: str = db.Column(db.Text)
+    summarized_messages: int = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )
+
     pdf_id: int = db.Column(db.Integer, db.ForeignKey("pdf.id"), nullable=False)
     pdf = db.relationship("Pdf", back_populates="conversations")
 
-    user_id: int = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    user_id: int = db.Column(
+        db.Integer, db.ForeignKey("user.id"), nullable=False, index=True
+    )
     user = db.relationship("User", back_populates="conversations")
 
     messages = db.relationship(
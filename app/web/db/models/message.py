@@ -1,14 +1,30 @@
 import uuid
+from datetime import datetime
 from app.web.db import db
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from .base import BaseModel
 
 
 class Message(BaseModel):
+    # History reads, pages and the conversation summaries all filter on
+    # the conversation and order by time (id breaks ties)
+    __table_args__ = (
+        db.Index(
+            "ix_message_conversation_id_created_on",
+            "conversation_id",
+            "created_on",
+            "id",
+        ),
+    )
+
     id: str = db.Column(
         db.String(), primary_key=True, default=lambda: str(uuid.uuid4())
     )
-    created_on = db.Column(db.DateTime, server_default=db.func.now())
+    # Set in Python for microsecond precision, messages of one exchange are
+    # usually written within the same second and must keep their order
+    created_on = db.Column(
+        db.DateTime, server_default=db.func.now(), default=datetime.utcnow
+    )
     role: str = db.Column(db.String(), nullable=False)
     content: str = db.Column(db.String(), nullable=False)
 
@@ -1,4 +1,5 @@
 import uuid
+from typing import Optional
 from app.web.db import db
 from .base import BaseModel
 
@@ -8,7 +9,14 @@ class Pdf(BaseModel):
         db.String(), primary_key=True, default=lambda: str(uuid.uuid4())
     )
     name: str = db.Column(db.String(80), nullable=False)
-    user_id: int = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    content_hash: str = db.Column(db.String(64), index=True)
+    # Id of the pdf whose vectors this pdf uses. Equal to `id` unless the
+    # file is a byte-identical copy of a pdf that was already indexed.
+    document_id: str = db.Column(db.String())
+    embedded_on = db.Column(db.DateTime)
+    user_id: int = db.Column(
+        db.Integer, db.ForeignKey("user.id"), nullable=False, index=True
+    )
     user = db.relationship("User", back_populates="pdfs")
 
     conversations = db.relationship(
@@ -17,6 +25,19 @@ class Pdf(BaseModel):
         order_by="desc(Conversation.created_on)",
     )
 
+    @classmethod
+    def find_embedded_by_hash(cls, content_hash: str) -> Optional["Pdf"]:
+        return db.session.execute(
+            db.select(cls)
+            .filter_by(content_hash=content_hash)
+            .filter(cls.embedded_on.isnot(None))
+            .limit(1)
+        ).scalar_one_or_none()
+
+    @property
+    def vector_document_id(self) -> str:
+        return self.document_id or self.id
+
     def as_dict(self):
         return {
             "id": self.id,
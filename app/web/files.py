@@ -1,17 +1,85 @@
 import json
 import os
+import uuid
 import requests
 import tempfile
-from typing import Tuple, Dict, Any
+from typing import Iterable, Iterator, Optional, Tuple, Dict, Any
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from app.web.config import Config
 
 upload_url = f"{Config.UPLOAD_URL}/upload"
 
+# (connect, read) timeouts, the read one is the longest the upload service
+# may stay silent, not a limit on the whole transfer
+UPLOAD_TIMEOUT = (
+    float(os.getenv("UPLOAD_CONNECT_TIMEOUT_SECONDS", 5)),
+    float(os.getenv("UPLOAD_READ_TIMEOUT_SECONDS", 60)),
+)
+UPLOAD_RETRIES = int(os.getenv("UPLOAD_RETRIES", 3))
+UPLOAD_POOL_SIZE = int(os.getenv("UPLOAD_POOL_SIZE", 10))
 
-def upload(local_file_path: str) -> Tuple[Dict[str, str], int]:
-    with open(local_file_path, "rb") as f:
-        response = requests.post(upload_url, files={"file": f})
-        return json.loads(response.text), response.status_code
+
+def _build_session() -> requests.Session:
+    """
+    Pooled connections to the upload service. Failed connections are
+    retried for every request (nothing was sent yet), errors and 502-504s
+    only for downloads, an upload's body is streamed and can't be replayed.
+    """
+    retry = Retry(
+        total=UPLOAD_RETRIES,
+        backoff_factor=0.5,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=1, pool_maxsize=UPLOAD_POOL_SIZE, max_retries=retry
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+session = _build_session()
+
+
+def upload(
+    file_id: str, chunks: Iterable[bytes], content_type: Optional[str] = None
+) -> Tuple[Dict[str, str], int]:
+    """
+    Streams a file to the upload service as it's read, stored under
+    `file_id`. The body is sent chunked, so it's never held whole in memory
+    or on disk. If `chunks` raises, the request is aborted and the service
+    never sees a complete file.
+    """
+    boundary = uuid.uuid4().hex
+    try:
+        response = session.post(
+            upload_url,
+            data=_multipart_body(boundary, file_id, chunks, content_type),
+            headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+            timeout=UPLOAD_TIMEOUT,
+        )
+    except requests.RequestException as e:
+        print(f"[files] Upload of {file_id} failed: {e}")
+        return {"message": "Upload failed"}, 502
+    return json.loads(response.text), response.status_code
+
+
+def _multipart_body(
+    boundary: str, file_id: str, chunks: Iterable[bytes], content_type: Optional[str]
+) -> Iterator[bytes]:
+    head = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{file_id}"\r\n'
+    )
+    if content_type:
+        head += f"Content-Type: {content_type}\r\n"
+    yield (head + "\r\n").encode()
+    yield from chunks
+    yield f"\r\n--{boundary}--\r\n".encode()
 
 
 def create_download_url(file_id):
@@ -30,7 +98,10 @@ class _Download:
 
     def download(self):
         self.file_path = os.path.join(self.temp_dir.name, self.file_id)
-        response = requests.get(create_download_url(self.file_id), stream=True)
+        response = session.get(
+            create_download_url(self.file_id), stream=True, timeout=UPLOAD_TIMEOUT
+        )
+        response.raise_for_status()
         with open(self.file_path, "wb") as file:
             for chunk in response.iter_content(chunk_size=8192):
                 file.write(chunk)
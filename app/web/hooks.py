@@ -1,12 +1,13 @@
 import functools
-import tempfile
 import uuid
-import os
 import logging
-from flask import g, session, request
+from flask import g, request, current_app
 from sqlalchemy.exc import IntegrityError, NoResultFound
 from werkzeug.exceptions import Unauthorized, BadRequest
-from app.web.db.models import User, Model
+from app.web.db.models import Model
+from app.web.session_user import session_user
+from app.web.upload_stream import UploadStream
+from app.chat.timing import current_timer, start_timer, timed
 
 
 def load_model(Model: Model, extract_id_lambda=None):
@@ -48,37 +49,68 @@ def login_required(view):
     return wrapped_view
 
 
+def skip_user_loading(view):
+    """
+    Marks a view that never needs the signed in user (static files, health
+    checks), load_logged_in_user leaves g.user as None for it
+    """
+    view.skip_user_loading = True
+    return view
+
+
 def add_headers(response):
-    response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
+    # Static assets set their own caching (app.web.static_assets)
+    if request.path.startswith("/api") or response.mimetype == "text/html":
+        response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
     return response
 
 
-def load_logged_in_user():
-    user_id = session.get("user_id")
+def start_request_timer():
+    start_timer(request.endpoint)
+
+
+def add_server_timing(response):
+    """
+    Sends the request's phase timings as a Server-Timing header. A streamed
+    response only has the phases before the stream started, the stream
+    records the rest when it ends (and sends them as a last SSE event).
+    """
+    timer = current_timer()
+    if timer is None:
+        return response
+
+    header = timer.header()
+    if header:
+        response.headers["Server-Timing"] = header
+    if not response.is_streamed:
+        timer.observe()
+    return response
+
 
-    if user_id is None:
+def load_logged_in_user():
+    view = current_app.view_functions.get(request.endpoint)
+    if request.endpoint == "static" or getattr(view, "skip_user_loading", False):
         g.user = None
-    else:
-        try:
-            g.user = User.find_by(id=user_id)
-        except Exception:
-            g.user = None
+        return
+
+    with timed("auth"):
+        g.user = session_user()
 
 
 def handle_file_upload(fn):
     @functools.wraps(fn)
     def wrapped(*args, **kwargs):
-        file = request.files["file"]
-        file_id = str(uuid.uuid4())
-
-        with tempfile.TemporaryDirectory() as temp_dir:
-            file_path = os.path.join(temp_dir, file_id)
-            file.save(file_path)
-
-            kwargs["file_id"] = file_id
-            kwargs["file_path"] = file_path
-            kwargs["file_name"] = file.filename
-            return fn(*args, **kwargs)
+        # Read straight from the request body, request.files would save
+        # the file to disk first
+        boundary = request.mimetype_params.get("boundary")
+        if request.mimetype != "multipart/form-data" or not boundary:
+            raise BadRequest("Expected a multipart/form-data upload.")
+        file = UploadStream(request.stream, boundary).open()
+
+        kwargs["file_id"] = str(uuid.uuid4())
+        kwargs["file_name"] = file.filename
+        kwargs["file"] = file
+        return fn(*args, **kwargs)
 
     return wrapped
 
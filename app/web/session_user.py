@@ -0,0 +1,127 @@
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from flask import session
+
+from app.web.db.models import User
+
+# How long a user resolved from the database is trusted before it is looked
+# up again, both as session claims and in the in-process cache
+USER_SESSION_TTL_SECONDS = float(os.getenv("USER_SESSION_TTL_SECONDS", 300))
+USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", 10000))
+
+
+@dataclass(frozen=True)
+class SessionUser:
+    """
+    The signed in user as requests see it (g.user). Views only need its id
+    and as_dict, so it's built from the session or the cache rather than
+    loaded from the database.
+    """
+
+    id: str
+    email: str
+
+    def as_dict(self):
+        return {"id": self.id, "email": self.email}
+
+
+class UserCache:
+    """
+    Users by id, kept in the process for `ttl` seconds.
+
+    Only stores that a user exists and their email. A user deleted or
+    changed in the database is seen by the other processes once their copy
+    expires.
+
+    Args:
+        ttl: Seconds a user is served before it is looked up again
+        max_size: Most users kept, the oldest are dropped first
+    """
+
+    def __init__(self, ttl: float = 300, max_size: int = 10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._users: Dict[str, Tuple[SessionUser, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str) -> Tuple[SessionUser, float]:
+        """
+        The user and when (time.time()) it was read from the database.
+        Raises NoResultFound if there's no such user.
+        """
+        with self._lock:
+            cached = self._users.get(user_id)
+        if cached is not None and time.time() - cached[1] < self.ttl:
+            return cached
+
+        user = User.find_by(id=user_id)
+        session_user = SessionUser(id=user.id, email=user.email)
+        return session_user, self.put(session_user)
+
+    def put(self, user: SessionUser) -> float:
+        checked_at = time.time()
+        with self._lock:
+            self._users.pop(user.id, None)
+            if len(self._users) >= self.max_size:
+                # Dicts keep insertion order, the first key is the oldest
+                del self._users[next(iter(self._users))]
+            self._users[user.id] = (user, checked_at)
+        return checked_at
+
+    def invalidate(self, user_id: str) -> None:
+        with self._lock:
+            self._users.pop(user_id, None)
+
+
+user_cache = UserCache(ttl=USER_SESSION_TTL_SECONDS, max_size=USER_CACHE_MAX_SIZE)
+
+
+def remember_user(user) -> SessionUser:
+    """
+    Signs the user in: stores their id and email as claims in the (signed)
+    session cookie, along with when they were checked against the database
+    """
+    session_user = SessionUser(id=user.id, email=user.email)
+    _set_claims(session_user, user_cache.put(session_user))
+    return session_user
+
+
+def forget_user() -> None:
+    """Signs the user out"""
+    user_id = session.get("user_id")
+    session.clear()
+    if user_id is not None:
+        user_cache.invalidate(user_id)
+
+
+def session_user() -> Optional[SessionUser]:
+    """
+    The user the session belongs to, or None. Fresh session claims are
+    trusted as they are; stale ones (or sessions from before the claims)
+    go through the cache, which looks the user up at most once per ttl
+    """
+    user_id = session.get("user_id")
+    if user_id is None:
+        return None
+
+    email = session.get("user_email")
+    checked_at = session.get("user_checked_at", 0)
+    if email is not None and time.time() - checked_at < USER_SESSION_TTL_SECONDS:
+        return SessionUser(id=user_id, email=email)
+
+    try:
+        user, checked_at = user_cache.get(user_id)
+    except Exception:
+        return None
+    _set_claims(user, checked_at)
+    return user
+
+
+def _set_claims(user: SessionUser, checked_at: float) -> None:
+    session["user_id"] = user.id
+    session["user_email"] = user.email
+    session["user_checked_at"] = checked_at
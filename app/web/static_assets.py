@@ -0,0 +1,123 @@
+import hashlib
+import mimetypes
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from flask import Flask, request, send_file
+from werkzeug.exceptions import NotFound
+
+# The client build puts content-hashed file names under this prefix, a
+# changed file gets a new name so its url can be cached forever
+IMMUTABLE_PREFIX = "_app/immutable/"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Other files keep their url across builds, clients revalidate them (cheap
+# with the ETag)
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# Precompressed variants the build writes next to a file, best first
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+@dataclass
+class Asset:
+    path: str
+    mimetype: str
+    etag: str
+    immutable: bool
+    # Content-Encoding -> path of the precompressed file
+    variants: Dict[str, str] = field(default_factory=dict)
+
+
+class AssetManifest:
+    """
+    Index of the client build directory, made once at startup so serving a
+    file doesn't touch the filesystem until it's sent.
+
+    Each file gets an ETag from its contents and, when the build wrote
+    them (adapter-static's `precompress`), its .br and .gz variants. Files
+    under IMMUTABLE_PREFIX are cached for a year, the others are
+    revalidated, and html pages aren't cached at all (add_headers).
+    """
+
+    def __init__(self, app: Optional[Flask] = None):
+        self.root: Optional[str] = None
+        self.assets: Dict[str, Asset] = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        self.build(app.static_folder)
+        print(f"[AssetManifest] {len(self.assets)} files in {self.root}")
+
+    def build(self, root: str) -> None:
+        self.root = os.path.abspath(root)
+        assets = {}
+        if os.path.isdir(self.root):
+            for directory, _, files in os.walk(self.root):
+                names = set(files)
+                for name in files:
+                    if any(name.endswith(suffix) for _, suffix in ENCODINGS):
+                        continue
+                    path = os.path.join(directory, name)
+                    key = os.path.relpath(path, self.root).replace(os.sep, "/")
+                    assets[key] = Asset(
+                        path=path,
+                        mimetype=mimetypes.guess_type(name)[0]
+                        or "application/octet-stream",
+                        etag=_digest(path),
+                        immutable=key.startswith(IMMUTABLE_PREFIX),
+                        variants={
+                            encoding: path + suffix
+                            for encoding, suffix in ENCODINGS
+                            if name + suffix in names
+                        },
+                    )
+        self.assets = assets
+
+    def get(self, path: str) -> Optional[Asset]:
+        return self.assets.get(path)
+
+    def serve(self, path: str):
+        """
+        Sends the file at `path` (relative to the build directory), in the
+        best encoding the client accepts. Answers 304 when the client's copy
+        matches. Raises NotFound if the build has no such file.
+        """
+        asset = self.get(path)
+        if asset is None:
+            raise NotFound()
+
+        encoding = self._encoding(asset)
+        file_path = asset.variants[encoding] if encoding else asset.path
+        # Each encoding is a different representation, with its own ETag
+        etag = f"{asset.etag}-{encoding}" if encoding else asset.etag
+
+        response = send_file(
+            file_path, mimetype=asset.mimetype, etag=etag, conditional=True
+        )
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        if asset.variants:
+            response.vary.add("Accept-Encoding")
+        response.headers["Cache-Control"] = (
+            IMMUTABLE_CACHE_CONTROL if asset.immutable else REVALIDATE_CACHE_CONTROL
+        )
+        return response
+
+    def _encoding(self, asset: Asset) -> Optional[str]:
+        for encoding, _ in ENCODINGS:
+            if encoding in asset.variants and request.accept_encodings[encoding]:
+                return encoding
+        return None
+
+
+def _digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:32]
+
+
+asset_manifest = AssetManifest()
@@ -1,5 +1,6 @@
 from celery import shared_task
 
+from app.web.db import db
 from app.web.db.models import Pdf
 from app.web.files import download
 from app.chat import create_embeddings_for_pdf
@@ -10,3 +11,5 @@ def process_document(pdf_id: int):
     pdf = Pdf.find_by(id=pdf_id)
     with download(pdf.id) as pdf_path:
         create_embeddings_for_pdf(pdf.id, pdf_path)
+
+    pdf.update(embedded_on=db.func.now())
@@ -0,0 +1,8 @@
+from celery import shared_task
+
+from app.chat.memories.summary_memory import update_summary
+
+
+@shared_task()
+def summarize_conversation(conversation_id: str):
+    update_summary(conversation_id)
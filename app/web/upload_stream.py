@@ -0,0 +1,91 @@
+import hashlib
+from typing import IO, Iterator, Optional
+
+from werkzeug.exceptions import BadRequest
+from werkzeug.sansio.multipart import (
+    Data,
+    Epilogue,
+    Field,
+    File,
+    MultipartDecoder,
+    NeedData,
+)
+
+CHUNK_SIZE = 64 * 1024
+
+
+class UploadStream:
+    """
+    A file sent in a multipart/form-data request body, read as it arrives
+    instead of being saved first (which request.files does, to a temporary
+    file above 500KB).
+
+    `open` reads up to the file's part, so its name and content type are
+    known. Iterating yields the file's content in chunks and hashes it on
+    the way, `sha256` and `size` are set once it's all been read. A body
+    that ends before the file does raises BadRequest, so a truncated upload
+    is never passed on as a complete one.
+
+    Args:
+        stream: The request body (request.stream)
+        boundary: The multipart boundary from the Content-Type header
+        field: Name of the form field holding the file
+        chunk_size: Bytes read from the body at a time
+    """
+
+    def __init__(
+        self, stream: IO[bytes], boundary: str, field: str = "file", chunk_size: int = CHUNK_SIZE
+    ):
+        self.stream = stream
+        self.field = field
+        self.chunk_size = chunk_size
+        self.filename: Optional[str] = None
+        self.content_type: Optional[str] = None
+        self.size = 0
+        self.sha256: Optional[str] = None
+        self._decoder = MultipartDecoder(boundary.encode())
+        self._consumed = False
+
+    def open(self) -> "UploadStream":
+        skipping = False
+        while True:
+            event = self._next_event()
+            if isinstance(event, File) and event.name == self.field:
+                self.filename = event.filename
+                self.content_type = event.headers.get("Content-Type")
+                return self
+            if isinstance(event, (Field, File)):
+                skipping = True
+            elif isinstance(event, Data) and skipping:
+                skipping = event.more_data
+            elif isinstance(event, Epilogue):
+                raise BadRequest(f"The request has no '{self.field}' file.")
+
+    def __iter__(self) -> Iterator[bytes]:
+        if self._consumed:
+            raise RuntimeError("The upload can only be read once")
+        self._consumed = True
+
+        digest = hashlib.sha256()
+        while True:
+            event = self._next_event()
+            if not isinstance(event, Data):
+                raise BadRequest("The upload ended before the file did.")
+            if event.data:
+                digest.update(event.data)
+                self.size += len(event.data)
+                yield event.data
+            if not event.more_data:
+                break
+        self.sha256 = digest.hexdigest()
+
+    def _next_event(self):
+        while True:
+            try:
+                event = self._decoder.next_event()
+            except ValueError as e:
+                # Malformed or cut short
+                raise BadRequest(f"Invalid upload: {e}")
+            if not isinstance(event, NeedData):
+                return event
+            self._decoder.receive_data(self.stream.read(self.chunk_size) or None)
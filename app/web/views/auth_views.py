@@ -1,6 +1,7 @@
 from flask import Blueprint, g, request, session, jsonify
 from werkzeug.security import check_password_hash, generate_password_hash
 from app.web.db.models import User
+from app.web.session_user import remember_user, forget_user
 
 bp = Blueprint("auth", __name__, url_prefix="/api/auth")
 
@@ -19,7 +20,7 @@ def signup():
     password = request.json.get("password")
 
     user = User.create(email=email, password=generate_password_hash(password))
-    session["user_id"] = user.id
+    remember_user(user)
 
     return user.as_dict()
 
@@ -35,12 +36,12 @@ def signin():
         return {"message": "Incorrect password."}, 400
 
     session.permanent = True
-    session["user_id"] = user.id
+    remember_user(user)
 
     return user.as_dict()
 
 
 @bp.route("/signout", methods=["POST"])
 def signout():
-    session.clear()
+    forget_user()
     return {"message": "Successfully logged out."}
@@ -1,5 +1,6 @@
-import os
-from flask import Blueprint, send_from_directory, current_app
+from flask import Blueprint
+from app.web.hooks import skip_user_loading
+from app.web.static_assets import asset_manifest
 
 bp = Blueprint(
     "client",
@@ -9,8 +10,10 @@ bp = Blueprint(
 
 @bp.route("/", defaults={"path": ""})
 @bp.route("/<path:path>")
+@skip_user_loading
 def catch_all(path):
-    if path != "" and os.path.exists(os.path.join(current_app.static_folder, path)):
-        return send_from_directory(current_app.static_folder, path)
+    if path != "" and asset_manifest.get(path) is not None:
+        return asset_manifest.serve(path)
     else:
-        return send_from_directory(current_app.static_folder, "index.html")
+        # Client side routes all load the app's page
+        return asset_manifest.serve("index.html")
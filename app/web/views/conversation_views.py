@@ -3,11 +3,20 @@ from flask import Blueprint, g, request, Response, jsonify, stream_with_context
 from app.web.hooks import login_required, load_model
 from app.web.db.models import Pdf, Conversation
 from app.chat import build_chat, ChatArgs
-from app.web.api import add_message_to_conversation
+from app.web.api import (
+    add_message_to_conversation,
+    get_conversation_summaries,
+    get_messages_page,
+)
+from app.chat.chains.streamable import STREAM_FORMAT
+from werkzeug.exceptions import BadRequest
 import json
 
 bp = Blueprint("conversation", __name__, url_prefix="/api/conversations")
 
+MESSAGES_PAGE_SIZE = 50
+MAX_MESSAGES_PAGE_SIZE = 200
+
 
 @bp.route("/", methods=["GET"])
 @login_required
@@ -16,6 +25,13 @@ def list_conversations(pdf):
     return [c.as_dict() for c in pdf.conversations]
 
 
+@bp.route("/summaries", methods=["GET"])
+@login_required
+@load_model(Pdf, lambda r: r.args.get("pdf_id"))
+def list_conversation_summaries(pdf):
+    return get_conversation_summaries(pdf.id)
+
+
 @bp.route("/", methods=["POST"])
 @login_required
 @load_model(Pdf, lambda r: r.args.get("pdf_id"))
@@ -24,19 +40,70 @@ def create_conversation(pdf):
     return conversation.as_dict()
 
 
+@bp.route("/<string:conversation_id>/messages", methods=["GET"])
+@login_required
+@load_model(Conversation)
+def list_messages(conversation):
+    limit = request.args.get("limit", MESSAGES_PAGE_SIZE, type=int)
+    if not 1 <= limit <= MAX_MESSAGES_PAGE_SIZE:
+        raise BadRequest(f"limit must be between 1 and {MAX_MESSAGES_PAGE_SIZE}")
+
+    try:
+        messages, cursor = get_messages_page(
+            conversation.id, limit, before=request.args.get("before")
+        )
+    except ValueError as e:
+        raise BadRequest(str(e))
+
+    return {"messages": [m.as_dict() for m in messages], "next_cursor": cursor}
+
+
 @bp.route("/<string:conversation_id>/messages", methods=["POST"])
 @login_required
 @load_model(Conversation)
 def create_message(conversation):
     input = request.json.get("input")
     streaming = request.args.get("stream", False)
+    format = stream_format(request.args)
+
+    chat = build_message_chat(conversation, streaming)
 
+    if not chat:
+        return "Chat not yet implemented!"
+
+    if streaming:
+        return Response(
+            stream_with_context(chat.stream(input, format=format)), mimetype="text/event-stream"
+        )
+    else:
+        return jsonify({"role": "assistant", "content": chat.run(input)})
+
+
+def stream_format(args):
+    """Frame format of a streamed answer: ?format=raw|sse, see STREAM_FORMAT"""
+    format = args.get("format", STREAM_FORMAT)
+    if format not in ("raw", "sse"):
+        raise BadRequest(f"Unknown stream format: {format}")
+    return format
+
+
+def build_message_chat(conversation, streaming):
+    """
+    Builds the chat answering a message in a conversation. Shared with the
+    async streaming handler in app.web.asgi.
+    """
     pdf = conversation.pdf
 
     chat_args = ChatArgs(
         conversation_id=conversation.id,
         pdf_id=pdf.id,
+        document_id=pdf.vector_document_id,
         streaming=streaming,
+        components={
+            "llm": conversation.llm,
+            "retriever": conversation.retriever,
+            "memory": conversation.memory,
+        },
         metadata={
             "conversation_id": conversation.id,
             "user_id": g.user.id,
@@ -44,14 +111,4 @@ def create_message(conversation):
         },
     )
 
-    chat = build_chat(chat_args)
-
-    if not chat:
-        return "Chat not yet implemented!"
-
-    if streaming:
-        return Response(
-            stream_with_context(chat.stream(input)), mimetype="text/event-stream"
-        )
-    else:
-        return jsonify({"role": "assistant", "content": chat.run(input)})
\ No newline at end of file
+    return build_chat(chat_args)
@@ -0,0 +1,19 @@
+import os
+from flask import Blueprint, Response, request
+
+from app.chat.timing import render_metrics
+from app.web.hooks import skip_user_loading
+
+bp = Blueprint("metrics", __name__, url_prefix="/api/metrics")
+
+# When set, scrapers must send "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+
+@bp.route("/", methods=["GET"])
+@skip_user_loading
+def metrics():
+    if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+        return {"message": "Unauthorized"}, 401
+
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
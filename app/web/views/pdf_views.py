@@ -19,12 +19,33 @@ def list():
 @bp.route("/", methods=["POST"])
 @login_required
 @handle_file_upload
-def upload_file(file_id, file_path, file_name):
-    res, status_code = files.upload(file_path)
+def upload_file(file_id, file_name, file):
+    # Sent on to the upload service as it arrives, hashed on the way
+    res, status_code = files.upload(file_id, file, file.content_type)
     if status_code >= 400:
         return res, status_code
 
-    pdf = Pdf.create(id=file_id, name=file_name, user_id=g.user.id)
+    # Byte-identical copies of an already indexed pdf share its vectors
+    # instead of being embedded again
+    existing = Pdf.find_embedded_by_hash(file.sha256)
+    if existing:
+        pdf = Pdf.create(
+            id=file_id,
+            name=file_name,
+            user_id=g.user.id,
+            content_hash=file.sha256,
+            document_id=existing.vector_document_id,
+            embedded_on=existing.embedded_on,
+        )
+        return pdf.as_dict()
+
+    pdf = Pdf.create(
+        id=file_id,
+        name=file_name,
+        user_id=g.user.id,
+        content_hash=file.sha256,
+        document_id=file_id,
+    )
 
     # TODO: Defer this to be processed by the worker
     process_document.delay(pdf.id)
@@ -39,6 +60,6 @@ def show(pdf):
     return jsonify(
         {
             "pdf": pdf.as_dict(),
-            "download_url": files.create_download_url(pdf.id),
+            "download_url": files.create_download_url(pdf.vector_document_id),
         }
     )
@@ -2,7 +2,9 @@ from flask import Blueprint, request, jsonify
 from werkzeug.exceptions import BadRequest
 
 from app.web.hooks import login_required, load_model
+from app.web.db import db
 from app.web.db.models import Conversation
+from app.web.write_behind import turn_writer
 from app.chat import score_conversation, get_scores
 
 bp = Blueprint("score", __name__, url_prefix="/api/scores")
@@ -16,6 +18,12 @@ def update_score(conversation):
     if not isinstance(score, (int, float)) or score < -1 or score > 1:
         raise BadRequest("Score must be a float between -1 and 1")
 
+    if turn_writer is not None:
+        # The components are stored with the conversation's first turn,
+        # which may still be queued
+        turn_writer.wait(conversation.id)
+        db.session.refresh(conversation)
+
     score_conversation(
         conversation.id,
         score,
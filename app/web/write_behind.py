@@ -0,0 +1,236 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from flask import current_app
+
+from app.web.db import db
+from app.web.api import add_turn_to_conversation
+
+_STOP = object()
+
+
+class TurnWriter:
+    """
+    Writes conversation turns to the database from a background thread.
+
+    `submit` returns as soon as the turn is queued. The writer collects up
+    to `max_batch` turns, or whatever arrived within `max_delay` seconds of
+    the first one, and writes them in one transaction. If a batch fails its
+    turns are retried one by one, so one bad turn doesn't take the others
+    down with it. A turn that still fails is retried `retries` times, with
+    the delay doubling from `retry_delay` seconds, then dropped and
+    `on_drop` is called with its conversation id (the history cache already
+    holds the turn, and must forget it).
+
+    Guarantees:
+    - A turn's time is taken when it's submitted, so messages keep their
+      order however late they are written.
+    - When `max_pending` turns are waiting, `submit` writes the turn itself
+      instead of queueing it, so a slow database slows requests down rather
+      than piling up turns in memory.
+    - `wait` blocks until a conversation's queued turns are written; the
+      history reads it before going to the database.
+    - `close` (registered with atexit) stops taking turns and writes the
+      queued ones before the process exits, waiting up to
+      `shutdown_timeout` seconds. A process that is killed loses at most
+      the turns queued at that moment.
+
+    Args:
+        max_batch: Most turns written in one transaction
+        max_delay: Seconds a turn waits for others to join its batch
+        max_pending: Queued turns above which submit writes synchronously
+        shutdown_timeout: Seconds close waits for the queue to drain
+        retries: Attempts at a failing turn after the first
+        retry_delay: Seconds before the first retry
+        on_drop: Called with the conversation id of a dropped turn
+    """
+
+    def __init__(
+        self,
+        max_batch: int = 50,
+        max_delay: float = 0.05,
+        max_pending: int = 1000,
+        shutdown_timeout: float = 10,
+        retries: int = 3,
+        retry_delay: float = 0.1,
+        on_drop: Optional[Callable[[str], None]] = None,
+    ):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.shutdown_timeout = shutdown_timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.on_drop = on_drop
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._pending = Counter()
+        self._written = threading.Condition()
+        self._closed = False
+        self._app = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def submit(
+        self,
+        conversation_id: str,
+        messages: List[Tuple[str, str]],
+        components: Optional[Dict[str, str]] = None,
+    ) -> None:
+        turn = (conversation_id, messages, components, datetime.utcnow())
+        if self._closed:
+            return self._write_now(turn)
+
+        self._start()
+        with self._written:
+            self._pending[conversation_id] += 1
+        try:
+            self._queue.put_nowait(turn)
+        except queue.Full:
+            self._done([turn])
+            self._write_now(turn)
+
+    def wait(self, conversation_id: str, timeout: Optional[float] = None) -> bool:
+        """
+        Waits until the queued turns of a conversation are written, up to
+        `timeout` seconds (defaults to shutdown_timeout). Returns False on
+        timeout.
+        """
+        if timeout is None:
+            timeout = self.shutdown_timeout
+        with self._written:
+            return self._written.wait_for(
+                lambda: not self._pending[conversation_id], timeout
+            )
+
+    def close(self) -> None:
+        """Stops the writer once the queued turns are written"""
+        self._closed = True
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(self.shutdown_timeout)
+        if self._thread.is_alive():
+            logging.error(
+                "[TurnWriter] %s turns not written after %ss",
+                self._queue.qsize(),
+                self.shutdown_timeout,
+            )
+
+    def _start(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._app = current_app._get_current_object()
+                self._thread = threading.Thread(
+                    target=self._run, name="turn-writer", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        with self._app.app_context():
+            stopping = False
+            while not stopping:
+                batch = [self._queue.get()]
+                deadline = time.monotonic() + self.max_delay
+                while len(batch) < self.max_batch:
+                    try:
+                        batch.append(
+                            self._queue.get(timeout=max(0, deadline - time.monotonic()))
+                        )
+                    except queue.Empty:
+                        break
+
+                if _STOP in batch:
+                    stopping = True
+                    batch = [turn for turn in batch if turn is not _STOP]
+                    # Anything queued behind the stop marker
+                    while not self._queue.empty():
+                        batch.append(self._queue.get_nowait())
+                if batch:
+                    self._write(batch)
+
+    def _write(self, batch) -> None:
+        if len(batch) > 1 and self._commit(batch) is None:
+            self._done(batch)
+            return
+
+        for turn in batch:
+            for attempt in range(self.retries + 1):
+                if attempt:
+                    time.sleep(self.retry_delay * 2 ** (attempt - 1))
+                error = self._commit([turn])
+                if error is None:
+                    break
+                logging.warning(
+                    "[TurnWriter] Writing turn of %s failed (attempt %s): %s",
+                    turn[0],
+                    attempt + 1,
+                    error,
+                )
+            else:
+                self._drop(turn, error)
+            self._done([turn])
+
+    def _commit(self, batch) -> Optional[Exception]:
+        """Writes the turns in one transaction, returns the error if it fails"""
+        try:
+            for conversation_id, messages, components, created_on in batch:
+                add_turn_to_conversation(
+                    conversation_id,
+                    messages,
+                    components=components,
+                    created_on=created_on,
+                    commit=False,
+                )
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            return e
+        finally:
+            db.session.remove()
+        return None
+
+    def _drop(self, turn, error: Exception) -> None:
+        conversation_id = turn[0]
+        logging.error("[TurnWriter] Dropped turn of %s: %s", conversation_id, error)
+        if self.on_drop is None:
+            return
+        try:
+            self.on_drop(conversation_id)
+        except Exception as e:
+            logging.error(
+                "[TurnWriter] Dropping turn of %s, on_drop failed: %s",
+                conversation_id,
+                e,
+            )
+
+    def _write_now(self, turn) -> None:
+        conversation_id, messages, components, created_on = turn
+        add_turn_to_conversation(
+            conversation_id, messages, components=components, created_on=created_on
+        )
+
+    def _done(self, batch) -> None:
+        with self._written:
+            for turn in batch:
+                self._pending[turn[0]] -= 1
+                if not self._pending[turn[0]]:
+                    del self._pending[turn[0]]
+            self._written.notify_all()
+
+
+turn_writer = None
+if os.getenv("WRITE_BEHIND", "false").lower() in ("1", "true", "yes"):
+    turn_writer = TurnWriter(
+        max_batch=int(os.getenv("WRITE_BEHIND_MAX_BATCH", 50)),
+        max_delay=int(os.getenv("WRITE_BEHIND_MAX_DELAY_MS", 50)) / 1000,
+        max_pending=int(os.getenv("WRITE_BEHIND_MAX_PENDING", 1000)),
+    )
+    atexit.register(turn_writer.close)
@@ -0,0 +1,152 @@
+"""
+Concurrent streams through StreamableChain: thread bridge vs asyncio.
+
+A fake chat model emits --tokens tokens, one every --delay seconds, so each
+stream lasts about tokens * delay seconds no matter how it is served.
+"threads" consumes `chain.stream` from one thread per client, the way WSGI
+workers do (each stream also starts its own chain thread). "asyncio"
+consumes `chain.astream` from one task per client on a single event loop.
+
+For each mode this reports the wall time for all streams, time to first
+write, bytes per second, the number of writes (tokens are coalesced, see
+STREAM_COALESCE_BYTES / STREAM_COALESCE_MS) and the peak number of
+threads in the process.
+
+    python -m benchmarks.async_streaming --streams 1000 --tokens 40 --delay 0.1
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+
+from flask import Flask
+from langchain.chains import LLMChain
+from langchain.prompts import PromptTemplate
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from app.chat.chains.streamable import StreamableChain
+
+
+class FakeTokenChatModel(FakeListChatModel):
+    """Reports every chunk to the callbacks, like ChatOpenAI(streaming=True)"""
+
+    def _should_stream(self, **kwargs):
+        return True
+
+    @property
+    def _identifying_params(self):
+        return {**super()._identifying_params, "stream": True}
+
+
+class FakeStreamingChain(StreamableChain, LLMChain):
+    pass
+
+
+def build_chain(tokens, delay):
+    llm = FakeTokenChatModel(responses=["x" * tokens], sleep=delay)
+    return FakeStreamingChain(llm=llm, prompt=PromptTemplate.from_template("{question}"))
+
+
+class ThreadSampler:
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, threading.active_count())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def summary(started, results, sampler):
+    wall = time.perf_counter() - started
+    first_writes = sorted(r[0] for r in results)
+    return {
+        "wall_s": round(wall, 3),
+        "bytes_per_s": round(sum(r[1] for r in results) / wall, 1),
+        "writes": sum(r[2] for r in results),
+        "complete_streams": sum(1 for r in results if r[1]),
+        "first_write_p50_ms": round(first_writes[len(first_writes) // 2] * 1000, 1),
+        "first_write_p95_ms": round(first_writes[int(len(first_writes) * 0.95) - 1] * 1000, 1),
+        "peak_threads": sampler.peak,
+    }
+
+
+def run_threads(streams, tokens, delay):
+    chain = build_chain(tokens, delay)
+    flask_app = Flask(__name__)
+    results = []
+    lock = threading.Lock()
+
+    def client():
+        with flask_app.app_context():
+            started = time.perf_counter()
+            first, size, writes = None, 0, 0
+            for frame in chain.stream("question"):
+                if first is None:
+                    first = time.perf_counter() - started
+                size += len(frame)
+                writes += 1
+        with lock:
+            results.append((first or 0, size, writes))
+
+    with ThreadSampler() as sampler:
+        started = time.perf_counter()
+        clients = [threading.Thread(target=client) for _ in range(streams)]
+        for c in clients:
+            c.start()
+        for c in clients:
+            c.join()
+        return summary(started, results, sampler)
+
+
+def run_asyncio(streams, tokens, delay):
+    chain = build_chain(tokens, delay)
+
+    async def client():
+        started = time.perf_counter()
+        first, size, writes = None, 0, 0
+        async for frame in chain.astream("question"):
+            if first is None:
+                first = time.perf_counter() - started
+            size += len(frame)
+            writes += 1
+        return first or 0, size, writes
+
+    async def main():
+        return await asyncio.gather(*(client() for _ in range(streams)))
+
+    with ThreadSampler() as sampler:
+        started = time.perf_counter()
+        results = asyncio.run(main())
+        return summary(started, results, sampler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--streams", type=int, default=200)
+    parser.add_argument("--tokens", type=int, default=50)
+    parser.add_argument("--delay", type=float, default=0.02)
+    parser.add_argument("--mode", choices=["threads", "asyncio", "both"], default="both")
+    args = parser.parse_args()
+
+    results = {}
+    if args.mode in ("threads", "both"):
+        results["threads"] = run_threads(args.streams, args.tokens, args.delay)
+    if args.mode in ("asyncio", "both"):
+        results["asyncio"] = run_asyncio(args.streams, args.tokens, args.delay)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Per-message chat setup overhead, with and without the component pool.
+
+"fresh" builds the components the way build_chat used to: two new
+ChatOpenAI clients, both prompts and the chain. "pooled" takes the LLMs
+from the component pool and reuses the module level prompts, building only
+the chain. With --requests, each message also sends one completion to a
+local fake OpenAI server, which shows the cost of opening a new connection
+per message compared to reusing the pool's keep-alive connections.
+
+    python -m benchmarks.chat_setup --messages 200 --requests
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from langchain.chains import ConversationalRetrievalChain
+from langchain.prompts import PromptTemplate
+from langchain_core.retrievers import BaseRetriever
+from langchain_openai import ChatOpenAI
+
+from app.chat.pool import ComponentPool, http_client
+
+COMPLETION = json.dumps(
+    {
+        "id": "chatcmpl-bench",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "gpt-3.5-turbo",
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": "ok"},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+    }
+).encode()
+
+
+class FakeOpenAI(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(COMPLETION)))
+        self.end_headers()
+        self.wfile.write(COMPLETION)
+
+    def log_message(self, *args):
+        pass
+
+
+class EmptyRetriever(BaseRetriever):
+    def _get_relevant_documents(self, query, *, run_manager):
+        return []
+
+
+def _prompts():
+    return (
+        PromptTemplate.from_template(
+            "Chat History:\n{chat_history}\nFollow Up Question: {question}\nStandalone Question:"
+        ),
+        PromptTemplate.from_template("Context:\n{context}\nQuestion: {question}\nAnswer:"),
+    )
+
+
+def build_fresh(base_url):
+    condense_prompt, qa_prompt = _prompts()
+    llm = ChatOpenAI(model_name="gpt-4", streaming=True, base_url=base_url, api_key="bench")
+    condense_llm = ChatOpenAI(
+        model="gpt-3.5-turbo", streaming=False, temperature=0, base_url=base_url, api_key="bench"
+    )
+    chain = ConversationalRetrievalChain.from_llm(
+        llm=llm,
+        condense_question_llm=condense_llm,
+        condense_question_prompt=condense_prompt,
+        retriever=EmptyRetriever(),
+        combine_docs_chain_kwargs={"prompt": qa_prompt},
+    )
+    return chain, condense_llm
+
+
+def build_pooled(pool, prompts, base_url):
+    condense_prompt, qa_prompt = prompts
+    llm = pool.get(
+        "chat_openai",
+        lambda: ChatOpenAI(
+            model_name="gpt-4",
+            streaming=True,
+            base_url=base_url,
+            api_key="bench",
+            http_client=http_client,
+        ),
+        model_name="gpt-4",
+    )
+    condense_llm = pool.get(
+        "chat_openai",
+        lambda: ChatOpenAI(
+            model="gpt-3.5-turbo",
+            streaming=False,
+            temperature=0,
+            base_url=base_url,
+            api_key="bench",
+            http_client=http_client,
+        ),
+        model_name="gpt-3.5-turbo",
+    )
+    chain = ConversationalRetrievalChain.from_llm(
+        llm=llm,
+        condense_question_llm=condense_llm,
+        condense_question_prompt=condense_prompt,
+        retriever=EmptyRetriever(),
+        combine_docs_chain_kwargs={"prompt": qa_prompt},
+    )
+    return chain, condense_llm
+
+
+def measure(build, messages, send_request):
+    setup, total = [], []
+    for _ in range(messages):
+        started = time.perf_counter()
+        _, condense_llm = build()
+        built = time.perf_counter()
+        if send_request:
+            condense_llm.invoke("ping")
+        finished = time.perf_counter()
+        setup.append((built - started) * 1000)
+        total.append((finished - started) * 1000)
+
+    def summary(samples):
+        samples = sorted(samples)
+        return {
+            "mean_ms": round(statistics.mean(samples), 3),
+            "p50_ms": round(samples[len(samples) // 2], 3),
+            "p95_ms": round(samples[int(len(samples) * 0.95) - 1], 3),
+        }
+
+    result = {"setup": summary(setup)}
+    if send_request:
+        result["setup_plus_request"] = summary(total)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--requests", action="store_true")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOpenAI)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}/v1"
+
+    pool = ComponentPool()
+    prompts = _prompts()
+    results = {
+        "fresh": measure(lambda: build_fresh(base_url), args.messages, args.requests),
+        "pooled": measure(
+            lambda: build_pooled(pool, prompts, base_url), args.messages, args.requests
+        ),
+    }
+    server.shutdown()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Prompt tokens and answer recall with and without the context packer.
+
+Builds a synthetic document of --pages pages, splits it like ingestion
+does (500 characters, 100 overlap) and asks one question per sampled
+sentence. Chunks are scored with hashed bag-of-words cosine similarity
+(no embedding API needed), so absolute scores are lower than with OpenAI
+embeddings; pass a --score-gap suited to them.
+
+- "top_k": the k best chunks, as sent to the prompt today
+- "packed": the k * CONTEXT_FETCH_FACTOR best chunks through the packer
+
+Recall is the share of questions whose source sentence appears whole in
+the context.
+
+    python -m benchmarks.context_packing --k 3 --questions 300
+"""
+import argparse
+import json
+import random
+import statistics
+
+import numpy as np
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+
+from app.chat.context_packer import CONTEXT_FETCH_FACTOR, ContextPacker
+
+WORDS = [f"w{i}" for i in range(3000)]
+DIMENSIONS = 4096
+
+
+def build_pages(pages, sentences_per_page, rng):
+    return [
+        [
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 20))) + "."
+            for _ in range(sentences_per_page)
+        ]
+        for _ in range(pages)
+    ]
+
+
+def vectorize(text):
+    vector = np.zeros(DIMENSIONS, dtype=np.float32)
+    for word in text.replace(".", "").split():
+        vector[hash(word) % DIMENSIONS] += 1
+    return vector / (np.linalg.norm(vector) or 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--sentences-per-page", type=int, default=30)
+    parser.add_argument("--questions", type=int, default=300)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--token-budget", type=int, default=1500)
+    parser.add_argument("--score-gap", type=float, default=0.15)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    pages = build_pages(args.pages, args.sentences_per_page, rng)
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100)
+    chunks = []
+    for page, sentences in enumerate(pages):
+        for text in splitter.split_text(" ".join(sentences)):
+            chunks.append(
+                Document(
+                    page_content=text,
+                    metadata={"pdf_id": "bench", "page": page, "chunk": len(chunks)},
+                )
+            )
+    matrix = np.stack([vectorize(c.page_content) for c in chunks])
+
+    packer = ContextPacker(token_budget=args.token_budget, score_gap=args.score_gap)
+    results = {"top_k": ([], []), "packed": ([], [])}
+    for _ in range(args.questions):
+        sentence = rng.choice(rng.choice(pages))
+        words = sentence.rstrip(".").split()
+        question = " ".join(rng.sample(words, max(3, len(words) // 2)))
+
+        scores = matrix @ vectorize(question)
+        order = np.argsort(-scores)
+        candidates = [
+            Document(
+                page_content=chunks[i].page_content,
+                metadata={**chunks[i].metadata, "score": float(scores[i])},
+            )
+            for i in order[: args.k * CONTEXT_FETCH_FACTOR]
+        ]
+
+        for name, docs in (
+            ("top_k", candidates[: args.k]),
+            ("packed", packer.pack(candidates)),
+        ):
+            tokens, found = results[name]
+            tokens.append(packer.count_tokens(docs))
+            found.append(any(sentence in d.page_content for d in docs))
+
+    print(
+        json.dumps(
+            {
+                name: {
+                    "mean_tokens": round(statistics.mean(tokens), 1),
+                    "p95_tokens": sorted(tokens)[int(len(tokens) * 0.95) - 1],
+                    "recall": round(sum(found) / len(found), 3),
+                }
+                for name, (tokens, found) in results.items()
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Time to load the windowed memory (last 2 exchanges) as conversations grow.
+
+Seeds an in-memory SQLite database with one conversation per length and
+loads the memory's variables the way the chain does before every message:
+
+- "full": reads the whole conversation and keeps the window afterwards (the
+  previous behaviour)
+- "windowed": limits the query to the window
+- "cached": the history cache in Redis (REDIS_URI) answers after the first
+  read; skipped when Redis isn't reachable
+
+    python -m benchmarks.history_window --turns 10 100 500 --repeat 200
+"""
+import argparse
+import json
+import statistics
+import time
+
+from flask import Flask
+from langchain.memory import ConversationBufferWindowMemory
+
+from app.web.db import db
+from app.web.db.models import Conversation, Message, Pdf, User
+from app.chat.memories.histories import sql_history
+from app.chat.memories.histories.cache import HistoryCache
+from app.chat.memories.histories.sql_history import SqlMessageHistory
+from app.chat.redis import client
+
+
+def seed(turns):
+    user = User(email=f"bench-{turns}@example.com", password="bench")
+    db.session.add(user)
+    db.session.flush()
+    pdf = Pdf(id=f"bench-{turns}", name="bench.pdf", user_id=user.id)
+    conversation = Conversation(pdf_id=pdf.id, user_id=user.id)
+    db.session.add_all([pdf, conversation])
+    db.session.flush()
+    for i in range(turns):
+        db.session.add(Message(conversation_id=conversation.id, role="human", content=f"question {i}"))
+        db.session.add(Message(conversation_id=conversation.id, role="ai", content=f"answer {i} " * 50))
+    db.session.commit()
+    return conversation.id
+
+
+def measure(conversation_id, window, repeat):
+    memory = ConversationBufferWindowMemory(
+        memory_key="chat_history",
+        output_key="answer",
+        return_messages=True,
+        chat_memory=SqlMessageHistory(conversation_id, window=window),
+        k=2,
+    )
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        memory.load_memory_variables({})
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "mean_ms": round(statistics.mean(samples), 3),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    try:
+        client.ping()
+        cache = HistoryCache(client, prefix="history_cache_bench")
+    except Exception:
+        cache = None
+
+    flask_app = Flask(__name__)
+    flask_app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    db.init_app(flask_app)
+
+    results = {}
+    with flask_app.app_context():
+        db.create_all()
+        for turns in args.turns:
+            conversation_id = seed(turns)
+            sql_history.history_cache = None
+            results[turns] = {
+                "full": measure(conversation_id, None, args.repeat),
+                "windowed": measure(conversation_id, 4, args.repeat),
+            }
+            if cache is not None:
+                sql_history.history_cache = cache
+                results[turns]["cached"] = measure(conversation_id, 4, args.repeat)
+                cache.invalidate(conversation_id)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
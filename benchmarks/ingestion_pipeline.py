@@ -0,0 +1,119 @@
+"""
+Compare sequential ingestion against the pipelined IngestionPipeline.
+
+Embedding and upserting are replaced by fake backends that sleep for a
+configurable per-call latency plus a per-chunk cost, so the benchmark runs
+offline and measures only the overlap between stages.
+
+    python -m benchmarks.ingestion_pipeline --chunks 5000
+"""
+import argparse
+import json
+import time
+
+from langchain_core.documents import Document
+
+from app.chat.ingestion import IngestionPipeline
+
+
+class FakeEmbeddings:
+    def __init__(self, latency: float, per_chunk: float, dimensions: int = 1536):
+        self.latency = latency
+        self.per_chunk = per_chunk
+        self.dimensions = dimensions
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        time.sleep(self.latency + self.per_chunk * len(texts))
+        return [[float(len(text))] * self.dimensions for text in texts]
+
+
+class FakeUpsert:
+    def __init__(self, latency: float, per_chunk: float):
+        self.latency = latency
+        self.per_chunk = per_chunk
+        self.count = 0
+
+    def __call__(self, ids, vectors, metadatas):
+        time.sleep(self.latency + self.per_chunk * len(ids))
+        self.count += len(ids)
+
+
+def fake_chunks(n: int, extract_cost: float):
+    for i in range(n):
+        time.sleep(extract_cost)
+        yield f"bench#{i}", Document(
+            page_content=f"chunk {i} " * 50, metadata={"page": i // 4}
+        )
+
+
+def run_sequential(args):
+    embeddings = FakeEmbeddings(args.embed_latency, args.embed_per_chunk)
+    upsert = FakeUpsert(args.upsert_latency, args.upsert_per_chunk)
+
+    started = time.perf_counter()
+    chunks = list(fake_chunks(args.chunks, args.extract_cost))
+    vectors = []
+    for i in range(0, len(chunks), args.embed_batch_size):
+        batch = chunks[i : i + args.embed_batch_size]
+        vectors.extend(embeddings.embed_documents([d.page_content for _, d in batch]))
+    for i in range(0, len(chunks), args.upsert_batch_size):
+        batch = chunks[i : i + args.upsert_batch_size]
+        upsert(
+            [id for id, _ in batch],
+            vectors[i : i + args.upsert_batch_size],
+            [d.metadata for _, d in batch],
+        )
+    elapsed = time.perf_counter() - started
+    return {
+        "chunks": upsert.count,
+        "elapsed_seconds": round(elapsed, 4),
+        "chunks_per_second": round(upsert.count / elapsed, 2),
+    }
+
+
+def run_pipelined(args):
+    embeddings = FakeEmbeddings(args.embed_latency, args.embed_per_chunk)
+    upsert = FakeUpsert(args.upsert_latency, args.upsert_per_chunk)
+    pipeline = IngestionPipeline(
+        embed=embeddings.embed_documents,
+        upsert=upsert,
+        embed_batch_size=args.embed_batch_size,
+        upsert_batch_size=args.upsert_batch_size,
+        embed_concurrency=args.embed_concurrency,
+        upsert_concurrency=args.upsert_concurrency,
+    )
+    report = pipeline.run(fake_chunks(args.chunks, args.extract_cost))
+    assert upsert.count == args.chunks
+    return report.as_dict()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--extract-cost", type=float, default=0.0002)
+    parser.add_argument("--embed-latency", type=float, default=0.15)
+    parser.add_argument("--embed-per-chunk", type=float, default=0.0005)
+    parser.add_argument("--upsert-latency", type=float, default=0.05)
+    parser.add_argument("--upsert-per-chunk", type=float, default=0.0001)
+    parser.add_argument("--embed-batch-size", type=int, default=64)
+    parser.add_argument("--upsert-batch-size", type=int, default=100)
+    parser.add_argument("--embed-concurrency", type=int, default=4)
+    parser.add_argument("--upsert-concurrency", type=int, default=2)
+    args = parser.parse_args()
+
+    results = {
+        "sequential": run_sequential(args),
+        "pipelined": run_pipelined(args),
+    }
+    speedup = (
+        results["sequential"]["elapsed_seconds"]
+        / results["pipelined"]["elapsed_seconds"]
+    )
+    results["speedup"] = round(speedup, 2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
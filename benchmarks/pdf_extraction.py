@@ -0,0 +1,148 @@
+"""
+Time and peak memory of PDF text extraction on a synthetic pdf.
+
+Compares the eager `PyPDFLoader.load_and_split` path against the streaming
+`iter_pages` extraction, serially and across a process pool. Each mode runs
+in a fresh subprocess so peak RSS figures don't bleed between modes.
+
+    python -m benchmarks.pdf_extraction --pages 1000 --workers 4
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+LOREM = (
+    "Lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod "
+    "tempor incididunt ut labore et dolore magna aliqua Ut enim ad minim"
+)
+
+
+def write_synthetic_pdf(path: str, pages: int, lines_per_page: int = 45) -> None:
+    """Write a minimal, valid pdf with `pages` pages of plain text"""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Page tree, filled in once the page object ids are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for n in range(pages):
+        lines = [
+            f"({n + 1}.{i + 1} {LOREM}) Tj T*" for i in range(lines_per_page)
+        ]
+        stream = "BT /F1 9 Tf 11 TL 36 800 Td " + " ".join(lines) + " ET"
+        stream = stream.encode("latin-1")
+        objects.append(
+            b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"
+        )
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+
+    kids = " ".join(f"{i} 0 R" for i in page_ids).encode()
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, pages)
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for i, body in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n" % i + body + b"\nendobj\n")
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(
+            b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (len(objects) + 1, xref)
+        )
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in kilobytes on linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return round(own / scale, 1), round(children / scale, 1)
+
+
+def run_mode(mode: str, pdf_path: str, workers: int) -> dict:
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from langchain_community.document_loaders import PyPDFLoader
+    from app.chat.ingestion.extract import iter_pages
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100)
+    started = time.perf_counter()
+    first_chunk_at = None
+    chunks = 0
+
+    if mode == "eager":
+        docs = PyPDFLoader(pdf_path).load_and_split(splitter)
+        first_chunk_at = time.perf_counter()
+        chunks = len(docs)
+    else:
+        for page in iter_pages(pdf_path, workers=workers if mode == "parallel" else 1):
+            for _ in splitter.split_documents([page]):
+                if first_chunk_at is None:
+                    first_chunk_at = time.perf_counter()
+                chunks += 1
+
+    own, children = _peak_rss_mb()
+    return {
+        "mode": mode,
+        "workers": workers if mode == "parallel" else 1,
+        "chunks": chunks,
+        "seconds": round(time.perf_counter() - started, 3),
+        "first_chunk_seconds": round((first_chunk_at or started) - started, 3),
+        "peak_rss_mb": own,
+        "peak_child_rss_mb": children,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--mode", choices=["eager", "serial", "parallel"])
+    parser.add_argument("--pdf")
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.pdf, args.workers)))
+        return
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_path = os.path.join(temp_dir, "synthetic.pdf")
+        write_synthetic_pdf(pdf_path, args.pages)
+        size_mb = os.path.getsize(pdf_path) / 1024 / 1024
+        print(f"Synthetic pdf: {args.pages} pages, {size_mb:.1f} MB")
+
+        for mode in ("eager", "serial", "parallel"):
+            output = subprocess.run(
+                [
+                    sys.executable,
+                    "-m",
+                    "benchmarks.pdf_extraction",
+                    "--mode",
+                    mode,
+                    "--pdf",
+                    pdf_path,
+                    "--workers",
+                    str(args.workers),
+                ],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            print(output.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    main()
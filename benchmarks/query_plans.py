@@ -0,0 +1,283 @@
+"""
+Latency and query plans of the hot database queries on a seeded database.
+
+Seeds --database-uri (a local SQLite file by default) with --users users,
+each with --pdfs-per-user pdfs of --conversations-per-pdf conversations,
+and --messages messages spread over the conversations with a long tail
+(a few conversations get very long). An already seeded database is reused
+unless --reseed is passed.
+
+Each hot query runs through the app's own code (app.web.api, the models
+and their relationships) --repeat times with random ids. The statements it
+sends are captured and explained, and the run fails (exit status 1) when a
+plan scans a whole table or sorts rows an index should have ordered:
+
+- SQLite: "SCAN <table>" or "USE TEMP B-TREE" in EXPLAIN QUERY PLAN
+- PostgreSQL: "Seq Scan on <table>" or "Sort" in EXPLAIN
+
+--without-indexes repeats the measurements with the secondary indexes
+dropped (they're recreated afterwards), to see what they buy and that the
+plan checks catch their absence.
+
+    python -m benchmarks.query_plans --messages 2000000 --users 2000
+"""
+import argparse
+import json
+import random
+import re
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from flask import Flask
+from sqlalchemy import event
+
+from app.web import api
+from app.web.db import db
+from app.web.db.models import Conversation, Message, Pdf, User
+
+TABLES = ("message", "conversation", "pdf", "user")
+BATCH = 20000
+
+
+def seed(args, rng):
+    print("Seeding...", file=sys.stderr)
+    started = time.perf_counter()
+    db.drop_all()
+    db.create_all()
+
+    users = [
+        {"id": str(uuid.uuid4()), "email": f"user{i}@example.com", "password": "x"}
+        for i in range(args.users)
+    ]
+    pdfs = [
+        {"id": str(uuid.uuid4()), "name": f"{i}.pdf", "user_id": user["id"]}
+        for user in users
+        for i in range(args.pdfs_per_user)
+    ]
+    epoch = datetime(2024, 1, 1)
+    conversations = [
+        {
+            "id": str(uuid.uuid4()),
+            "pdf_id": pdf["id"],
+            "user_id": pdf["user_id"],
+            "created_on": epoch + timedelta(seconds=rng.randrange(10**7)),
+        }
+        for pdf in pdfs
+        for _ in range(args.conversations_per_pdf)
+    ]
+    for model, rows in ((User, users), (Pdf, pdfs), (Conversation, conversations)):
+        for i in range(0, len(rows), BATCH):
+            db.session.execute(db.insert(model), rows[i : i + BATCH])
+
+    # Long tail: the weight of the n-th conversation is 1 / n^0.8
+    ids = [c["id"] for c in conversations]
+    weights = [1 / (n + 1) ** 0.8 for n in range(len(ids))]
+    rng.shuffle(ids)
+    content = "lorem ipsum dolor sit amet " * 8
+    for start in range(0, args.messages, BATCH):
+        count = min(BATCH, args.messages - start)
+        targets = rng.choices(ids, weights=weights, k=count)
+        db.session.execute(
+            db.insert(Message),
+            [
+                {
+                    "id": str(uuid.uuid4()),
+                    "conversation_id": conversation_id,
+                    "role": "human" if (start + i) % 2 == 0 else "ai",
+                    "content": content,
+                    "created_on": epoch + timedelta(milliseconds=start + i),
+                }
+                for i, conversation_id in enumerate(targets)
+            ],
+        )
+        db.session.commit()
+    print(f"Seeded in {time.perf_counter() - started:.0f}s", file=sys.stderr)
+
+
+def sample_ids(model, count):
+    return (
+        db.session.execute(
+            db.select(model.id).order_by(db.func.random()).limit(count)
+        )
+        .scalars()
+        .all()
+    )
+
+
+def hot_queries(conversation_ids, pdf_ids, user_ids, emails, rng):
+    """Name -> function running the query once with random ids"""
+
+    def second_page(conversation_id):
+        _, cursor = api.get_messages_page(conversation_id, 50)
+        if cursor is not None:
+            api.get_messages_page(conversation_id, 50, before=cursor)
+
+    return {
+        "history_window": lambda: api.get_messages_by_conversation_id(
+            rng.choice(conversation_ids), 4
+        ),
+        "history_full": lambda: api.get_messages_by_conversation_id(
+            rng.choice(conversation_ids)
+        ),
+        "messages_page": lambda: second_page(rng.choice(conversation_ids)),
+        "conversation_summaries": lambda: api.get_conversation_summaries(
+            rng.choice(pdf_ids)
+        ),
+        "conversation_by_id": lambda: Conversation.find_by(
+            id=rng.choice(conversation_ids)
+        ),
+        "pdf_conversations": lambda: Pdf.find_by(id=rng.choice(pdf_ids)).conversations,
+        "user_pdfs": lambda: Pdf.where(user_id=rng.choice(user_ids)),
+        "user_conversations": lambda: User.find_by(
+            id=rng.choice(user_ids)
+        ).conversations,
+        "user_by_email": lambda: User.find_by(email=rng.choice(emails)),
+    }
+
+
+def measure(query, repeat):
+    samples = []
+    for _ in range(repeat):
+        db.session.expunge_all()
+        started = time.perf_counter()
+        query()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "p50_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1], 3),
+    }
+
+
+def capture(query):
+    """Statements (and their parameters) the query sends"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    db.session.expunge_all()
+    event.listen(db.engine, "before_cursor_execute", record)
+    try:
+        query()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", record)
+    return statements
+
+
+def explain(statement, parameters):
+    connection = db.session.connection()
+    if db.engine.dialect.name == "sqlite":
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        return [row[-1] for row in rows]
+    rows = connection.exec_driver_sql(f"EXPLAIN {statement}", parameters)
+    return [row[0] for row in rows]
+
+
+def plan_problems(plan):
+    tables = "|".join(TABLES)
+    problems = []
+    for line in plan:
+        if re.match(rf"\s*SCAN \"?({tables})\b", line) or re.search(
+            rf"Seq Scan on \"?({tables})\b", line
+        ):
+            problems.append(line.strip())
+        elif "USE TEMP B-TREE" in line or re.search(r"->\s+Sort\b|^Sort\b", line):
+            problems.append(line.strip())
+    return problems
+
+
+def run(queries, repeat):
+    results = {}
+    for name, query in queries.items():
+        plans = [explain(s, p) for s, p in capture(query)]
+        results[name] = {
+            **measure(query, repeat),
+            "plan": plans,
+            "problems": [p for plan in plans for p in plan_problems(plan)],
+        }
+    return results
+
+
+def secondary_indexes():
+    return [
+        index
+        for table in db.metadata.sorted_tables
+        if table.name in TABLES
+        for index in table.indexes
+        if not index.unique
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--database-uri", default="sqlite:////tmp/query_plans.sqlite")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--pdfs-per-user", type=int, default=2)
+    parser.add_argument("--conversations-per-pdf", type=int, default=5)
+    parser.add_argument("--messages", type=int, default=2_000_000)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--reseed", action="store_true")
+    parser.add_argument("--without-indexes", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    flask_app = Flask(__name__)
+    flask_app.config["SQLALCHEMY_DATABASE_URI"] = args.database_uri
+    db.init_app(flask_app)
+
+    with flask_app.app_context():
+        db.create_all()
+        seeded = db.session.execute(db.select(db.func.count(User.id))).scalar()
+        if args.reseed or not seeded:
+            seed(args, rng)
+        else:
+            # Reused database, make sure it has the current indexes
+            for index in secondary_indexes():
+                index.create(db.engine, checkfirst=True)
+        if db.engine.dialect.name == "sqlite":
+            db.session.execute(db.text("ANALYZE"))
+            db.session.commit()
+
+        queries = hot_queries(
+            sample_ids(Conversation, 1000),
+            sample_ids(Pdf, 1000),
+            sample_ids(User, 1000),
+            db.session.execute(db.select(User.email).limit(1000)).scalars().all(),
+            rng,
+        )
+
+        results = {"indexed": run(queries, args.repeat)}
+        if args.without_indexes:
+            db.session.commit()
+            indexes = secondary_indexes()
+            for index in indexes:
+                index.drop(db.engine)
+            # New connections, sqlite3 reuses cached EXPLAIN statements
+            # without replanning them
+            db.engine.dispose()
+            try:
+                results["without_indexes"] = run(queries, args.repeat)
+            finally:
+                db.session.commit()
+                for index in indexes:
+                    index.create(db.engine)
+
+    print(json.dumps(results, indent=2))
+
+    problems = {
+        name: result["problems"]
+        for name, result in results["indexed"].items()
+        if result["problems"]
+    }
+    if problems:
+        print(f"Query plan regressions: {json.dumps(problems)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,7 @@ import {
 	resetAll,
 	resetError,
 	fetchConversations,
+	fetchOlderMessages,
 	createConversation,
 	setActiveConversationId,
 	getActiveConversation,
@@ -24,6 +25,7 @@ export {
 	resetAll,
 	resetError,
 	fetchConversations,
+	fetchOlderMessages,
 	createConversation,
 	setActiveConversationId,
 	getActiveConversation,
@@ -11,6 +11,17 @@ export interface Message {
 export interface Conversation {
 	id: number;
 	messages: Message[];
+	message_count?: number;
+	last_message?: Message | null;
+	// Cursor of the next page of older messages, null once all are loaded
+	next_cursor?: string | null;
+	// Whether the most recent page of messages was fetched
+	loaded?: boolean;
+}
+
+interface MessagesPage {
+	messages: Message[];
+	next_cursor: string | null;
 }
 
 export interface MessageOpts {
@@ -112,24 +123,60 @@ const scoreConversation = async (score: number) => {
 };
 
 const fetchConversations = async (documentId: number) => {
-	const { data } = await api.get<Conversation[]>(`/conversations?pdf_id=${documentId}`);
+	// Summaries only, messages are fetched per conversation when it's opened
+	const { data } = await api.get<Conversation[]>(`/conversations/summaries?pdf_id=${documentId}`);
 
 	if (data.length) {
 		set({
-			conversations: data,
+			conversations: data.map((c) => ({ ...c, messages: [], loaded: false })),
 			activeConversationId: data[0].id
 		});
+		await fetchMessages(data[0].id);
 	} else {
 		await createConversation(documentId);
 	}
 };
 
+const fetchMessages = async (conversationId: number) => {
+	const { data } = await api.get<MessagesPage>(`/conversations/${conversationId}/messages`);
+
+	store.update((s) => {
+		const conv = s.conversations.find((c) => c.id === conversationId);
+		if (!conv) {
+			return;
+		}
+		conv.messages = data.messages;
+		conv.next_cursor = data.next_cursor;
+		conv.loaded = true;
+	});
+};
+
+const fetchOlderMessages = async () => {
+	const conversation = getActiveConversation();
+	if (!conversation || !conversation.next_cursor) {
+		return;
+	}
+
+	const { data } = await api.get<MessagesPage>(
+		`/conversations/${conversation.id}/messages?before=${conversation.next_cursor}`
+	);
+
+	store.update((s) => {
+		const conv = s.conversations.find((c) => c.id === conversation.id);
+		if (!conv) {
+			return;
+		}
+		conv.messages = [...data.messages, ...conv.messages];
+		conv.next_cursor = data.next_cursor;
+	});
+};
+
 const createConversation = async (documentId: number) => {
 	const { data } = await api.post<Conversation>(`/conversations?pdf_id=${documentId}`);
 
 	set({
 		activeConversationId: data.id,
-		conversations: [data, ...get(store).conversations]
+		conversations: [{ ...data, loaded: true, next_cursor: null }, ...get(store).conversations]
 	});
 
 	return data;
@@ -137,6 +184,11 @@ const createConversation = async (documentId: number) => {
 
 const setActiveConversationId = (id: number) => {
 	set({ activeConversationId: id });
+
+	const conversation = getActiveConversation();
+	if (conversation && !conversation.loaded) {
+		return fetchMessages(id);
+	}
 };
 
 const resetAll = () => {
@@ -153,6 +205,7 @@ export {
 	setActiveConversationId,
 	getRawMessages,
 	fetchConversations,
+	fetchOlderMessages,
 	resetAll,
 	resetError,
 	createConversation,
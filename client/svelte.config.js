@@ -12,7 +12,9 @@ const config = {
 		// If your environment is not supported or you settled on a specific environment, switch out the adapter.
 		// See https://kit.svelte.dev/docs/adapters for more information about adapters.
 		adapter: adapter({
-			fallback: 'index.html' // may differ from host to host
+			fallback: 'index.html', // may differ from host to host
+			// Writes .br and .gz next to each file, served by app.web.static_assets
+			precompress: true
 		}),
 
 		alias: {
@@ -11,6 +11,15 @@ def dev(ctx):
     )
 
 
+@task
+def devasync(ctx):
+    ctx.run(
+        "uvicorn app.web.asgi:app --reload --port 8000",
+        pty=os.name != "nt",
+        env={"APP_ENV": "development"},
+    )
+
+
 @task
 def devworker(ctx):
     ctx.run(
@@ -0,0 +1,37 @@
+import os
+
+import pytest
+
+# Config reads these at import, no test talks to the real services
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ.setdefault("SQLALCHEMY_DATABASE_URI", "sqlite://")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("LANGFUSE_PUBLIC_KEY", "test")
+os.environ.setdefault("LANGFUSE_SECRET_KEY", "test")
+os.environ.setdefault("LANGFUSE_HOST", "http://localhost")
+# The Pinecone backend connects to its index when it's imported
+os.environ.setdefault("VECTOR_STORES", "local")
+
+# app.chat imports app.web.api, which needs app.web to be imported first
+import app.web  # noqa: E402,F401
+
+
+@pytest.fixture
+def redis_client():
+    """In-memory Redis that runs Lua scripts"""
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+@pytest.fixture
+def flask_app():
+    from app.web import create_app
+    from app.web.db import db
+
+    flask_app = create_app()
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.session.remove()
+        db.drop_all()
@@ -0,0 +1,63 @@
+from app.chat.memories.histories.cache import HistoryCache
+
+
+def _message(i):
+    return {"role": "human", "content": f"message {i}"}
+
+
+def test_fill_then_get(redis_client):
+    cache = HistoryCache(redis_client, max_messages=10)
+    assert cache.get("c") == (None, 0)
+
+    cache.fill("c", [_message(1), _message(2)], complete=True, version=0)
+
+    assert cache.get("c") == ([_message(1), _message(2)], 0)
+    assert cache.get("c", limit=1) == ([_message(2)], 0)
+    assert cache.get("c", limit=0) == ([], 0)
+
+
+def test_fill_read_before_an_append_is_discarded(redis_client):
+    cache = HistoryCache(redis_client, max_messages=10)
+    _, version = cache.get("c")
+
+    # A message is written between the database read and the fill
+    cache.append("c", "human", "message 1")
+    cache.fill("c", [], complete=True, version=version)
+
+    messages, new_version = cache.get("c")
+    assert messages is None
+    assert new_version == version + 1
+
+
+def test_append_only_extends_a_cached_history(redis_client):
+    cache = HistoryCache(redis_client, max_messages=10)
+    cache.append("c", "human", "message 1")
+    assert cache.get("c")[0] is None
+
+    _, version = cache.get("c")
+    cache.fill("c", [_message(1)], complete=True, version=version)
+    cache.append("c", "human", "message 2")
+
+    assert cache.get("c")[0] == [_message(1), _message(2)]
+
+
+def test_append_past_max_messages_drops_the_complete_flag(redis_client):
+    cache = HistoryCache(redis_client, max_messages=2)
+    cache.fill("c", [_message(1), _message(2)], complete=True, version=0)
+    cache.append("c", "human", "message 3")
+
+    # Only the last two are kept, enough for a window of two but not for
+    # the whole conversation
+    assert cache.get("c", limit=2)[0] == [_message(2), _message(3)]
+    assert cache.get("c")[0] is None
+
+
+def test_invalidate_drops_the_history_and_bumps_the_version(redis_client):
+    cache = HistoryCache(redis_client, max_messages=10)
+    cache.fill("c", [_message(1)], complete=True, version=0)
+
+    cache.invalidate("c")
+
+    assert cache.get("c") == (None, 1)
+    cache.fill("c", [_message(1)], complete=True, version=0)
+    assert cache.get("c")[0] is None
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from app.chat.vector_stores.local import LocalVectorIndex
+
+
+def _vector(*values):
+    return list(values)
+
+
+def _texts(index, document_id, query, k=10):
+    (hits,) = index.search(document_id, np.asarray([query]), k)
+    return [metadata["text"] for metadata, _ in hits]
+
+
+def test_rows_stay_aligned_with_ids(tmp_path):
+    index = LocalVectorIndex(str(tmp_path))
+    index.upsert(
+        ["1#1", "1#2"],
+        [_vector(1, 0, 0), _vector(0, 1, 0)],
+        [{"pdf_id": "1", "text": "a"}, {"pdf_id": "1", "text": "b"}],
+    )
+    # Replaces one row and appends another in the same call
+    index.upsert(
+        ["1#2", "1#3"],
+        [_vector(0, 0, 1), _vector(0, 1, 0)],
+        [{"pdf_id": "1", "text": "b2"}, {"pdf_id": "1", "text": "c"}],
+    )
+
+    matrix, meta = index.load("1")
+    assert meta["ids"] == ["1#1", "1#2", "1#3"]
+    assert matrix.shape == (3, 3)
+    assert _texts(index, "1", [1, 0, 0], k=1) == ["a"]
+    assert _texts(index, "1", [0, 0, 1], k=1) == ["b2"]
+    assert _texts(index, "1", [0, 1, 0], k=1) == ["c"]
+
+
+def test_documents_are_kept_apart(tmp_path):
+    index = LocalVectorIndex(str(tmp_path))
+    index.upsert(
+        ["1#1", "2#1"],
+        [_vector(1, 0), _vector(1, 0)],
+        [{"pdf_id": "1", "text": "one"}, {"pdf_id": "2", "text": "two"}],
+    )
+
+    assert _texts(index, "1", [1, 0]) == ["one"]
+    assert _texts(index, "2", [1, 0]) == ["two"]
+    assert _texts(index, "3", [1, 0]) == []
+
+
+def test_rows_of_an_interrupted_write_are_dropped(tmp_path):
+    index = LocalVectorIndex(str(tmp_path))
+    index.upsert(["1#1"], [_vector(1, 0)], [{"pdf_id": "1", "text": "a"}])
+
+    # A write that crashed after its vectors but before its metadata
+    matrix_path, _ = index._paths("1")
+    with open(matrix_path, "ab") as f:
+        f.write(np.asarray([[0, 1]], dtype=np.float32).tobytes())
+
+    index.upsert(["1#2"], [_vector(-1, 0)], [{"pdf_id": "1", "text": "b"}])
+
+    matrix, meta = index.load("1")
+    assert meta["ids"] == ["1#1", "1#2"]
+    assert np.allclose(matrix, [[1, 0], [-1, 0]])
+    assert _texts(index, "1", [-1, 0], k=1) == ["b"]
+
+
+def test_matrix_shorter_than_its_metadata_is_refused(tmp_path):
+    index = LocalVectorIndex(str(tmp_path))
+    index.upsert(
+        ["1#1", "1#2"],
+        [_vector(1, 0), _vector(0, 1)],
+        [{"pdf_id": "1", "text": "a"}, {"pdf_id": "1", "text": "b"}],
+    )
+    matrix_path, _ = index._paths("1")
+    with open(matrix_path, "r+b") as f:
+        f.truncate(8)
+
+    with pytest.raises(ValueError):
+        index.upsert(["1#3"], [_vector(1, 1)], [{"pdf_id": "1", "text": "c"}])
+
+
+def test_dimension_mismatch_is_refused(tmp_path):
+    index = LocalVectorIndex(str(tmp_path))
+    index.upsert(["1#1"], [_vector(1, 0)], [{"pdf_id": "1", "text": "a"}])
+
+    with pytest.raises(ValueError):
+        index.upsert(["1#2"], [_vector(1, 0, 0)], [{"pdf_id": "1", "text": "b"}])
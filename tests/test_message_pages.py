@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.web.api import decode_cursor, encode_cursor, get_messages_page
+from app.web.db import db
+from app.web.db.models import Message
+
+
+def test_cursor_round_trip():
+    message = Message(id="m1", created_on=datetime(2024, 5, 1, 12, 0, 0, 123456))
+
+    assert decode_cursor(encode_cursor(message)) == (message.created_on, "m1")
+
+
+@pytest.mark.parametrize("cursor", ["", "not a cursor", "WzFd", "eyJhIjogMX0="])
+def test_invalid_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_pages_walk_back_without_gaps_or_repeats(flask_app):
+    created_on = datetime(2024, 5, 1)
+    # Pairs share a timestamp, so pages must break ties on the id
+    for i in range(7):
+        Message.create(
+            commit=False,
+            id=f"m{i}",
+            conversation_id="c",
+            role="human",
+            content=str(i),
+            created_on=created_on + timedelta(seconds=i // 2),
+        )
+    db.session.commit()
+
+    pages, before = [], None
+    while True:
+        page, before = get_messages_page("c", limit=3, before=before)
+        pages.append([m.id for m in page])
+        if before is None:
+            break
+
+    assert pages == [["m4", "m5", "m6"], ["m1", "m2", "m3"], ["m0"]]
@@ -0,0 +1,75 @@
+import time
+
+import pytest
+
+from app.chat import score
+from app.chat.score import ScoreSnapshot
+
+
+@pytest.fixture
+def scores(redis_client, monkeypatch):
+    monkeypatch.setattr(score, "client", redis_client)
+    monkeypatch.setattr(score, "_score", redis_client.register_script(score._SCORE))
+    snapshot = ScoreSnapshot(ttl=60, subscribe=False)
+    monkeypatch.setattr(score, "score_snapshot", snapshot)
+    return snapshot
+
+
+def _vote(value, llm="gpt-4"):
+    score.score_conversation("c", value, llm=llm, retriever="local_1", memory="sql_buffer")
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Timed out")
+        time.sleep(0.01)
+
+
+def test_snapshot_is_served_until_it_expires(scores, monkeypatch):
+    _vote(1)
+    assert scores.get("llm") == ({"gpt-4": "1"}, {"gpt-4": "1"})
+
+    reads = []
+    monkeypatch.setattr(score, "_read_scores", lambda: reads.append(1))
+    scores.get("llm")
+    scores.get("retriever")
+    assert reads == []
+
+
+def test_vote_invalidates_the_snapshot(scores):
+    _vote(1)
+    scores.get("llm")
+
+    _vote(0)
+
+    # Reloaded in the background, the stale copy is served meanwhile
+    _wait_for(lambda: scores.get("llm")[1] == {"gpt-4": "2"})
+
+
+def test_vote_during_a_read_leaves_the_snapshot_stale(scores, monkeypatch):
+    read_scores = score._read_scores
+
+    def read_with_a_vote():
+        replies = read_scores()
+        scores.invalidate()
+        return replies
+
+    monkeypatch.setattr(score, "_read_scores", read_with_a_vote)
+    scores.refresh()
+
+    assert scores._loaded_at == 0.0
+
+
+def test_votes_of_other_processes_invalidate_the_snapshot(scores, redis_client):
+    listening = ScoreSnapshot(ttl=60, subscribe=True)
+    listening.refresh()
+    _wait_for(lambda: redis_client.pubsub_numsub(score.SCORES_CHANNEL)[0][1] == 1)
+    assert listening._loaded_at > 0
+
+    # Another process's vote, only announced on the channel
+    _vote(1)
+
+    _wait_for(lambda: listening._loaded_at == 0.0)
+    listening._listener.stop()
@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+from app.chat.chains.streamable import TokenCoalescer
+from app.chat.timing import PhaseTimer
+
+
+def _payload(frame):
+    assert frame.startswith("data: ") and frame.endswith("\n\n")
+    return json.loads(frame[len("data: ") : -2])
+
+
+def test_sse_frames_carry_the_buffered_tokens():
+    coalescer = TokenCoalescer(max_bytes=10, max_delay=0, format="sse")
+
+    assert coalescer.add("Hello") is None
+    frame = coalescer.add(", world")
+
+    assert _payload(frame) == {"token": "Hello, world"}
+    assert coalescer.flush() is None
+
+
+def test_sse_frames_escape_newlines_and_quotes():
+    coalescer = TokenCoalescer(max_bytes=0, max_delay=0, format="sse")
+
+    frame = coalescer.add('line "one"\n\nline two')
+
+    # A blank line would end the event early
+    assert "\n\n" not in frame[:-2]
+    assert _payload(frame) == {"token": 'line "one"\n\nline two'}
+
+
+def test_sse_stream_ends_with_timing_then_done():
+    coalescer = TokenCoalescer(format="sse")
+    timer = PhaseTimer("test")
+    timer.add("retrieve", 12.0)
+
+    timing = coalescer.timing(timer)
+    assert timing.startswith("event: timing\ndata: ")
+    assert json.loads(timing.split("data: ", 1)[1])["retrieve"] == 12.0
+    assert coalescer.done() == "data: [DONE]\n\n"
+
+
+def test_raw_frames_are_the_text():
+    coalescer = TokenCoalescer(max_bytes=0, max_delay=0, format="raw")
+
+    assert coalescer.add("Hello") == "Hello"
+    assert coalescer.timing(PhaseTimer()) is None
+    assert coalescer.done() is None
+
+
+def test_tokens_wait_for_the_delay():
+    coalescer = TokenCoalescer(max_bytes=0, max_delay=10, format="raw")
+
+    assert coalescer.add("a") is None
+    assert 0 < coalescer.timeout() <= 10
+    assert coalescer.flush() == "a"
+    assert coalescer.timeout() is None
+
+
+def test_unknown_format_is_refused():
+    with pytest.raises(ValueError):
+        TokenCoalescer(format="json")